@@ -0,0 +1,336 @@
+"""
+A local stand-in for the PageSeeder endpoints netdox uses, for end-to-end benchmarks.
+
+Covers the OAuth token, self and group services, search, URIs and URI history,
+directory exports and thread progress, member resources, the upload servlet,
+the loading zone, batch actions, group resources, and documents by docid.
+Each request can be delayed by a fixed latency, and background threads
+can be made to take some time to finish.
+
+Usage: python benchmarks/fakeps.py [port]
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from netdox import Network, utils
+from netdox.config import NetworkConfig
+
+CHUNK_SIZE = 1 << 16
+"""Size of the chunks member resources are sent in."""
+
+
+def export_zip(network: Network) -> bytes:
+    """
+    Returns a ZIP of the PSML documents for the domains and IPs in *network*,
+    laid out like an export of the website folder.
+    Xrefs between them are resolved the way PageSeeder does, by adding the title of the target.
+    Nodes are left out.
+    """
+    titles = {nwobj.docid: nwobj.name for nwobj in (*network.domains, *network.ips)}
+    buffer = io.BytesIO()
+    with ZipFile(buffer, 'w', ZIP_DEFLATED) as zip:
+        zip.writestr('config.psml', network.config.to_psml())
+        for nwobj in (*network.domains, *network.ips):
+            document = nwobj.to_psml()
+            for xref in document.find_all('xref'):
+                if xref.get('docid') in titles:
+                    xref['urititle'] = titles[xref['docid']]
+            zip.writestr(
+                os.path.relpath(nwobj.outpath, utils.OUTDIR).replace(os.sep, '/'),
+                str(document))
+    return buffer.getvalue()
+
+
+class FakePageSeeder:
+    """
+    Serves fake responses to the PageSeeder API over HTTP on localhost.
+    Use the *scheme* and *host* of the server in the pageseeder section of the config.
+    """
+    group: str
+    """Name of the group."""
+    latency: float
+    """Seconds to wait before answering each request."""
+    thread_seconds: float
+    """Seconds each background thread runs for."""
+    documents: int
+    """Number of documents in the website folder, for search and URI listings."""
+    page_size: int
+    """Number of search results in each page."""
+    export: bytes
+    """The ZIP to serve for an export of the website folder."""
+    config: str
+    """The PSML of the network config document."""
+    requests: Counter[str]
+    """Counts the requests served for each endpoint."""
+    uploaded: int
+    """Number of bytes received by the upload servlet."""
+
+    def __init__(self,
+            group: str = 'netdox-benchmark',
+            latency: float = 0.0,
+            thread_seconds: float = 0.0,
+            documents: int = 1000,
+            page_size: int = 100,
+            export: bytes = None,
+            config: str = None,
+            port: int = 0
+        ) -> None:
+        self.group = group
+        self.latency = latency
+        self.thread_seconds = thread_seconds
+        self.documents = documents
+        self.page_size = page_size
+        self.export = export if export is not None else export_zip(Network(config = NetworkConfig()))
+        self.config = config or NetworkConfig().to_psml()
+        self.requests = Counter()
+        self.uploaded = 0
+
+        self._threads: dict[str, tuple[float, Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._routes: list[tuple[str, re.Pattern, Callable]] = [
+            (method, re.compile(pattern), handler) for method, pattern, handler in (
+                ('POST', r'/ps/oauth/token', self._token),
+                ('GET', r'/ps/service/version', self._version),
+                ('GET', r'/ps/service/self', self._self),
+                ('GET', r'/ps/service/groups/(?P<group>[^/]+)', self._group),
+                ('GET', r'/ps/service/groups/[^/]+/search', self._search),
+                ('GET', r'/ps/service/groups/[^/]+/uris/history', self._history),
+                ('GET', r'/ps/service/groups/[^/]+/uris/(?P<uri>[^/]+)/uris', self._uris),
+                ('GET', r'/ps/service/groups/[^/]+/threads/(?P<id>[^/]+)/progress', self._progress),
+                ('GET', r'/ps/service/members/[^/]+/export', self._export),
+                ('PUT', r'/ps/service/groups/[^/]+/resources', self._ok),
+                ('POST', r'/ps/service/members/[^/]+/groups/[^/]+/loadingzone/(unzip|start)', self._thread),
+                ('POST', r'/ps/service/members/[^/]+/groups/[^/]+/loadingzone/clear', self._ok),
+                ('POST', r'/ps/service/members/[^/]+/groups/[^/]+/batch/uri/[^/]+/search', self._thread),
+                ('GET', r'/ps/docid/(?P<docid>[^/]+)', self._docid),
+                ('GET', r'/ps/member-resource/[^/]+/(?P<file>[^/]+)', self._member_resource),
+                ('PUT', r'/ps/servlet/upload', self._upload),
+            )
+        ]
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._serving: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        """The host and port the server listens on."""
+        host, port = self._server.server_address[:2]
+        return f'{host}:{port}'
+
+    def credentials(self) -> dict:
+        """Returns a pageseeder section of the config that points at this server."""
+        return {
+            'id': 'benchmark',
+            'secret': 'benchmark',
+            'username': 'benchmark',
+            'host': self.host,
+            'scheme': 'http',
+            'group': self.group
+        }
+
+    def start(self) -> FakePageSeeder:
+        """Starts serving in a background thread."""
+        self._serving = threading.Thread(target = self._server.serve_forever, daemon = True)
+        self._serving.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops serving and closes the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> FakePageSeeder:
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    ## Request handling
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self) -> None:
+                fake._dispatch(self, 'GET')
+
+            def do_POST(self) -> None:
+                fake._dispatch(self, 'POST')
+
+            def do_PUT(self) -> None:
+                fake._dispatch(self, 'PUT')
+
+            def do_PATCH(self) -> None:
+                fake._dispatch(self, 'PATCH')
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+    def _dispatch(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        url = urlsplit(request.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self._read_body(request)
+        if self.latency:
+            time.sleep(self.latency)
+
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(url.path)
+            if route_method == method and match:
+                with self._lock:
+                    self.requests[handler.__name__.strip('_')] += 1
+                handler(request, params, body, **match.groupdict())
+                return
+        self._send(request, 404, f'<error>No fake for {method} {url.path}</error>')
+
+    def _read_body(self, request: BaseHTTPRequestHandler) -> int:
+        """Reads and discards the request body, returning its length."""
+        size = 0
+        if request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while (chunk := int(request.rfile.readline().split(b';')[0], 16)):
+                size += len(request.rfile.read(chunk))
+                request.rfile.readline()
+            request.rfile.readline()
+        else:
+            remaining = int(request.headers.get('Content-Length') or 0)
+            while remaining:
+                read = len(request.rfile.read(min(remaining, CHUNK_SIZE)))
+                if not read:
+                    break
+                size += read
+                remaining -= read
+        return size
+
+    def _send(self,
+            request: BaseHTTPRequestHandler,
+            status: int,
+            content: str | bytes,
+            type: str = 'application/xml'
+        ) -> None:
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', type)
+        request.send_header('Content-Length', str(len(content)))
+        request.end_headers()
+        for start in range(0, len(content), CHUNK_SIZE):
+            request.wfile.write(content[start:start + CHUNK_SIZE])
+
+    def _json(self, request: BaseHTTPRequestHandler, content) -> None:
+        self._send(request, 200, json.dumps(content), 'application/json')
+
+    def _start_thread(self, zip: str = None) -> str:
+        with self._lock:
+            id = str(len(self._threads) + 1)
+            self._threads[id] = (time.monotonic() + self.thread_seconds, zip)
+        return self._thread_xml(id)
+
+    def _thread_xml(self, id: str) -> str:
+        done_at, zip = self._threads[id]
+        status = 'completed' if time.monotonic() >= done_at else 'inprogress'
+        return (f'<thread id="{id}" status="{status}"><message>{status}</message>'
+            + (f'<zip>{zip}</zip>' if zip else '') + '</thread>')
+
+    def _uri(self, index: int) -> dict:
+        return {
+            'id': 1000 + index,
+            'docid': f'_nd_benchmark_{index}',
+            'title': f'Document {index}',
+            'displaytitle': f'Document {index}',
+            'labels': ['benchmark'] if index % 2 else []
+        }
+
+    ## Endpoints
+
+    def _token(self, request, params, body) -> None:
+        self._json(request, {'access_token': 'benchmark', 'token_type': 'bearer', 'expires_in': 3600})
+
+    def _version(self, request, params, body) -> None:
+        self._send(request, 200, '<version string="5.9999"/>')
+
+    def _self(self, request, params, body) -> None:
+        self._json(request, {'id': 1, 'username': 'benchmark'})
+
+    def _group(self, request, params, body, group) -> None:
+        self._json(request, {'id': 1, 'name': group})
+
+    def _search(self, request, params, body) -> None:
+        if 'pstype:folder' in params.get('filters', ''):
+            total, results = 1, [{'fields': [{'name': 'psid', 'value': '1'}]}]
+            page, pages = 1, 1
+        else:
+            size = int(params.get('pagesize', self.page_size))
+            page = int(params.get('page', 1))
+            total = self.documents
+            pages = max(1, -(-total // size))
+            results = [{'fields': [
+                {'name': 'psid', 'value': str(uri['id'])},
+                {'name': 'psdocid', 'value': uri['docid']},
+                {'name': 'pstitle', 'value': uri['title']}
+            ]} for uri in map(self._uri, range((page - 1) * size, min(page * size, total)))]
+        self._json(request, {'results': {
+            'page': page, 'totalPages': pages, 'totalResults': total, 'result': results}})
+
+    def _history(self, request, params, body) -> None:
+        self._json(request, {'totalUris': 0, 'uris': []})
+
+    def _uris(self, request, params, body, uri) -> None:
+        size = int(params.get('pagesize', self.documents))
+        page = int(params.get('page', 1))
+        uris = [self._uri(index)
+            for index in range((page - 1) * size, min(page * size, self.documents))]
+        self._json(request, {'totalUris': self.documents, 'uris': uris})
+
+    def _progress(self, request, params, body, id) -> None:
+        if id not in self._threads:
+            self._send(request, 404, '<error>No such thread</error>')
+        else:
+            self._send(request, 200, self._thread_xml(id))
+
+    def _export(self, request, params, body) -> None:
+        self._send(request, 200, self._start_thread('export.zip'))
+
+    def _thread(self, request, params, body, *args) -> None:
+        self._send(request, 200, self._start_thread())
+
+    def _ok(self, request, params, body, *args) -> None:
+        self._send(request, 200, '<ok/>')
+
+    def _docid(self, request, params, body, docid) -> None:
+        if docid == NetworkConfig.DOCID:
+            self._send(request, 200, self.config)
+        else:
+            self._send(request, 404, f'<error>No document with docid {docid}</error>')
+
+    def _member_resource(self, request, params, body, file) -> None:
+        self._send(request, 200, self.export, 'application/zip')
+
+    def _upload(self, request, params, body) -> None:
+        with self._lock:
+            self.uploaded += body
+        self._send(request, 200, f'<upload size="{body}"/>')
+
+
+if __name__ == '__main__':
+    with FakePageSeeder(port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080) as fake:
+        print(f'Serving a fake PageSeeder at http://{fake.host} (Ctrl-C to stop)')
+        print(json.dumps(fake.credentials(), indent = 2))
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
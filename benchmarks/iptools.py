@@ -0,0 +1,102 @@
+"""
+Times each public function in netdox.iptools on a synthetic workload.
+Each function is timed with empty caches (cold) and on a repeat of the workload (warm).
+
+Usage: python benchmarks/iptools.py [addresses]
+"""
+import random
+import sys
+import time
+from functools import _lru_cache_wrapper
+
+from netdox import iptools
+
+
+def workload(size: int) -> dict[str, list]:
+    rand = random.Random(0)
+    ints = [rand.randrange(1 << 32) for _ in range(size)]
+    ips = [iptools.int2cidr(address) for address in ints]
+    masks = [rand.randrange(8, 32) for _ in range(size)]
+    subnets = [f'{ip}/{mask}' for ip, mask in zip(ips, masks)]
+    trie = iptools.SubnetTrie()
+    for subnet in subnets[:size // 10]:
+        trie[iptools.parse_subnet(subnet)] = subnet
+    return {
+        'ints': ints,
+        'ips': ips,
+        'subnets': subnets,
+        'ranges': [f'{ip}-{iptools.int2cidr(address + 16)}'
+            for ip, address in zip(ips, ints) if address + 16 <= iptools.ALL_ONES],
+        'pairs': list(zip(subnets, ips[::-1])),
+        'trie': trie,
+        'int_subnets': [iptools.int_subnet(address, mask) for address, mask in zip(ints, masks)],
+        'rdns': ['.'.join(ip.split('.')[::-1]) + '.in-addr.arpa' for ip in ips],
+        'text': '\n'.join(ips + subnets),
+        'consecutive': [iptools.int2cidr(ints[0] % (1 << 24) + offset)
+            for offset in range(size) if offset % 7]
+    }
+
+def cases(data: dict[str, list]) -> dict[str, callable]:
+    """Maps the name of each public function to a callable running it over the workload."""
+    return {
+        'valid_ip': lambda: [iptools.valid_ip(ip) for ip in data['ips']],
+        'valid_subnet': lambda: [iptools.valid_subnet(subn) for subn in data['subnets']],
+        'valid_range': lambda: [iptools.valid_range(iprange) for iprange in data['ranges']],
+        'public_ip': lambda: [iptools.public_ip(ip) for ip in data['ips']],
+        'netmask': lambda: [iptools.netmask(mask) for _, mask in data['int_subnets']],
+        'hostmask': lambda: [iptools.hostmask(mask) for _, mask in data['int_subnets']],
+        'int_subnet': lambda: [iptools.int_subnet(address, 24) for address in data['ints']],
+        'int_bounds': lambda: [iptools.int_bounds(subnet) for subnet in data['int_subnets']],
+        'int_contains': lambda: [iptools.int_contains(subnet, (address, 32))
+            for subnet, address in zip(data['int_subnets'], data['ints'][::-1])],
+        'parse_subnet': lambda: [iptools.parse_subnet(subn) for subn in data['subnets']],
+        'parse_object': lambda: [iptools.parse_object(object) for object in data['ips']],
+        'SubnetTrie.longest_match': lambda: [data['trie'].longest_match((address, 32))
+            for address in data['ints']],
+        'subn_floor': lambda: [iptools.subn_floor(subn) for subn in data['subnets']],
+        'subn_bounds': lambda: [iptools.subn_bounds(subn) for subn in data['subnets']],
+        'subn_equiv': lambda: [iptools.subn_equiv(subn, min(mask + 4, 31))
+            for subn, (_, mask) in zip(data['subnets'], data['int_subnets'])],
+        'subn_contains': lambda: [iptools.subn_contains(subn, ip) for subn, ip in data['pairs']],
+        'subn_iter': lambda: [list(iptools.subn_iter(f'{ip}/24')) for ip in data['ips'][:20]],
+        'cidr2int': lambda: [iptools.cidr2int(ip) for ip in data['ips']],
+        'int2cidr': lambda: [iptools.int2cidr(address) for address in data['ints']],
+        'range_iter': lambda: [list(iptools.range_iter(address, address + 255))
+            for address in data['ints'][:20]],
+        'search_string': lambda: iptools.search_string(data['text']),
+        'sort': lambda: [iptools.sort(ip) for ip in data['ips']],
+        'collapse_iplist': lambda: iptools.collapse_iplist(data['consecutive']),
+        'aggregate': lambda: iptools.aggregate(data['ips'] + data['subnets'] + data['ranges']),
+        'merge_ranges': lambda: iptools.merge_ranges(
+            [(address, address + 255) for address in data['ints']]),
+        'range_subnets': lambda: [iptools.range_subnets(address, address + 1000)
+            for address in data['ints'] if address + 1000 <= iptools.ALL_ONES],
+        'ip_from_rdns_name': lambda: [iptools.ip_from_rdns_name(name) for name in data['rdns']],
+    }
+
+def clear_caches() -> None:
+    for value in vars(iptools).values():
+        if isinstance(value, _lru_cache_wrapper):
+            value.cache_clear()
+
+def best(func, repeat: int = 5, cold: bool = False) -> float:
+    times = []
+    for _ in range(repeat):
+        if cold:
+            clear_caches()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main(size: int) -> None:
+    data = workload(size)
+    print(f'{size} addresses; best of 5 runs')
+    print(f'{"function":<24}{"cold":>10}{"warm":>10}')
+    for name, func in cases(data).items():
+        cold = best(func, cold = True)
+        warm = best(func)
+        print(f'{name:<24}{cold * 1000:>8.2f}ms{warm * 1000:>8.2f}ms')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,106 @@
+"""
+Runs full refreshes against a local fake PageSeeder with synthetic data,
+and reports the time taken by each phase.
+
+The first run uploads every document, and later runs only upload what changed.
+The app directory is pointed at a temporary copy holding only the files netdox ships with,
+so the config, keys and caches of the installed app are never read or written.
+
+Usage: python benchmarks/refresh.py [domains] [runs] [latency]
+"""
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from types import ModuleType
+
+SHIPPED = ('psml.xsd', 'templates', 'defaults')
+"""Files in the src directory of the app that the benchmark needs."""
+
+def appdir() -> str:
+    """Creates a temporary app directory and sets NETDOX_APPDIR to it. Must run before netdox is imported."""
+    path = tempfile.mkdtemp(prefix = 'netdox-benchmark-')
+    source = os.path.join(importlib.util.find_spec('netdox').submodule_search_locations[0], 'src')
+    for name in SHIPPED:
+        if os.path.isdir(os.path.join(source, name)):
+            shutil.copytree(os.path.join(source, name), os.path.join(path, 'src', name))
+        else:
+            os.makedirs(os.path.join(path, 'src'), exist_ok = True)
+            shutil.copyfile(os.path.join(source, name), os.path.join(path, 'src', name))
+    for name in ('cfg', 'out', 'logs'):
+        os.mkdir(os.path.join(path, name))
+    os.environ['NETDOX_APPDIR'] = path
+    return path
+
+APPDIR = appdir()
+
+from cryptography.fernet import Fernet
+from netdox import Network, dns, pageseeder, utils
+from netdox.app import App, LifecycleStage, Plugin
+from netdox.config import NetworkConfig
+
+from fakeps import FakePageSeeder, export_zip
+
+def populate(network: Network, size: int) -> None:
+    for i in range(size):
+        private = f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}'
+        domain = dns.Domain(network, f'host{i}.example.com', zone = 'example.com')
+        domain.link(private, 'benchmark')
+        domain.link(dns.Domain(network, f'host{i}.example.net', zone = 'example.net'), 'benchmark')
+        network.ips[private].translate(f'103.{(i >> 8) & 255}.{i & 255}.1', 'benchmark')
+
+def plugin(size: int) -> Plugin:
+    module = ModuleType('benchmark')
+    module.__stages__ = {LifecycleStage.DNS: lambda network: populate(network, size)}
+    return Plugin(module)
+
+def remote(size: int) -> bytes:
+    """Returns an export of the network a previous refresh would have uploaded."""
+    network = Network(config = NetworkConfig())
+    populate(network, size)
+    return export_zip(network)
+
+def configure(credentials: dict) -> None:
+    """Writes a key, config and plugin list for the fake to the temporary app directory."""
+    assert utils.APPDIR.startswith(APPDIR), 'netdox was imported before NETDOX_APPDIR was set'
+    with open(utils.APPDIR + 'src/.crpt', 'wb') as stream:
+        stream.write(Fernet.generate_key())
+    with tempfile.NamedTemporaryFile('w', suffix = '.json', delete = False) as stream:
+        stream.write(json.dumps({'pageseeder': credentials, 'plugins': {}}))
+    utils.encrypt_file(stream.name, utils.CFGPATH)
+    with open(utils.APPDIR + 'cfg/plugins.json', 'w') as stream:
+        stream.write('[]')
+    open(utils.APPDIR + 'src/warnings.log', 'a').close()
+    pageseeder.clear_auth()
+
+def main(size: int, runs: int, latency: float) -> None:
+    logging.basicConfig(level = logging.ERROR)
+    fake = FakePageSeeder(latency = latency, documents = size * 4, export = remote(size))
+    with fake:
+        configure(fake.credentials())
+        app = App()
+        app.plugin_mgr.add(plugin(size))
+
+        print(f'{size} domains, {latency * 1000:.0f}ms latency')
+        for run in range(runs):
+            app.refresh(full = run == 0)
+            print(f'\nrun {run + 1}' + (' (full upload)' if run == 0 else ''))
+            for phase, seconds in app.timings.items():
+                print(f'{phase:<24}{seconds:>8.3f}s')
+
+        print(f'\n{sum(fake.requests.values())} requests, {fake.uploaded:,}B uploaded')
+        for endpoint, count in fake.requests.most_common():
+            print(f'{endpoint:<24}{count:>8}')
+
+if __name__ == '__main__':
+    try:
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 2,
+            float(sys.argv[3]) if len(sys.argv) > 3 else 0.005
+        )
+    finally:
+        shutil.rmtree(APPDIR)
@@ -0,0 +1,48 @@
+"""
+Compares dumping and loading a synthetic network as a snapshot and as a pickle.
+
+Usage: python benchmarks/snapshot.py [domains]
+"""
+import pickle
+import sys
+import time
+
+from netdox import Network, dns, nodes, snapshot
+from netdox.config import NetworkConfig
+
+
+def build(size: int) -> Network:
+    network = Network(config = NetworkConfig())
+    for i in range(size):
+        private = f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}'
+        domain = dns.Domain(network, f'host{i}.example.com', zone = 'example.com')
+        domain.link(private, 'benchmark')
+        domain.link(dns.Domain(network, f'host{i}.example.net', zone = 'example.net'), 'benchmark')
+        network.ips[private].translate(f'103.{(i >> 8) & 255}.{i & 255}.1', 'benchmark')
+        if i % 4 == 0:
+            nodes.Node(network, f'node{i}', f'node{i}', [domain.name], [private])
+    return network
+
+def timed(label: str, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f'{label:<24}{time.perf_counter() - start:>8.3f}s')
+    return result
+
+def main(size: int) -> None:
+    network = build(size)
+    print(f'{size} domains, {len(network.ips.objects)} ips, {len(network.nodes.objects)} nodes')
+
+    pickled = timed('pickle dump', pickle.dumps, network)
+    timed('pickle load', pickle.loads, pickled)
+    snap = timed('snapshot dump', snapshot.dumps, network)
+    timed('snapshot load', snapshot.loads, snap)
+    timed('snapshot load one', lambda: snapshot.Snapshot(snap).load_keys(
+        snapshot.KIND_DOMAIN, ['host0.example.com']))
+    timed('lazy load, one access', lambda: snapshot.LazySnapshot(snap).load()
+        .domains['host0.example.com'].links)
+
+    print(f'pickle size: {len(pickled):,}B, snapshot size: {len(snap):,}B')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
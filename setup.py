@@ -50,5 +50,8 @@ setup(
         'pysnmp',               # snmp
         'plantuml'              # plantuml
     ],
+    extras_require = {
+        'numpy': ['numpy'],     # vectorised IPv4 operations
+    },
     entry_points = {'console_scripts': ['netdox=netdox.cli:parse_args']}
 )
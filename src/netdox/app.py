@@ -7,13 +7,17 @@ import os
 import pkgutil
 from enum import Enum
 import shutil
+import time
+from contextlib import contextmanager
 from traceback import format_exc
 from types import ModuleType
-from typing import Callable, Iterator, Optional, Type
+from typing import Callable, Collection, Iterator, Optional, Type
 from zipfile import ZipFile
 
 from netdox import config, containers, utils
+from netdox.archive import ZipBuilder
 from netdox.helpers import Counter, LabelDict, Report
+from netdox.manifest import UploadManifest, docid_of
 from netdox.nodes import Node
 from netdox import pageseeder
 
@@ -217,6 +221,13 @@ class PluginManager:
         """
         return { file for plugin in self.plugins for file in plugin.output }
 
+    @property
+    def remote(self) -> set[str]:
+        """
+        Returns a set of the names of directories on the remote server the running plugins read documents from.
+        """
+        return { dir for plugin in self.plugins for dir in plugin.remote }
+
     @property
     def nodes(self) -> set[Type[Node]]:
         """
@@ -276,6 +287,8 @@ class Plugin:
     """A list of the Node subclasses that this plugin exports."""
     output: set[str]
     """A set of the files and directory names this plugin writes output to."""
+    remote: set[str]
+    """A set of the directory names on the remote server this plugin reads documents from."""
 
     def __init__(self, module: ModuleType) -> None:
         self.module = module
@@ -285,6 +298,7 @@ class Plugin:
         self.dependencies = set(getattr(module, '__depends__', set()))
         self.node_types = list(getattr(module, '__nodes__', []))
         self.output = set(getattr(module, '__output__', []))
+        self.remote = set(getattr(module, '__remote__', []))
 
     def init(self) -> None:
         """Performs any required initialisation for the plugin."""
@@ -305,13 +319,54 @@ class LifecycleStage(Enum):
 class App:
     plugin_mgr: PluginManager
     """The PluginManager object."""
-    APP_OUTDIRS = ('domains', 'ips', 'nodes')
+    APP_OUTDIRS = ('domains', 'ips', 'nodes', 'subnets')
     """Tuple of directories documents will be written to. 
     Relative to the output directory / PageSeeder website context."""
     REPORT_OUTPATH = ''
+    timings: dict[str, float]
+    """Maps the name of each phase of the last refresh to the seconds it took."""
+    METRICS_OUTPATH = os.path.join(utils.APPDIR, 'src', 'metrics')
+    """Absolute path to write the metrics of the last refresh to, without an extension."""
 
     def __init__(self) -> None:
         self.plugin_mgr = PluginManager()
+        self.timings = {}
+
+    @contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        """
+        Records the time taken by the enclosed phase of a refresh in *timings*.
+
+        :param name: The name of the phase.
+        :type name: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def export_metrics(self, network: containers.Network) -> None:
+        """
+        Adds the timings of the last refresh to the metrics of *network*,
+        and writes them in the Prometheus text format and as JSON.
+
+        :param network: The network that was refreshed.
+        :type network: containers.Network
+        """
+        phases = network.counter.gauge('netdox_refresh_phase_seconds', 
+            'Seconds taken by each phase of the last refresh.', ('phase',))
+        for phase, seconds in self.timings.items():
+            phases.set(seconds, (phase,))
+
+        with open(self.METRICS_OUTPATH + '.prom', 'w') as stream:
+            stream.write(network.counter.to_prometheus())
+        with open(self.METRICS_OUTPATH + '.json', 'w') as stream:
+            stream.write(network.counter.to_json())
+
+    def _run_stage(self, network: containers.Network, stage: LifecycleStage) -> None:
+        with self._phase(f'stage:{stage.name.lower()}'):
+            self.plugin_mgr.runStage(network, stage)
 
     @property
     def output(self) -> set[str]:
@@ -375,6 +430,9 @@ class App:
     def download_network(self) -> containers.Network:
         """
         Downloads the network from the remote server and returns it.
+        The documents are parsed straight from the downloaded ZIP.
+        Only the directories that plugins read documents from are extracted,
+        to ``src/remote``.
 
         :return: A Network object instantiated from PSML.
         :rtype: containers.Network
@@ -386,84 +444,173 @@ class App:
             else:
                 os.remove(download_dir)
 
-        pageseeder.download_dir('website', download_dir)
-        return containers.Network.from_psml(download_dir, self.plugin_mgr.nodes)
+        with pageseeder.download_export('website') as stream, ZipFile(stream) as zip:
+            remote = self.plugin_mgr.remote
+            members = [name for name in zip.namelist() if name.split('/', 1)[0] in remote]
+            if members:
+                zip.extractall(download_dir, members)
+            return containers.Network.from_zip(zip, self.plugin_mgr.nodes)
+
+    def output_files(self) -> dict[str, str]:
+        """
+        Returns the files in the output directories.
+
+        :return: A dict mapping the path of each file relative to the output directory
+        to its absolute path.
+        :rtype: dict[str, str]
+        """
+        files = {}
+        for file in self.output:
+            if file == 'hardware':
+                continue
+            abspath = os.path.join(utils.OUTDIR, file)
+            if os.path.isdir(abspath):
+                for child in utils.path_list(abspath, utils.OUTDIR):
+                    files[child] = os.path.join(utils.OUTDIR, child)
+            else:
+                files[file] = abspath
+        return files
 
-    def zip_output(self, outpath: Optional[str] = None) -> ZipFile:
+    def zip_output(self, 
+            outpath: Optional[str] = None, 
+            level: int = 6, 
+            include: Optional[Collection[str]] = None
+        ) -> ZipFile:
         """
         Creates a ZIP from the output directories and writes it to *outpath*.
 
         :param outpath: The absolute path to output the zip file to, 
         defaults to '$APPDIR/src/netdox-psml.zip'
         :type outpath: str, optional
+        :param level: The deflate compression level, from 0 to 9, defaults to 6
+        :type level: int, optional
+        :param include: Paths relative to the output directory of the only files to include,
+        defaults to None (all files).
+        :type include: Collection[str], optional
         :return: The closed ZipFile.
         :rtype: ZipFile
         """
         outpath = outpath or os.path.join(
             utils.APPDIR, 'src', 'netdox-psml.zip')
-        with ZipFile(outpath, mode = 'w') as zip:
-            for file in self.output:
-                if file == 'hardware':
-                    continue
-                abspath = os.path.join(utils.OUTDIR, file)
-                if os.path.isdir(abspath):
-                    for child in utils.path_list(abspath, utils.OUTDIR):
-                        zip.write(os.path.join(utils.OUTDIR, child), child)
-                else:
-                    try:
-                        zip.write(abspath, file)
-                    except FileNotFoundError:
-                        logger.error(f'Output item does not exist: {abspath}')
-        return zip
-
-    def refresh(self, dry: bool = False) -> None:
+        builder = ZipBuilder(outpath, level)
+        for arcname, abspath in self.output_files().items():
+            if include is None or arcname in include:
+                builder.add(abspath, arcname)
+        return builder.build()
+
+    def _upload_delta(self, 
+            remote_network: Optional[containers.Network], 
+            dry: bool = False,
+            full: bool = False
+        ) -> None:
+        """
+        Uploads the documents that have changed since the last successful upload,
+        and archives the documents that have been removed since then.
+        The upload manifest is only updated if the upload completes.
+
+        :param remote_network: The network downloaded from the remote server.
+        Documents for objects missing from it are always uploaded.
+        :type remote_network: Optional[containers.Network]
+        :param dry: Whether to skip uploading, defaults to False
+        :type dry: bool, optional
+        :param full: Whether to upload every document, defaults to False
+        :type full: bool, optional
+        """
+        files = self.output_files()
+        manifest = UploadManifest() if full else UploadManifest.load()
+        force = []
+        if remote_network is not None:
+            remote = {nwobj.docid for nwobj in (
+                *remote_network.domains, *remote_network.ips, *remote_network.nodes)}
+            force = [arcname for arcname in files 
+                if arcname.split(os.sep, 1)[0] in containers.PSML_DIRS
+                and docid_of(arcname) not in remote]
+        delta = manifest.diff(files, force)
+        logger.info(f'{len(delta.changed)} of {len(files)} documents changed, '
+            + f'{len(delta.removed)} removed since the last upload.')
+
+        zip = self.zip_output(include = set(delta.changed))
+        if dry:
+            logger.warning('Did not upload documents due to --dry-run flag.')
+            return
+        if not delta:
+            logger.info('No documents to upload.')
+            return
+
+        if delta.changed:
+            thread = pageseeder.zip_upload(zip.filename, 'website')
+            if thread is None or thread.status != 'completed':
+                logger.error('Upload did not complete; upload manifest was not updated.')
+                return
+        failed: set[str] = set()
+        if delta.removed_docids:
+            failed = set(pageseeder.archive_docids(delta.removed_docids))
+
+        # documents that failed to archive stay in the manifest, so they are archived next time
+        manifest.update(delta, keep = [name for name in delta.removed if docid_of(name) in failed])
+        manifest.save()
+
+    def refresh(self, dry: bool = False, full: bool = False) -> None:
+        """
+        Generates a new set of documentation and uploads it to PageSeeder.
+
+        :param dry: Whether to skip uploading the documents, defaults to False
+        :type dry: bool, optional
+        :param full: Whether to upload every document, 
+        instead of only those changed since the last upload. Defaults to False
+        :type full: bool, optional
+        """
 
         # Initialisation                                                    #
-        self.output_clean()
+        self.timings = {}
+        start = time.perf_counter()
 
-        try:
-            location_path = os.path.join(utils.APPDIR, 'cfg', 'locations.json')
-            with open(location_path, 'r') as stream:
-                locations = json.loads(stream.read())
-            for key in locations:
-                locations[key] = set(locations[key])
-        except FileNotFoundError:
-            locations = {}
-        except Exception as exc:
-            logger.exception('Failed to read location config.', exc_info = exc)
-            locations = {}
+        with self._phase('initialise'):
+            self.output_clean()
 
-        network = containers.Network(
-            config = self.fetch_config(), 
-            labels = LabelDict.from_pageseeder(),
-            locations = locations
-        )
+            try:
+                location_path = os.path.join(utils.APPDIR, 'cfg', 'locations.json')
+                with open(location_path, 'r') as stream:
+                    locations = json.loads(stream.read())
+                for key in locations:
+                    locations[key] = set(locations[key])
+            except FileNotFoundError:
+                locations = {}
+            except Exception as exc:
+                logger.exception('Failed to read location config.', exc_info = exc)
+                locations = {}
+
+            network = containers.Network(
+                config = self.fetch_config(), 
+                labels = LabelDict.from_pageseeder(),
+                locations = locations
+            )
 
         if dry: 
             logger.info('Refresh running as dry run: no documents will be uploaded.')
             remote_network = None
         else:
             logger.debug('Downloading network from remote.')
-            remote_network = self.download_network()
+            with self._phase('download'):
+                remote_network = self.download_network()
 
-        self.plugin_mgr.runStage(network, LifecycleStage.INIT)
+        self._run_stage(network, LifecycleStage.INIT)
 
         #-------------------------------------------------------------------#
         # Primary data-gathering stages                                     #
         #-------------------------------------------------------------------#
         
-        self.plugin_mgr.runStage(network, LifecycleStage.DNS)
-        self.plugin_mgr.runStage(network, LifecycleStage.NAT)
-        self.plugin_mgr.runStage(network, LifecycleStage.NODES)
+        self._run_stage(network, LifecycleStage.DNS)
+        self._run_stage(network, LifecycleStage.NAT)
+        self._run_stage(network, LifecycleStage.NODES)
 
         #-------------------------------------------------------------------#
-        # Generate objects for unused private IPs in used subnets,          #
+        # Record the unused private IPs in used subnets,                    #
         # run any pre-write plugins                                         #
         #-------------------------------------------------------------------#
 
-        logger.warning('Filling subnets is disabled!')
-        # network.ips.fillSubnets()
-        self.plugin_mgr.runStage(network, LifecycleStage.FOOTERS)
+        network.ips.fillSubnets()
+        self._run_stage(network, LifecycleStage.FOOTERS)
 
         #-------------------------------------------------------------------#
         # Write Network to pickle and psml,                                 #
@@ -471,23 +618,25 @@ class App:
         # and run any post-write plugins                                    #
         #-------------------------------------------------------------------#
 
-        self.plugin_mgr.runStage(network, LifecycleStage.WRITE)
-        network.report.addSection(network.dns_report())
-
-        # network.report.addSection(
-        #     utils.stale_report(pageseeder.findStale(self.output)))
-
-        with open(utils.APPDIR + 'src/warnings.log', 'r') as stream:
-            network.report.logs = stream.read()
-        network.report.addSection(str(network.counter.generate_report()))
-        network.report.writeReport()
-        
-        if remote_network is not None:
-            logger.debug('Copying notes from remote network.')
-            network.copy_notes(remote_network)
-        
-        network.dump()
-        network.writePSML()
+        self._run_stage(network, LifecycleStage.WRITE)
+
+        with self._phase('write'):
+            network.report.addSection(network.dns_report())
+
+            # network.report.addSection(
+            #     utils.stale_report(pageseeder.findStale(self.output)))
+
+            with open(utils.APPDIR + 'src/warnings.log', 'r') as stream:
+                network.report.logs = stream.read()
+            network.report.addSection(str(network.counter.generate_report()))
+            network.report.writeReport()
+            
+            if remote_network is not None:
+                logger.debug('Copying notes from remote network.')
+                network.copy_notes(remote_network)
+            
+            network.dump()
+            network.writePSML()
  
         #-------------------------------------------------------------------#
         # Zip, upload, and cleanup                                          #
@@ -497,12 +646,13 @@ class App:
             {str(k): str(v) for k, v in network.counter.counts.items()}, 
         indent = 2))
 
-        zip = self.zip_output()
-        if not dry:
-            pageseeder.zip_upload(zip.filename, 'website')
-        else:
-            logger.warning('Did not upload documents due to --dry-run flag.')
+        with self._phase('upload'):
+            self._upload_delta(remote_network, dry, full)
 
-        self.plugin_mgr.runStage(network, LifecycleStage.CLEANUP)
+        self._run_stage(network, LifecycleStage.CLEANUP)
 
+        self.timings['total'] = time.perf_counter() - start
+        logger.info('Refresh timings: ' + ', '.join(
+            f'{phase} {seconds:.2f}s' for phase, seconds in self.timings.items()))
+        self.export_metrics(network)
         logger.info('Done.')
@@ -0,0 +1,359 @@
+"""
+This module contains a ZIP builder that compresses members in parallel.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import BinaryIO, Optional
+from zipfile import (ZIP64_LIMIT, ZIP64_VERSION, ZIP_DEFLATED, ZIP_FILECOUNT_LIMIT,
+    ZIP_STORED, ZipFile, ZipInfo, stringCentralDir, stringEndArchive, stringEndArchive64,
+    stringEndArchive64Locator, structCentralDir, structEndArchive, structEndArchive64,
+    structEndArchive64Locator)
+
+logger = logging.getLogger(__name__)
+
+STORED_EXTENSIONS = frozenset((
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.zip', '.gz', '.bz2', '.xz'))
+"""Extensions of files that are already compressed, and are stored as-is."""
+COPY_CHUNK_SIZE = 1 << 20
+"""Size of the chunks a deduplicated payload is copied in."""
+
+
+@dataclass
+class ArchiveStats:
+    """Statistics describing a built archive."""
+    members: int = 0
+    """Number of members in the archive."""
+    stored: int = 0
+    """Number of members that were stored without compression."""
+    deduplicated: int = 0
+    """Number of members whose payload was compressed for an earlier, identical member."""
+    input_bytes: int = 0
+    """Total size of the members before compression."""
+    output_bytes: int = 0
+    """Total size of the members after compression."""
+    seconds: float = 0.0
+    """Time taken to build the archive."""
+
+    @property
+    def ratio(self) -> float:
+        """Compressed size as a fraction of the uncompressed size."""
+        return (self.output_bytes / self.input_bytes) if self.input_bytes else 1.0
+
+    def __str__(self) -> str:
+        return (
+            f'{self.members} members ({self.stored} stored, {self.deduplicated} deduplicated), '
+            f'{self.input_bytes:,}B -> {self.output_bytes:,}B '
+            f'(ratio {self.ratio:.2f}) in {self.seconds:.2f}s'
+        )
+
+
+@dataclass(frozen = True)
+class _Payload:
+    """A compressed member payload."""
+    key: bytes
+    """Hash of the content and compression type."""
+    data: Optional[bytes]
+    """The compressed data, or None if it is copied from an identical member already written."""
+    compress_type: int
+    crc: int
+    size: int
+
+
+@dataclass(frozen = True)
+class _Written:
+    """Where the payload of a member was written in the archive."""
+    offset: int
+    length: int
+    crc: int
+    size: int
+
+
+@dataclass
+class _Member:
+    path: str
+    arcname: str
+    future: Optional[Future] = field(default = None, compare = False)
+    deduplicated: bool = False
+
+
+class ZipBuilder:
+    """
+    Builds a ZIP archive, compressing members in worker threads.
+
+    Members that are already compressed (e.g. JPEG or PNG images) are stored,
+    and all others are deflated.
+    Identical payloads are only compressed once:
+    members identical to one already written copy its payload back from the archive,
+    so no payload is held in memory after it is written.
+    Each member still gets its own copy of the payload,
+    as some unzip tools reject members that share their data.
+    """
+    outpath: str
+    """Path to write the archive to."""
+    level: int
+    """The deflate compression level, from 0 to 9."""
+    workers: int
+    """The number of threads to compress members in."""
+    stats: ArchiveStats
+    """Statistics for the most recent build."""
+
+    def __init__(self, outpath: str, level: int = 6, workers: int = None) -> None:
+        """
+        Constructor.
+
+        :param outpath: Path to write the archive to.
+        :type outpath: str
+        :param level: The deflate compression level, from 0 to 9, defaults to 6
+        :type level: int, optional
+        :param workers: The number of threads to compress members in,
+        defaults to the number of CPUs.
+        :type workers: int, optional
+        """
+        if not 0 <= level <= 9:
+            raise ValueError(f'Invalid compression level: {level}')
+        self.outpath = outpath
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self.stats = ArchiveStats()
+        self._members: list[_Member] = []
+        self._pending: dict[bytes, Future] = {}
+        self._written: dict[bytes, _Written] = {}
+        self._lock = Lock()
+
+    def add(self, path: str, arcname: str = None) -> None:
+        """
+        Adds a file to the archive.
+
+        :param path: Path to the file.
+        :type path: str
+        :param arcname: Name of the file in the archive, defaults to *path*.
+        :type arcname: str, optional
+        """
+        self._members.append(_Member(path, arcname or path))
+
+    def _compress_type(self, arcname: str) -> int:
+        if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+            return ZIP_STORED
+        return ZIP_DEFLATED
+
+    def _compress(self, key: bytes, data: bytes, compress_type: int) -> _Payload:
+        if compress_type == ZIP_DEFLATED:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            compressed = compressor.compress(data) + compressor.flush()
+        else:
+            compressed = data
+        return _Payload(key, compressed, compress_type, zlib.crc32(data), len(data))
+
+    def _load(self, member: _Member) -> _Payload:
+        """
+        Reads and compresses a member, reusing the payload of an identical member.
+        """
+        with open(member.path, 'rb') as stream:
+            data = stream.read()
+        compress_type = self._compress_type(member.arcname)
+        key = hashlib.blake2b(data, digest_size = 16).digest() + bytes([compress_type])
+        with self._lock:
+            written = self._written.get(key)
+            pending = self._pending.get(key) if written is None else None
+            owner = written is None and pending is None
+            if owner:
+                pending = self._pending[key] = Future()
+
+        if written is not None:
+            member.deduplicated = True
+            return _Payload(key, None, compress_type, written.crc, written.size)
+        assert pending is not None
+        if not owner:
+            member.deduplicated = True
+            return pending.result()
+        try:
+            payload = self._compress(key, data, compress_type)
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(exc)
+            raise
+        pending.set_result(payload)
+        return payload
+
+    def build(self) -> ZipFile:
+        """
+        Writes the archive to *outpath*.
+
+        :return: The closed ZipFile.
+        :rtype: ZipFile
+        """
+        start = time.perf_counter()
+        self.stats = ArchiveStats()
+        self._pending.clear()
+        self._written.clear()
+        window = self.workers * 4
+        with ThreadPoolExecutor(self.workers) as pool, _ZipWriter(self.outpath) as zip:
+            for i, member in enumerate(self._members):
+                member.future = pool.submit(self._load, member)
+                if i >= window:
+                    self._write(zip, self._members[i - window])
+            for member in self._members[max(0, len(self._members) - window):]:
+                self._write(zip, member)
+
+        self._pending.clear()
+        self._written.clear()
+        self.stats.seconds = time.perf_counter() - start
+        logger.info(f'Built archive {self.outpath}: {self.stats}')
+        with ZipFile(self.outpath) as archive:
+            return archive
+
+    def _write(self, zip: _ZipWriter, member: _Member) -> None:
+        """
+        Writes the payload of a member to the archive.
+        """
+        assert member.future is not None
+        try:
+            payload: _Payload = member.future.result()
+        except FileNotFoundError:
+            logger.error(f'Output item does not exist: {member.path}')
+            return
+        finally:
+            member.future = None
+
+        zinfo = ZipInfo.from_file(member.path, member.arcname)
+        zinfo.compress_type = payload.compress_type
+        zinfo.CRC = payload.crc
+        zinfo.file_size = payload.size
+        with self._lock:
+            written = self._written.get(payload.key)
+        if payload.data is None:
+            assert written is not None
+            zinfo.compress_size = written.length
+            zip.copy(zinfo, written.offset)
+        else:
+            zinfo.compress_size = len(payload.data)
+            offset = zip.write(zinfo, payload.data)
+            if written is None:
+                with self._lock:
+                    self._written[payload.key] = _Written(
+                        offset, len(payload.data), payload.crc, payload.size)
+                    self._pending.pop(payload.key, None)
+
+        self.stats.members += 1
+        self.stats.stored += payload.compress_type == ZIP_STORED
+        self.stats.deduplicated += member.deduplicated
+        self.stats.input_bytes += payload.size
+        self.stats.output_bytes += zinfo.compress_size
+
+
+class _ZipWriter:
+    """
+    Writes a ZIP archive of members that have already been compressed.
+    zipfile can only write members it compresses itself, so this writes the records
+    with the header and struct helpers it exposes, in the same layout as ZipFile.
+    """
+    def __init__(self, path: str) -> None:
+        self._fp: BinaryIO = open(path, 'w+b')
+        self._members: list[ZipInfo] = []
+
+    def __enter__(self) -> _ZipWriter:
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        try:
+            if exc_type is None:
+                self._write_end()
+        finally:
+            self._fp.close()
+
+    def write(self, zinfo: ZipInfo, data: bytes) -> int:
+        """
+        Writes a member with its compressed data.
+
+        :return: The offset of the data in the archive.
+        """
+        offset = self._header(zinfo)
+        self._fp.write(data)
+        return offset
+
+    def copy(self, zinfo: ZipInfo, offset: int) -> None:
+        """
+        Writes a member whose compressed data is a copy of *zinfo.compress_size* bytes
+        already written at *offset*.
+        """
+        target = self._header(zinfo)
+        remaining = zinfo.compress_size
+        while remaining:
+            self._fp.seek(offset)
+            chunk = self._fp.read(min(remaining, COPY_CHUNK_SIZE))
+            self._fp.seek(target)
+            self._fp.write(chunk)
+            offset += len(chunk)
+            target += len(chunk)
+            remaining -= len(chunk)
+
+    def _header(self, zinfo: ZipInfo) -> int:
+        self._fp.seek(0, os.SEEK_END)
+        zinfo.header_offset = self._fp.tell()
+        self._fp.write(zinfo.FileHeader())
+        self._members.append(zinfo)
+        return self._fp.tell()
+
+    def _write_end(self) -> None:
+        """
+        Writes the central directory and end of archive records.
+        """
+        self._fp.seek(0, os.SEEK_END)
+        start = self._fp.tell()
+        for zinfo in self._members:
+            self._central_record(zinfo)
+        end = self._fp.tell()
+
+        count, size, offset = len(self._members), end - start, start
+        if count > ZIP_FILECOUNT_LIMIT or offset > ZIP64_LIMIT or size > ZIP64_LIMIT:
+            self._fp.write(struct.pack(structEndArchive64, stringEndArchive64,
+                44, 45, 45, 0, 0, count, count, size, offset))
+            self._fp.write(struct.pack(structEndArchive64Locator,
+                stringEndArchive64Locator, 0, end, 1))
+            count, size, offset = min(count, 0xFFFF), min(size, 0xFFFFFFFF), min(offset, 0xFFFFFFFF)
+        self._fp.write(struct.pack(structEndArchive, stringEndArchive,
+            0, 0, count, count, size, offset, 0))
+
+    def _central_record(self, zinfo: ZipInfo) -> None:
+        dt = zinfo.date_time
+        dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+        dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+
+        zip64 = []
+        file_size, compress_size, header_offset = \
+            zinfo.file_size, zinfo.compress_size, zinfo.header_offset
+        if file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT:
+            zip64 += [file_size, compress_size]
+            file_size = compress_size = 0xFFFFFFFF
+        if header_offset > ZIP64_LIMIT:
+            zip64.append(header_offset)
+            header_offset = 0xFFFFFFFF
+        extra = zinfo.extra
+        version = 0
+        if zip64:
+            extra = struct.pack('<HH' + 'Q' * len(zip64), 1, 8 * len(zip64), *zip64) + extra
+            version = ZIP64_VERSION
+
+        try:
+            filename, flag_bits = zinfo.filename.encode('ascii'), zinfo.flag_bits
+        except UnicodeEncodeError:
+            filename, flag_bits = zinfo.filename.encode('utf-8'), zinfo.flag_bits | 0x800
+        self._fp.write(struct.pack(structCentralDir, stringCentralDir,
+            max(version, zinfo.create_version), zinfo.create_system,
+            max(version, zinfo.extract_version), zinfo.reserved, flag_bits,
+            zinfo.compress_type, dostime, dosdate, zinfo.CRC, compress_size, file_size,
+            len(filename), len(extra), len(zinfo.comment), 0,
+            zinfo.internal_attr, zinfo.external_attr, header_offset))
+        self._fp.write(filename)
+        self._fp.write(extra)
+        self._fp.write(zinfo.comment)
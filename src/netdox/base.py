@@ -8,7 +8,6 @@ import os
 import re
 import copy
 from abc import ABC, ABCMeta, abstractmethod
-from functools import lru_cache
 from typing import (TYPE_CHECKING, Generic, Iterable, Iterator, Optional, Type,
                     TypeVar, Union)
 
@@ -18,6 +17,7 @@ from netdox import psml
 
 if TYPE_CHECKING:
     from netdox import Network
+    from netdox.config import NetworkConfig
     
 logger = logging.getLogger(__name__)
 
@@ -25,6 +25,26 @@ logger = logging.getLogger(__name__)
 # Objects #
 ###########
 
+FOOTER_PATTERN = re.compile(r'<section id="footer"\s*/>')
+"""Matches the empty footer section in a document template."""
+NOTES_PATTERN = re.compile(r'<section( id="notes"[^>]*?)\s*/>')
+"""Matches the empty notes section in a document template."""
+
+def _search_footer(terms: list[str]) -> bytes:
+    """
+    Returns a footer section containing the search terms property, as bytes.
+    Equivalent to serialising the psml classes, without building any tags.
+    """
+    if terms:
+        values = ''.join(f'<value>{escape(term)}</value>' for term in terms)
+        prop = f'<property multiple="true" name="terms" title="Search Terms">{values}</property>'
+    else:
+        prop = '<property name="terms" title="Search Terms"/>'
+    return (
+        '<section id="footer"><properties-fragment id="search" labels="s-hide-content">'
+        f'{prop}</properties-fragment></section>'
+    ).encode('utf-8')
+
 class NetworkObjectMeta(ABCMeta):
     """
     Metaclass for an object belonging to a Network.
@@ -55,22 +75,31 @@ class NetworkObject(metaclass=NetworkObjectMeta):
     """A unique, predictable identifier to be used for retrieving objects from NWObjContainers"""
     network: Network
     """The containing network."""
-    psmlFooter: psml.Section
-    """A PSML section to be inserted at the footer of the document."""
+    _footer: Optional[psml.Section]
+    """The parsed footer section, or None if it has not been parsed yet."""
+    _raw_footer: Optional[bytes]
+    """The footer section as bytes, or None once it has been parsed."""
     labels: set[str]
     """A set of labels to apply to this object's output document."""
     DEFAULT_LABELS = ['show-reversexrefs', 'netdox-default']
     """A set of labels to apply to this object upon instantiation."""
-    _notes: psml.Fragment
-    """A string of content that is editable on the remote server."""
+    _notes: Optional[psml.Fragment]
+    """The parsed notes fragment, or None if it has not been parsed yet."""
+    _raw_notes: Optional[bytes]
+    """The notes fragment as bytes, or None once it has been parsed."""
     DEFAULT_NOTES = '<fragment id="notes"><para>—</para></fragment>'
     """String form of the default notes content."""
+    DEFAULT_RAW_NOTES = DEFAULT_NOTES.encode('utf-8')
+    """Bytes form of the default notes content, shared by all objects."""
     type: str
     """A string unique to each subclass of NetworkObject."""
     TEMPLATE: str
     """The template to populate during serialisation."""
     _organization: Optional[str]
     """A fallback value for the organization of this object."""
+    _label_attrs: Optional[tuple[NetworkConfig, frozenset[str], dict[str, str]]] = None
+    """The config and labels the label attributes of this object were last resolved from,
+    and the attributes."""
 
     ## dunder methods
 
@@ -99,20 +128,13 @@ class NetworkObject(metaclass=NetworkObjectMeta):
         self.identity = identity.lower()
         self._organization = None
         
-        self.psmlFooter = psml.Section('footer', fragments = [
-            psml.PropertiesFragment(id = 'search', properties = [
-                psml.Property(
-                    name = 'terms', 
-                    title = 'Search Terms', 
-                    value = self.search_terms
-            )], attrs = {'labels':'s-hide-content'})
-        ])
+        self._footer = None
+        self._raw_footer = _search_footer(self.search_terms)
         
         self.labels = self.network.labels[self.docid]
         self.labels.update(self.DEFAULT_LABELS)
         if labels: self.labels |= set(labels)
-        self.notes = notes or psml.Fragment.from_tag(
-            BeautifulSoup(self.DEFAULT_NOTES, 'xml').fragment)
+        self.notes = notes or self.DEFAULT_RAW_NOTES
 
     def __str__(self) -> str:
         cls = self.__class__
@@ -121,6 +143,19 @@ class NetworkObject(metaclass=NetworkObjectMeta):
     def __repr__(self) -> str:
         return str(self)
 
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop('_label_attrs', None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # objects pickled before notes and footers were stored as bytes
+        if 'psmlFooter' in state:
+            state['_footer'] = state.pop('psmlFooter')
+            state['_raw_footer'] = None
+        state.setdefault('_raw_notes', None)
+        self.__dict__.update(state)
+
     ## properties
 
     @property
@@ -137,10 +172,8 @@ class NetworkObject(metaclass=NetworkObjectMeta):
         :return: An integer (as a string), or None.
         :rtype: str
         """
-        for uri, labels in self.network.config.organizations.items():
-            if (self.labels & labels):
-                return uri
-        return self._organization
+        uri = self.network.config.label_organization(self.labels)
+        return self._organization if uri is None else uri
 
     @organization.setter
     def organization(self, value: str) -> None:
@@ -170,22 +203,78 @@ class NetworkObject(metaclass=NetworkObjectMeta):
     @property
     def notes(self) -> psml.Fragment:
         """
-        The notes that have been written for this object, escaped for XML.
+        The notes that have been written for this object.
+        Stored as bytes until this property is first accessed.
 
-        :return: A string that is safe as XML text.
-        :rtype: str
+        :return: A PSML fragment.
+        :rtype: psml.Fragment
         """
+        if self._notes is None:
+            self._notes = psml.Fragment.from_tag(BeautifulSoup(
+                self._raw_notes, 'xml', from_encoding = 'utf-8').fragment)
+            self._raw_notes = None
         return self._notes
 
     @notes.setter
-    def notes(self, val: psml.Fragment) -> None:
-        assert isinstance(val, psml.Fragment), f'Set notes to "{str(val)}"'
-        self._notes = val
+    def notes(self, val: Union[psml.Fragment, bytes]) -> None:
+        if isinstance(val, bytes):
+            self._notes, self._raw_notes = None, val
+        else:
+            assert isinstance(val, psml.Fragment), f'Set notes to "{str(val)}"'
+            self._notes, self._raw_notes = val, None
 
     @notes.deleter
     def notes(self) -> None:
-        self._notes = psml.Fragment.from_tag(
-            BeautifulSoup(self.DEFAULT_NOTES, 'xml').fragment)
+        self.notes = self.DEFAULT_RAW_NOTES
+
+    @property
+    def raw_notes(self) -> bytes:
+        """
+        The notes that have been written for this object, as bytes.
+        Does not parse the notes.
+
+        :return: A PSML fragment as bytes.
+        :rtype: bytes
+        """
+        if self._notes is None:
+            return self._raw_notes # type: ignore
+        return str(self._notes).encode('utf-8')
+
+    @property
+    def psmlFooter(self) -> psml.Section:
+        """
+        A PSML section to be inserted at the footer of the document.
+        Stored as bytes until this property is first accessed.
+
+        :return: A PSML section.
+        :rtype: psml.Section
+        """
+        if self._footer is None:
+            tag = BeautifulSoup(self._raw_footer, 'xml', from_encoding = 'utf-8').section
+            self._footer = psml.Section.from_tag(tag)
+            # keep the tag verbatim, it may not survive a round trip through the fragment classes
+            self._footer.tag = tag
+            self._raw_footer = None
+        return self._footer
+
+    @psmlFooter.setter
+    def psmlFooter(self, val: Union[psml.Section, bytes]) -> None:
+        if isinstance(val, bytes):
+            self._footer, self._raw_footer = None, val
+        else:
+            self._footer, self._raw_footer = val, None
+
+    @property
+    def raw_footer(self) -> bytes:
+        """
+        The footer section as bytes. Does not parse the footer.
+
+        :return: A PSML section as bytes.
+        :rtype: bytes
+        """
+        if self._footer is None:
+            return self._raw_footer # type: ignore
+        return str(self._footer).encode('utf-8')
 
     @property
     @abstractmethod
@@ -265,13 +354,16 @@ class NetworkObject(metaclass=NetworkObjectMeta):
             else:
                 body = re.sub(field, '—', body)
 
+        body = FOOTER_PATTERN.sub(lambda _: self.raw_footer.decode('utf-8'), body, 1)
+        body = NOTES_PATTERN.sub(
+            lambda match: f'<section{match[1]}>{self.raw_notes.decode("utf-8")}</section>', body, 1)
+
         soup = BeautifulSoup(body, features = 'xml')
         soup.find('labels').string = ','.join(self.labels)
-        soup.find('section', id = 'footer').replace_with(self.psmlFooter.tag)
-        soup.find('section', id = 'notes').append(self.notes.tag)
         
-        if self.organization: 
-            soup.find(attrs={'name':'org'}).append(psml.XRef(self.organization).tag)
+        organization = self.organization
+        if organization: 
+            soup.find(attrs={'name':'org'}).append(psml.XRef(organization).tag)
         else:
             org_prop = soup.find(attrs={'name':'org'})
             org_prop['datatype'] = 'string'
@@ -314,12 +406,27 @@ class NetworkObject(metaclass=NetworkObjectMeta):
         self.psmlFooter.extend(object.psmlFooter)
         self.labels |= object.labels
 
-        if str(self.notes) == self.DEFAULT_NOTES:
-            self.notes = psml.Fragment.from_tag(copy.copy(object.notes.tag))
+        if self.raw_notes == self.DEFAULT_RAW_NOTES:
+            self.notes = object.raw_notes
 
         return self
 
-    @lru_cache(maxsize = None)
+    @property
+    def label_attrs(self) -> dict[str, str]:
+        """
+        The attributes set on the labels of this object in the config.
+        Resolved from the label set when first needed, and again after the labels change.
+
+        :return: A dict mapping attributes to their values. Should not be modified.
+        :rtype: dict[str, str]
+        """
+        config = self.network.config
+        cached = self._label_attrs
+        if cached is None or cached[0] is not config or cached[1] != self.labels:
+            labels = frozenset(self.labels)
+            cached = self._label_attrs = (config, labels, config.label_attrs(labels))
+        return cached[2]
+
     def getAttr(self, attr: str) -> Union[str, None]: # TODO rename get_attr
         """
         Returns the value of *attr* for the first label on this object that it is configured on.
@@ -332,11 +439,7 @@ class NetworkObject(metaclass=NetworkObjectMeta):
         :return: The single unique value, or None.
         :rtype: Union[str, None]
         """
-        for label in self.network.config.labels:
-            if label in self.labels:
-                val = self.network.config.labels[label][attr]
-                if val: return val
-        return None
+        return self.label_attrs.get(attr)
 
 NWObjT = TypeVar('NWObjT', bound = NetworkObject)
 
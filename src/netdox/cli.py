@@ -156,6 +156,7 @@ def _load_config(path: str) -> bool:
         if os.path.exists(CFGPATH):
             shutil.copyfile(CFGPATH, backup)
         encrypt_file(path, CFGPATH)
+        pageseeder.clear_auth()
         try:
             assert pageseeder.get_group()
         except Exception as exc:
@@ -215,7 +216,7 @@ def refresh(args: argparse.Namespace):
     logger.addHandler(debugHandler)
     logger.addHandler(warningHandler)
     logger.debug(f'Refresh begins with Netdox version v{pkg_version("netdox")}')
-    App().refresh(dry = args.dry_run)
+    App().refresh(dry = args.dry_run, full = args.full)
 
 ## Crypto
 
@@ -265,6 +266,7 @@ def parse_args():
     refresh_parser = subparsers.add_parser('refresh', help = 'Generates a new set of documentation and uploads it to PageSeeder.')
     refresh_parser.set_defaults(func = refresh)
     refresh_parser.add_argument('-d', '--dry-run', action = 'store_true', help = 'do not upload documents at the end of the refresh')
+    refresh_parser.add_argument('-f', '--full', action = 'store_true', help = 'upload every document, not only those changed since the last upload')
 
     encrypt_parser = subparsers.add_parser('encrypt', help = 'Encrypts a file.')
     encrypt_parser.add_argument('inpath', type = pathlib.Path, help = 'path to a file to encrypt.')
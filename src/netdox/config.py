@@ -7,13 +7,13 @@ import json
 import logging
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Iterable, Optional
 
 from bs4 import BeautifulSoup
 from lxml import etree
 from requests import Response
 
-from netdox import app, pageseeder, psml, utils
+from netdox import app, names, pageseeder, psml, utils
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +35,7 @@ class NetworkConfig:
     SUBNET_SECTION_ID = 'subnets'
     """ID of the subnets section in PSML."""
     exclusions: set[str]
-    """Set of FQDNs to exclude from the network."""
+    """Set of FQDNs to exclude from the network, in canonical form."""
     labels: dict[str, dict]
     """A dictionary mapping document label names to a map of attributes."""
     organizations: dict[str, set[str]]
@@ -49,10 +49,19 @@ class NetworkConfig:
             organizations: dict[str, set[str]] = None,
             subnets: dict[str, str] = None
         ) -> None:
-        self.exclusions = set(exclusions)
+        self.exclusions = {names.canonical(name) for name in exclusions}
         self.labels = labels or {}
         self.organizations = organizations or {}
         self.subnets = subnets or {}
+        self._compile_labels()
+        self._index_organizations()
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if '_label_priority' not in state:
+            self._compile_labels()
+        if '_org_index' not in state:
+            self._index_organizations()
 
     @property
     def is_empty(self) -> bool:
@@ -91,6 +100,69 @@ class NetworkConfig:
         for label, old in self.labels.items():
             self.labels[label] = dict.fromkeys(attrs) | {
                 key: value for key, value in old.items() if key in attrs}
+        self._compile_labels()
+
+    def _compile_labels(self) -> None:
+        """
+        Ranks the labels by their position in the config, highest first,
+        and empties the cache of resolved attributes.
+        Must be called after the labels are changed.
+        """
+        self._label_priority = {label: index for index, label in enumerate(self.labels)}
+        self._label_attrs: dict[frozenset[str], dict[str, str]] = {}
+
+    def _index_organizations(self) -> None:
+        """
+        Maps each label to the first organization it is assigned to,
+        and empties the cache of resolved organizations.
+        Must be called after the organizations are changed.
+        """
+        self._org_index: dict[str, tuple[int, str]] = {}
+        for index, (uri, labels) in enumerate(self.organizations.items()):
+            for label in labels:
+                self._org_index.setdefault(label, (index, uri))
+        self._label_orgs: dict[frozenset[str], Optional[str]] = {}
+
+    def label_organization(self, labels: Iterable[str]) -> Optional[str]:
+        """
+        Returns the first organization assigned any of some labels.
+        Runs in time linear in the number of labels,
+        and results are cached for each distinct set of labels.
+
+        :param labels: Some document labels.
+        :type labels: Iterable[str]
+        :return: The URIID of the organization document, or None.
+        :rtype: Optional[str]
+        """
+        key = labels if isinstance(labels, frozenset) else frozenset(labels)
+        try:
+            return self._label_orgs[key]
+        except KeyError:
+            matches = [self._org_index[label] for label in key if label in self._org_index]
+            uri = self._label_orgs[key] = min(matches)[1] if matches else None
+            return uri
+
+    def label_attrs(self, labels: Iterable[str]) -> dict[str, str]:
+        """
+        Returns the attributes set on any of some labels.
+        If several labels set an attribute, the label configured highest in the config takes precedence.
+        Results are cached for each distinct set of labels, and shared by every caller with that set.
+
+        :param labels: Some document labels.
+        :type labels: Iterable[str]
+        :return: A dict mapping attributes to the value they are set to. Should not be modified.
+        :rtype: dict[str, str]
+        """
+        key = labels if isinstance(labels, frozenset) else frozenset(labels)
+        try:
+            return self._label_attrs[key]
+        except KeyError:
+            attrs = {}
+            for label in sorted(key & self._label_priority.keys(), 
+                    key = self._label_priority.__getitem__, reverse = True):
+                attrs.update((attr, value) for attr, value in self.labels[label].items() if value)
+            self._label_attrs[key] = attrs
+            return attrs
 
     @classmethod
     def from_psml(cls, document: str) -> NetworkConfig:
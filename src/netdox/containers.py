@@ -2,22 +2,31 @@
 This module contains any container classes.
 """
 from __future__ import annotations
-import copy
 
 import logging
+import mmap
 import os
 import pickle
+import tempfile
 from typing import Iterable, Iterator, Type, Union
+from zipfile import ZipFile, ZipInfo
 
 from bs4 import BeautifulSoup
 
-from netdox import base, dns, helpers, iptools, nodes, psml
+from netdox import base, dns, helpers, iparray, iptools, names, nodes, psml, snapshot
 from netdox.config import NetworkConfig
-from netdox.iptools import valid_ip
-from netdox.utils import APPDIR, Cryptor, valid_domain
+from netdox.utils import APPDIR, Cryptor
 
 logger = logging.getLogger(__name__)
 
+PSML_DIRS = {
+    'domains': ('Domain', 2),
+    'ips': ('IPv4', 3),
+    'nodes': ('Node', 2)
+}
+"""Maps the directories in the psml representation of a network to the type of object
+in them, and the number of components in the relative path of each document."""
+
 
 class DomainSet(dns.DNSObjectContainer[dns.Domain]):
     """
@@ -61,10 +70,13 @@ class IPv4AddressSet(dns.DNSObjectContainer[dns.IPv4Address]):
     objectClass: Type[dns.IPv4Address] = dns.IPv4Address
     subnets: set
     """A set of the /24 subnets of the private IPs in this container."""
+    subnet_usage: dict[str, helpers.SubnetUsage]
+    """Maps subnets to the addresses used in them. Populated by fillSubnets."""
 
     def __init__(self, network: Network, ips: list[dns.IPv4Address] = []) -> None:
         super().__init__(network, ips)
         self.subnets = set()
+        self.subnet_usage = {}
 
     def __getitem__(self, key: str) -> dns.IPv4Address:
         return super().__getitem__(key)
@@ -102,6 +114,21 @@ class IPv4AddressSet(dns.DNSObjectContainer[dns.IPv4Address]):
         """
         return [ip for ip in self if not ip.is_private]
 
+    def private_subnets(self, mask: int = 24) -> set[str]:
+        """
+        Returns the subnets with a given mask that contain private IPs in this set.
+        Computed in one vectorised pass if NumPy is installed.
+
+        :param mask: The subnet mask in bits, defaults to 24
+        :type mask: int, optional
+        :return: A set of IPv4 subnets in CIDR form.
+        :rtype: set[str]
+        """
+        if iparray.AVAILABLE:
+            addresses = iparray.to_ints(list(self.objects))
+            return set(iparray.subnets(addresses[iparray.private(addresses)], mask))
+        return {iptools.sort(ip.name, mask) for ip in self if ip.is_private}
+
     @property
     def unused(self) -> list[dns.IPv4Address]:
         """
@@ -124,12 +151,34 @@ class IPv4AddressSet(dns.DNSObjectContainer[dns.IPv4Address]):
 
     def fillSubnets(self) -> None:
         """
-        Iterates over each public 8-bit subnet this set has IP addresses in, 
-        and generates IPv4Addresses for each IP in the subnet not already in the set.
+        Records the used addresses in each subnet from the config,
+        and each private /24 subnet this set has IP addresses in, in *subnet_usage*.
+        No objects are created for unused addresses;
+        they are summarised when the subnets are serialised.
+        The addresses are converted to integers in one vectorised pass if NumPy is installed.
         """
-        for subnet in self.network.config.subnets:
-            for ipv4 in iptools.subn_iter(subnet):
-                self[ipv4]
+        usage: dict[iptools.IntSubnet, helpers.SubnetUsage] = {}
+        for subnet in (*self.network.config.subnets, *sorted(self.private_subnets())):
+            try:
+                subnet_usage = helpers.SubnetUsage(subnet)
+            except ValueError as exc:
+                logger.warning(f'Cannot fill invalid subnet {subnet}: {exc}')
+                continue
+            if subnet_usage.subnet not in usage:
+                subnet_usage.location = self.network.locator.locate([subnet_usage.name])
+                usage[subnet_usage.subnet] = subnet_usage
+
+        masks = {mask for _, mask in usage}
+        if iparray.AVAILABLE:
+            addresses = iparray.to_ints(list(self.objects)).tolist()
+        else:
+            addresses = [iptools.cidr2int(ip) for ip in self.objects]
+        for address in addresses:
+            for mask in masks:
+                if (int_subnet := iptools.int_subnet(address, mask)) in usage:
+                    usage[int_subnet].mark(address)
+
+        self.subnet_usage = {subnet_usage.name: subnet_usage for subnet_usage in usage.values()}
 
 class NodeSet(base.NetworkObjectContainer[nodes.Node]):
     """
@@ -205,7 +254,8 @@ class Network:
     cache: set
     """A set of cached names. Used when resolving long record chains."""
     counter: helpers.Counter
-    """Object used to count many facets of the network."""
+    """Registry of metrics for the network, including counts of many facets.
+    Plugins may register their own metrics in it."""
 
     def __init__(self, 
             domains: DomainSet = None, 
@@ -264,19 +314,20 @@ class Network:
         :param source: Name of the plugin that provided this DNS record.
         :type source: str
         """
-        if isinstance(origin, str):
-            if (origin not in self.config.exclusions
-                and (valid_ip(origin) or valid_domain(origin))
-            ):
+        try:
+            if isinstance(origin, str):
+                origin = names.normalise(origin).name
+                if origin in self.config.exclusions:
+                    return
                 origin = self.find_dns(origin)
-            else:
-                return
 
-        if isinstance(dest, dns.DNSObject):
-            dest = dest.name
-        if (dest not in self.config.exclusions
-            and (valid_ip(dest) or valid_domain(dest))
-        ):
+            if isinstance(dest, dns.DNSObject):
+                dest = dest.name
+            dest = names.normalise(dest).name
+        except ValueError:
+            return
+
+        if dest not in self.config.exclusions:
             origin.link(dest, source)
             self.counter.inc_facet(helpers.CountedFacets.DNSLink)
             
@@ -339,10 +390,12 @@ class Network:
 
         :param name: The name of the DNSObject.
         :type name: str
+        :raises ValueError: If *name* is neither a valid domain name nor a valid IPv4 address.
         :return: A Domain or IPv4Address
         :rtype: Union[nwobjs.Domain, nwobjs.IPv4Address]
         """
-        return self.ips[name] if iptools.valid_ip(name) else self.domains[name]
+        normal = names.normalise(name)
+        return self.ips[normal.name] if normal.kind == names.IPV4 else self.domains[normal.name]
 
     def _resolvesTo(self, startObj: dns.DNSObject, target: str) -> bool:
         """
@@ -411,21 +464,21 @@ class Network:
         """
         for domain in network.domains:
             if domain.name in self.domains:
-                self.domains[domain.name].notes = psml.Fragment.from_tag(copy.copy(domain.notes.tag))
+                self.domains[domain.name].notes = domain.raw_notes
 
         for ipv4 in network.ips:
             if ipv4.name in self.ips:
-                self.ips[ipv4.name].notes = psml.Fragment.from_tag(copy.copy(ipv4.notes.tag))
+                self.ips[ipv4.name].notes = ipv4.raw_notes
             
         for node in network.nodes:
             if node.identity in self.nodes:
-                self.nodes[node.identity].notes = psml.Fragment.from_tag(copy.copy(node.notes.tag))
+                self.nodes[node.identity].notes = node.raw_notes
                 
     ## Serialisation
 
     def dump(self, outpath: str = APPDIR + 'src/network.bin', encrypt = True) -> None:
         """
-        Pickles the Network object and saves it to *path*, encrypted.
+        Writes the Network object to *path* as a snapshot, encrypted.
 
         :param outpath: The path to save dump the network to, 
         defaults to 'src/network.bin' within *APPDIR*.
@@ -433,9 +486,12 @@ class Network:
         :param encrypt: Whether or not to encrypt the dump, defaults to True
         :type encrypt: bool, optional
         """
-        network = pickle.dumps(self)
         with open(outpath, 'wb') as nw:
-            nw.write(Cryptor().encrypt(network) if encrypt else network)
+            if encrypt:
+                with Cryptor().writer(nw) as writer:
+                    snapshot.dump(self, writer) # type: ignore
+            else:
+                snapshot.dump(self, nw)
 
     @classmethod
     def from_psml(
@@ -456,65 +512,144 @@ class Network:
             config = NetworkConfig.from_psml(stream.read())
         net = cls(config = config)
 
-        try:
-            for domain_file in os.scandir(os.path.join(dir, 'domains')):
-                if not domain_file.path.endswith('.psml') or not domain_file.is_file():
-                    continue
-                try:
-                    with open(domain_file, 'r', encoding='utf-8') as stream:
-                        domain = dns.Domain.from_psml(net, 
-                            psml = BeautifulSoup(stream.read(), 'xml'))
-                    net.labels[domain.docid] = (
-                        domain.labels - set(domain.DEFAULT_LABELS))
-                except Exception as exc:
-                    logger.error(
-                        f'Failed to deserialise Domain object at "{domain_file.path}"')
-                    logger.exception(exc)
-        except FileNotFoundError:
-            logger.warning('No domains directory found in remote network.')
+        for objdir in PSML_DIRS:
+            try:
+                if objdir == 'ips':
+                    paths = [file.path for subnet in os.scandir(os.path.join(dir, objdir))
+                        for file in os.scandir(subnet)
+                        if file.path.endswith('.psml') and file.is_file()]
+                else:
+                    paths = [file.path for file in os.scandir(os.path.join(dir, objdir))
+                        if file.path.endswith('.psml') and file.is_file()]
+            except FileNotFoundError:
+                logger.warning(f'No {objdir} directory found in remote network.')
+                continue
+
+            for path in paths:
+                net._load_document(objdir, path, node_subclasses)
 
-        try:
-            for subnet in os.scandir(os.path.join(dir, 'ips')):
-                for ipv4_file in os.scandir(subnet):
-                    if not ipv4_file.path.endswith('.psml') or not ipv4_file.is_file():
-                        continue
-                    try:
-                        with open(ipv4_file, 'r', encoding='utf-8') as stream:
-                            ipv4 = dns.IPv4Address.from_psml(net, 
-                                psml = BeautifulSoup(stream.read(), 'xml'))
-                        net.labels[ipv4.docid] = (
-                            ipv4.labels - set(ipv4.DEFAULT_LABELS))
-                    except Exception as exc:
-                        logger.error(
-                            f'Failed to deserialise IPv4 object at "{ipv4_file.path}"')
-                        logger.exception(exc)        
-        except FileNotFoundError:
-            logger.warning('No ips directory found in remote network.')
+        return net
 
-        try:
-            for node_file in os.scandir(os.path.join(dir, 'nodes')):
-                if not node_file.path.endswith('.psml') or not node_file.is_file():
-                    continue
-                try:
-                    with open(node_file, 'r', encoding='utf-8') as stream:
-                        node = nodes.Node.from_psml(net, subclass_types = node_subclasses,
-                            psml = BeautifulSoup(stream.read(), 'xml'))
-                    net.labels[node.docid] = node.labels - set(node.DEFAULT_LABELS)
-                except Exception as exc:
-                    logger.error(
-                        f'Failed to deserialise Node object at "{node_file.path}"')
-                    logger.exception(exc)
-        except FileNotFoundError:
-            logger.warning('No nodes directory found in remote network.')
+    @classmethod
+    def from_zip(
+        cls, zip: ZipFile, node_subclasses: Iterable[Type[nodes.Node]] = () # type: ignore
+    ) -> Network:
+        """
+        Instantiates a Network from a ZIP of its psml representation, 
+        such as a PageSeeder export, without extracting it.
+
+        :param zip: A ZIP with the same layout as the directory the network was serialised to.
+        :type zip: ZipFile
+        :param node_subclasses: A list of subclasses of Node to attempt to use to
+        deserialise Node instances. Defaults to ()
+        :type node_subclasses: Iterable[Type[nodes.Node]]
+        :return: The Network described by the psml.
+        :rtype: Network
+        """
+        config = NetworkConfig.from_psml(zip.read('config.psml').decode('utf-8'))
+        net = cls(config = config)
+
+        members: dict[str, list[ZipInfo]] = {objdir: [] for objdir in PSML_DIRS}
+        for info in zip.infolist():
+            parts = info.filename.split('/')
+            if parts[0] in members and len(parts) == PSML_DIRS[parts[0]][1] \
+                    and parts[-1].endswith('.psml') and not info.is_dir():
+                members[parts[0]].append(info)
+
+        for objdir, infos in members.items():
+            if not infos:
+                logger.warning(f'No {objdir} directory found in remote network.')
+            for info in infos:
+                net._load_document(objdir, info.filename, node_subclasses, 
+                    zip.read(info).decode('utf-8'))
 
         return net
 
+    def _load_document(self, 
+            objdir: str, 
+            path: str, 
+            node_subclasses: Iterable[Type[nodes.Node]], 
+            content: str = None
+        ) -> None:
+        """
+        Deserialises a single document in the psml representation of a network.
+        Any exception raised is logged.
+
+        :param objdir: The directory the document is in, one of the keys of PSML_DIRS.
+        :type objdir: str
+        :param path: Path to the document.
+        :type path: str
+        :param node_subclasses: A list of subclasses of Node to attempt to use to
+        deserialise Node instances.
+        :type node_subclasses: Iterable[Type[nodes.Node]]
+        :param content: The content of the document, defaults to reading it from *path*.
+        :type content: str, optional
+        """
+        try:
+            if content is None:
+                with open(path, 'r', encoding='utf-8') as stream:
+                    content = stream.read()
+            soup = BeautifulSoup(content, 'xml')
+            nwobj: base.NetworkObject
+            if objdir == 'domains':
+                nwobj = dns.Domain.from_psml(self, psml = soup)
+            elif objdir == 'ips':
+                nwobj = dns.IPv4Address.from_psml(self, psml = soup)
+            else:
+                nwobj = nodes.Node.from_psml(self, subclass_types = node_subclasses,
+                    psml = soup)
+            self.labels[nwobj.docid] = nwobj.labels - set(nwobj.DEFAULT_LABELS)
+        except Exception as exc:
+            logger.error(
+                f'Failed to deserialise {PSML_DIRS[objdir][0]} object at "{path}"')
+            logger.exception(exc)
+
+    @staticmethod
+    def _read_dump(inpath: str, encrypted: bool):
+        """
+        Returns a memory-mapped buffer containing the dump at *inpath*.
+        Encrypted dumps are decrypted to a temporary file first.
+        """
+        with open(inpath, 'rb') as nw:
+            if not encrypted:
+                return mmap.mmap(nw.fileno(), 0, access = mmap.ACCESS_READ)
+            with tempfile.TemporaryFile() as plain:
+                Cryptor().decrypt_stream(nw, plain)
+                plain.flush()
+                return mmap.mmap(plain.fileno(), 0, access = mmap.ACCESS_READ)
+
     @classmethod
-    def from_dump(
+    def open_dump(
         cls, inpath: str = APPDIR + 'src/network.bin', encrypted = True
+    ) -> snapshot.Snapshot:
+        """
+        Opens a network dump without loading any of the objects in it.
+
+        :param inpath: Path to the binary network file, defaults to 'src/network.bin'
+        :type inpath: str, optional
+        :param encrypted: Whether or not the dump is encrypted, defaults to True
+        :type encrypted: bool, optional
+        :raises ValueError: If the dump is not a snapshot (e.g. a legacy pickled dump).
+        :return: The snapshot at *inpath*.
+        :rtype: snapshot.Snapshot
+        """
+        return snapshot.Snapshot(cls._read_dump(inpath, encrypted), cls)
+
+    @classmethod
+    def from_dump(
+        cls, 
+        inpath: str = APPDIR + 'src/network.bin', 
+        encrypted = True,
+        lazy = False,
+        max_resident: int = snapshot.MAX_RESIDENT
     ) -> Network:
         """
-        Instantiates a Network from a pickled dump.
+        Instantiates a Network from a dump.
+        Dumps written as a pickle by older versions can still be read.
+
+        A lazy Network holds stand-ins for its objects, 
+        which are loaded from the dump when first accessed.
+        It is intended for inspecting large networks, not for modifying them.
 
         :param cls: The Network class, passed implicitly
         :type cls: Type[Network]
@@ -522,20 +657,28 @@ class Network:
         :type inpath: str, optional
         :param encrypted: Whether or not the dump is encrypted, defaults to True
         :type encrypted: bool, optional
-        :return: The pickled network object at *inpath*.
+        :param lazy: Whether to load objects only when they are accessed, defaults to False
+        :type lazy: bool, optional
+        :param max_resident: The maximum number of objects a lazy Network keeps loaded,
+        defaults to snapshot.MAX_RESIDENT
+        :type max_resident: int, optional
+        :return: The network object stored at *inpath*.
         :rtype: Network
         """
-        with open(inpath, 'rb') as nw:
-            return pickle.loads(
-                Cryptor().decrypt(nw.read())
-                if encrypted else nw.read()
-            )
+        network = cls._read_dump(inpath, encrypted)
+        if not snapshot.is_snapshot(network):
+            if lazy:
+                logger.warning('Cannot lazily load a legacy network dump; loading all of it.')
+            return pickle.loads(network)
+        elif lazy:
+            return snapshot.LazySnapshot(network, cls, max_resident).load()
+        return snapshot.loads(network, cls)
 
     def writePSML(self) -> None:
         """
-        Writes the domains, ips, and nodes of a network to PSML.
+        Writes the domains, ips, nodes, and subnet usage of a network to PSML.
         """
-        for nwobj in (*self.domains, *self.ips, *self.nodes):
+        for nwobj in (*self.domains, *self.ips, *self.nodes, *self.ips.subnet_usage.values()):
             try:
                 nwobj.serialise()
             except Exception as exc:
@@ -8,9 +8,9 @@ from typing import Generic, Iterable, Iterator, Optional, TypeVar, Union
 
 from bs4 import BeautifulSoup
 
-from netdox import base, containers, iptools, nodes, utils
+from netdox import base, containers, iptools, names, nodes, utils
 from netdox.helpers import CountedFacets
-from netdox.psml import (DOMAIN_TEMPLATE, IPV4ADDRESS_TEMPLATE, Fragment,
+from netdox.psml import (DOMAIN_TEMPLATE, IPV4ADDRESS_TEMPLATE,
                          PropertiesFragment, Property, Section, XRef)
 
 class DNSRecordType(Enum):
@@ -458,12 +458,16 @@ class Domain(DNSObject):
         :type zone: str, optional
         :raises ValueError: If *name* is not a valid FQDN
         """
-        if utils.valid_domain(name):
+        try:
+            normal = names.normalise(name)
+        except ValueError:
+            normal = None
+        if normal is not None and normal.kind == names.DOMAIN:
 
             super().__init__(
                 network = network, 
-                name = name, 
-                zone = zone or utils.root_domain(name),
+                name = normal.name, 
+                zone = zone or normal.zone,
                 labels = labels
             )
             self.txt_records = set()
@@ -554,7 +558,7 @@ class Domain(DNSObject):
         if notes_section:
             notes_frag = notes_section.find('fragment', id='notes')
             if notes_frag:
-                domain.notes = Fragment.from_tag(notes_frag)
+                domain.notes = str(notes_frag).encode('utf-8')
         
         txt_records = psml.find('section', id = 'txt_records')
         if txt_records is not None:
@@ -601,16 +605,20 @@ class IPv4Address(DNSObject):
         labels: Iterable[str] = None
     ) -> None:
 
-        if iptools.valid_ip(address):
+        try:
+            normal = names.normalise(address)
+        except ValueError:
+            normal = None
+        if normal is not None and normal.kind == names.IPV4:
             super().__init__(
                 network = network, 
-                name = address, 
-                zone = '.'.join(address.split('.')[-2::-1])+ '.in-addr.arpa',
+                name = normal.name, 
+                zone = normal.zone,
                 labels = labels
             )
 
-            self.is_private = not iptools.public_ip(self.name)
-            self.subnet = self.subnetFromMask()
+            self.is_private = normal.is_private
+            self.subnet = normal.subnet
             self.NAT = set()
         else:
             raise ValueError('Must provide a valid name for an IPv4Address (some IPv4, in CIDR form)')
@@ -665,7 +673,7 @@ class IPv4Address(DNSObject):
             self.network.ips[self.name] = self
             self.network.counter.inc_facet(CountedFacets.IPv4)
         if self.is_private:
-            self.network.ips.subnets.add(self.subnetFromMask())
+            self.network.ips.subnets.add(self.subnet)
         return self
 
     def to_psml(self) -> BeautifulSoup:
@@ -695,7 +703,7 @@ class IPv4Address(DNSObject):
         if notes_section:
             notes_frag = notes_section.find('fragment', id='notes')
             if notes_frag:
-                ipv4.notes = Fragment.from_tag(notes_frag)
+                ipv4.notes = str(notes_frag).encode('utf-8')
 
         for _record in dns_records:
             if _record.tag.name != 'properties-fragment':
@@ -774,12 +782,13 @@ class DNSObjectContainer(base.NetworkObjectContainer[DNSObjT], Generic[DNSObjT])
         self.objects = {object.name: object for object in objects}
 
     def __getitem__(self, key: str) -> DNSObjT:
+        key = names.canonical(key)
         if key not in self.objects:
             self.objects[key] = self.objectClass(self.network, key)
         return super().__getitem__(key)
 
     def __contains__(self, key: Union[str, DNSObjT]) -> bool:
         if isinstance(key, str):
-            return super().__contains__(key)
+            return super().__contains__(names.canonical(key))
         else:
             return super().__contains__(key.name)
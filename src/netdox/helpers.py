@@ -13,7 +13,7 @@ from importlib.metadata import version as pkg_version
 
 from bs4 import BeautifulSoup
 from lxml import etree
-from netdox import iptools, pageseeder, utils, psml
+from netdox import iptools, metrics, pageseeder, utils, psml
 
 logger = logging.getLogger(__name__)
 
@@ -36,9 +36,29 @@ class Locator:
             for subnet in self.location_map[location]:
                 self.location_pivot[subnet] = location
 
+        self._trie: iptools.SubnetTrie[set[str]] = iptools.SubnetTrie()
+        for subnet, location in self.location_pivot.items():
+            try:
+                self._trie.setdefault(iptools.parse_subnet(subnet), set()).add(location)
+            except ValueError:
+                logger.warning(f'Ignoring invalid subnet for location {location}: {subnet}')
+        self._matches: dict[str, Optional[tuple[int, set[str]]]] = {}
+
     def __iter__(self) -> Iterator[str]:
         yield from self.location_map.keys()
 
+    def _match(self, object: str) -> Optional[tuple[int, set[str]]]:
+        """
+        Returns the mask of the most specific subnet containing an IP or subnet,
+        and the locations of subnets with that mask. Results are memoised.
+        """
+        try:
+            return self._matches[object]
+        except KeyError:
+            match = self._matches[object] = self._trie.longest_match(
+                iptools.parse_object(object))
+            return match
+
     def locate(self, ip_set: Iterable) -> Optional[str]:
         """
         Returns a location for an ip or set of ips, or None if there is no determinable location.
@@ -51,31 +71,181 @@ class Locator:
         """
         if isinstance(ip_set, str) and iptools.valid_ip(ip_set):
             ip_set = [ip_set]
-        # sort every declared subnet that matches one of ips by mask size
-        matches: dict[int, list[str]] = {}
+        # use the locations of the most specific subnets that match one of ips
+        largest_mask, largest = -1, set()
         for subnet in ip_set:
-            for match in self.location_pivot:
-                if iptools.subn_contains(match, subnet):
-                    mask = int(match.split('/')[-1])
-                    if mask not in matches:
-                        matches[mask] = []
-                    matches[mask].append(self.location_pivot[match])
+            match = self._match(subnet)
+            if match is None:
+                continue
+            mask, locations = match
+            if mask > largest_mask:
+                largest_mask, largest = mask, set(locations)
+            elif mask == largest_mask:
+                largest |= locations
+
+        # if multiple unique locations given by equally specific subnets, or no subnets
+        if len(largest) != 1:
+            return None
+        return next(iter(largest))
 
-        matches = dict(sorted(matches.items(), reverse=True))
 
-        # first key when keys are sorted by descending size is largest mask
-        try:
-            largest = matches[list(matches.keys())[0]]  #@IgnoreException
-            largest = list(dict.fromkeys(largest))
-            # if multiple unique locations given by equally specific subnets
-            if len(largest) > 1:
-                return None
+################
+# Subnet Usage #
+################
+
+class SubnetUsage:
+    """
+    Records which addresses in a subnet are used, as a bitmap with one bit per address.
+    Unused addresses are never stored; they are only rendered when the subnet is serialised,
+    as a summary document of unused ranges.
+    """
+    name: str
+    """The subnet in CIDR form, with its lowest address."""
+    lower: int
+    """The lowest address in the subnet, as an integer."""
+    mask: int
+    """The subnet mask in bits."""
+    location: Optional[str]
+    """The location of the subnet, if known."""
+    _bitmap: bytearray
+    """Bit *n* is set if the address *n* above the lowest address is used."""
+    MIN_MASK = 8
+    """Shortest subnet mask that usage is recorded for, as the bitmap grows with the subnet."""
+
+    def __init__(self, subnet: str, location: Optional[str] = None) -> None:
+        """
+        Constructor.
+
+        :param subnet: An IPv4 subnet in CIDR form.
+        :type subnet: str
+        :param location: The location of the subnet, defaults to None
+        :type location: Optional[str], optional
+        :raises ValueError: If *subnet* is not a valid IPv4 subnet,
+        or its mask is shorter than *MIN_MASK*.
+        """
+        self.lower, self.mask = iptools.parse_subnet(subnet)
+        if self.mask < self.MIN_MASK:
+            raise ValueError(f'Subnet mask must be at least /{self.MIN_MASK}')
+        self.name = f'{iptools.int2cidr(self.lower)}/{self.mask}'
+        self.location = location
+        self._bitmap = bytearray((self.size + 7) // 8)
+
+    def __contains__(self, address: int) -> bool:
+        offset = address - self.lower
+        return 0 <= offset < self.size and bool(self._bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    @property
+    def subnet(self) -> iptools.IntSubnet:
+        """The subnet as a tuple of its lowest address and mask."""
+        return self.lower, self.mask
+
+    @property
+    def size(self) -> int:
+        """The number of addresses in the subnet."""
+        return 1 << (iptools.ADDRESS_BITS - self.mask)
+
+    @property
+    def used(self) -> int:
+        """The number of used addresses in the subnet."""
+        return bin(int.from_bytes(self._bitmap, 'little')).count('1')
+
+    @property
+    def docid(self) -> str:
+        return f'_nd_subnet_{self.name.replace(".", "_").replace("/", "_")}'
+
+    @property
+    def outpath(self) -> str:
+        return os.path.normpath(os.path.join(utils.APPDIR, 'out/subnets', self.docid + '.psml'))
+
+    def mark(self, address: int) -> bool:
+        """
+        Marks an address as used.
+
+        :param address: An IPv4 address as an integer.
+        :type address: int
+        :return: Whether the address is in this subnet.
+        :rtype: bool
+        """
+        offset = address - self.lower
+        if not 0 <= offset < self.size:
+            return False
+        self._bitmap[offset >> 3] |= 1 << (offset & 7)
+        return True
+
+    def unused_ranges(self) -> list[tuple[int, int]]:
+        """
+        Returns the runs of unused addresses in the subnet.
+        Whole bytes of the bitmap that are all used or all unused are skipped over at once.
+
+        :return: A sorted list of tuples of the lowest and highest address in each run, as integers.
+        :rtype: list[tuple[int, int]]
+        """
+        ranges = []
+        start = None
+        for index, byte in enumerate(self._bitmap):
+            if byte == 0x00:
+                if start is None:
+                    start = index << 3
+            elif byte == 0xFF:
+                if start is not None:
+                    ranges.append((start, (index << 3) - 1))
+                    start = None
             else:
-                # use most specific match for location definition
-                return largest[0]
-        # if no subnets
-        except IndexError:
-            return None
+                for bit in range(8):
+                    offset = (index << 3) | bit
+                    if byte & (1 << bit):
+                        if start is not None:
+                            ranges.append((start, offset - 1))
+                            start = None
+                    elif start is None:
+                        start = offset
+        if start is not None:
+            ranges.append((start, (len(self._bitmap) << 3) - 1))
+        return [(self.lower + lower, self.lower + min(upper, self.size - 1))
+            for lower, upper in ranges if lower < self.size]
+
+    def unused(self) -> Iterator[str]:
+        """
+        Yields each unused address in the subnet.
+
+        :yield: IPv4 addresses in CIDR form.
+        :rtype: Iterator[str]
+        """
+        for lower, upper in self.unused_ranges():
+            yield from iptools.range_iter(lower, upper)
+
+    def to_psml(self) -> BeautifulSoup:
+        """
+        Serialises the usage of this subnet to a summary document.
+
+        :return: The PSML document as a BeautifulSoup object.
+        :rtype: BeautifulSoup
+        """
+        body = psml.SUBNET_TEMPLATE.replace('#!docid', self.docid).replace('#!name', self.name)
+        soup = BeautifulSoup(body, features = 'xml')
+        soup.find('section', id = 'header').append(psml.PropertiesFragment('header', [
+            psml.Property('subnet', self.name, 'Subnet'),
+            psml.Property('location', self.location or '—', 'Location'),
+            psml.Property('size', str(self.size), 'Addresses'),
+            psml.Property('used', str(self.used), 'Used Addresses'),
+            psml.Property('unused', str(self.size - self.used), 'Unused Addresses')
+        ]).tag)
+
+        unused = soup.new_tag('preformat')
+        unused.string = '\n'.join(
+            iptools.int2cidr(lower) if lower == upper
+            else f'{iptools.int2cidr(lower)}-{iptools.int2cidr(upper)}'
+            for lower, upper in self.unused_ranges())
+        soup.find('fragment', id = 'unused').append(unused)
+        return soup
+
+    def serialise(self) -> None:
+        """
+        Serialises the usage of this subnet to PSML and writes it to the outpath.
+        """
+        os.makedirs(os.path.dirname(self.outpath), exist_ok = True)
+        with open(self.outpath, 'w', encoding = 'utf-8') as stream:
+            stream.write(str(self.to_psml()))
 
 
 ################
@@ -148,11 +318,16 @@ class LabelDict(dict):
     Behaves like a defaultdict with a 'default_factory' of *set*.
 
     Maps document docids to a set of labels.
+    Labels fetched from PageSeeder are shared frozensets,
+    which are copied to a set the first time they are accessed by key.
     """
     default_factory = set
 
     def __getitem__(self, key: str) -> set[str]:
-        return super().__getitem__(key)
+        labels = super().__getitem__(key)
+        if type(labels) is frozenset:
+            labels = self[key] = set(labels)
+        return labels
 
     def __missing__(self, key) -> set:
         self[key] = self.default_factory()
@@ -161,29 +336,18 @@ class LabelDict(dict):
     @classmethod
     def from_pageseeder(cls) -> LabelDict:
         """
-        Instantiates a LabelManager from the labels on PageSeeder.
+        Instantiates a LabelDict from the labels on PageSeeder.
+        Labels are fetched in pages and updated incrementally between runs; see *pageseeder.uri_labels*.
 
+        :raises Exception: If the labels could not be retrieved, and none are cached.
         :return: An instance of this class.
-        :rtype: LabelManager
+        :rtype: LabelDict
         """
         try:
-            all_uris = json.loads(
-                pageseeder.get_uris(
-                    pageseeder.uri_from_path('website'), 
-                    {
-                        'relationship': 'descendants',
-                        'type': 'file'
-                    }
-                )
-            )
+            return cls(pageseeder.uri_labels('website'))
         except Exception:
             logger.error('Failed to retrieve URI labels from PageSeeder.')
-            all_uris = {'uris':[]}
-
-        return cls({ 
-            uri['docid']: set(uri['labels'] if 'labels' in uri else []) 
-            for uri in all_uris['uris'] if 'docid' in uri
-        })
+            raise
 
 
 #######################
@@ -232,32 +396,39 @@ class CountedFacets(Enum):
     DNSLink = 'dnslink'
     NATLink = 'natlink'
 
-@dataclass(frozen = True)
-class Counter:
-    _counts: dict[CountedFacets, int]
-    """Maps facet to its counted occurences."""
+class Counter(metrics.Registry):
+    """
+    A registry of metrics for a network, including counts of its objects and links.
+    Plugins may register their own metrics too.
+    """
+    facets: metrics.Gauge
+    """Number of each facet in the network."""
     DEFAULT_COUNTS = {facet: 0 for facet in CountedFacets}
     """Default dict of counts."""
 
     def __init__(self) -> None:
-        object.__setattr__(self, '_counts', dict(self.DEFAULT_COUNTS))
+        super().__init__()
+        self.facets = self.gauge('netdox_facets', 
+            'Number of objects and DNS links in the network.', ('facet',))
+
+    def __setstate__(self, state: dict) -> None:
+        if '_counts' in state:
+            # pickled by an older version, when the counts were a plain dict
+            self.__init__() # type: ignore
+            for facet, count in state['_counts'].items():
+                self.set_facet(facet, count)
+        else:
+            super().__setstate__(state)
 
-    def inc_facet(self, facet: CountedFacets) -> int:
+    def inc_facet(self, facet: CountedFacets) -> None:
         """
         Increments the count of a facet.
+        Use *counts* to read the count, as reading sums the counts from every thread.
 
         :param facet: Facet to increment the count for.
         :type facet: Any
-        :return: The new count for the facet.
-        :rtype: int
         """
-        try:
-            count = self._counts[facet] + 1
-        except KeyError:
-            count = 1
-        finally:
-            self._counts[facet] = count
-            return count
+        self.facets.inc(1, (facet,))
 
     def dec_facet(self, facet: CountedFacets) -> int:
         """
@@ -269,19 +440,26 @@ class Counter:
         :return: The new count for the facet.
         :rtype: int
         """
-        try:
-            count = self._counts[facet] - 1
-            if count < 0: count = 0
-        except KeyError:
-            count = 0
-        finally:
-            self._counts[facet] = count
-            return count
+        if self.facets.value((facet,)) > 0:
+            self.facets.dec(1, (facet,))
+        return self.facets.value((facet,))
+
+    def set_facet(self, facet: CountedFacets, count: int) -> None:
+        """
+        Sets the count of a facet.
+
+        :param facet: Facet to set the count for.
+        :type facet: Any
+        :param count: The new count for the facet.
+        :type count: int
+        """
+        self.facets.set(count, (facet,))
 
     @property
     def counts(self) -> dict[CountedFacets, int]:
         """Maps facets to their current counts."""
-        return self.DEFAULT_COUNTS | self._counts
+        return self.DEFAULT_COUNTS | {
+            facet: count for (facet,), count in self.facets.collect().items()}
 
     def generate_report(self) -> psml.Section:
         counts = self.counts
@@ -0,0 +1,151 @@
+"""
+Vectorised operations on many IPv4 addresses at once, using NumPy.
+
+NumPy is optional: install netdox with the ``numpy`` extra to use this module.
+Callers should check *AVAILABLE* and fall back to :mod:`netdox.iptools` if it is False.
+Addresses are arrays of unsigned 32 bit integers, as in the integer core of iptools.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Sequence
+
+from netdox import iptools
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+AVAILABLE = np is not None
+"""Whether NumPy is installed, and so whether the functions in this module can be used."""
+
+
+def _require() -> None:
+    if np is None:
+        raise ImportError('Vectorised IPv4 operations require NumPy. '
+            + 'Install it with: pip install netdox[numpy]')
+
+def to_ints(addresses: Sequence[str]) -> NDArray:
+    """
+    Converts IPv4 addresses in CIDR form to integers, in one pass.
+
+    :param addresses: A sequence of IPv4 addresses as strings in CIDR form.
+    :type addresses: Sequence[str]
+    :raises ValueError: If any of the addresses is not a valid IPv4 address.
+    :return: An array of the addresses as unsigned 32 bit integers.
+    :rtype: NDArray
+    """
+    _require()
+    if not addresses:
+        return np.zeros(0, dtype = np.uint32)
+    # check each address has four octets, so that octets can never shift between addresses
+    if (np.char.count(np.asarray(addresses, dtype = str), '.') != 3).any():
+        raise ValueError('Failed to parse IPv4 addresses: not every address has four octets.')
+    try:
+        octets = np.array('.'.join(addresses).split('.'), dtype = np.int64)
+    except ValueError:
+        raise ValueError('Failed to parse IPv4 addresses: found an invalid octet.')
+    if octets.min() < 0 or octets.max() > 255:
+        raise ValueError('Failed to parse IPv4 addresses: found an octet out of range.')
+    octets = octets.reshape(-1, 4).astype(np.uint32)
+    return (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+def to_strings(addresses: NDArray) -> list[str]:
+    """
+    Converts IPv4 addresses as integers to strings in CIDR form.
+
+    :param addresses: An array of IPv4 addresses as integers.
+    :type addresses: NDArray
+    :return: A list of the addresses as strings in CIDR form.
+    :rtype: list[str]
+    """
+    _require()
+    addresses = np.asarray(addresses, dtype = np.uint32)
+    octets = np.stack([(addresses >> shift) & 255 for shift in (24, 16, 8, 0)], axis = 1)
+    return ['.'.join(map(str, row)) for row in octets.tolist()]
+
+def floors(addresses: NDArray, mask: int) -> NDArray:
+    """
+    Returns the lowest address of the subnet with a given mask each address is in.
+
+    :param addresses: An array of IPv4 addresses as integers.
+    :type addresses: NDArray
+    :param mask: The subnet mask in bits.
+    :type mask: int
+    :return: An array of the lowest addresses of the subnets.
+    :rtype: NDArray
+    """
+    _require()
+    return np.asarray(addresses, dtype = np.uint32) & np.uint32(iptools.netmask(mask))
+
+def contained(addresses: NDArray, subnets: Iterable[iptools.IntSubnet]) -> NDArray:
+    """
+    Tests which addresses are contained in any of some subnets.
+    Sorts the bounds of the subnets once, so runs in O((n + m) log m) for n addresses and m subnets.
+
+    :param addresses: An array of IPv4 addresses as integers.
+    :type addresses: NDArray
+    :param subnets: The subnets to test against.
+    :type subnets: Iterable[IntSubnet]
+    :return: A boolean array, True where the address is in one of the subnets.
+    :rtype: NDArray
+    """
+    _require()
+    addresses = np.asarray(addresses, dtype = np.uint32)
+    bounds = sorted(iptools.int_bounds(subnet) for subnet in subnets)
+    if not bounds:
+        return np.zeros(addresses.shape, dtype = bool)
+
+    # merge overlapping subnets so the bounds alternate between lower and upper
+    merged = [list(bounds[0])]
+    for lower, upper in bounds[1:]:
+        if lower <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], upper)
+        else:
+            merged.append([lower, upper])
+    lowers = np.array([lower for lower, _ in merged], dtype = np.uint32)
+    uppers = np.array([upper for _, upper in merged], dtype = np.uint32)
+
+    index = np.searchsorted(lowers, addresses, side = 'right') - 1
+    found = index >= 0
+    found[found] = addresses[found] <= uppers[index[found]]
+    return found
+
+def private(addresses: NDArray) -> NDArray:
+    """
+    Tests which addresses are part of the private namespace.
+
+    :param addresses: An array of IPv4 addresses as integers.
+    :type addresses: NDArray
+    :return: A boolean array, True where the address is private.
+    :rtype: NDArray
+    """
+    return contained(addresses, iptools.PRIVATE_SUBNETS)
+
+def unique(addresses: NDArray) -> NDArray:
+    """
+    Returns the sorted, unique addresses in an array.
+
+    :param addresses: An array of IPv4 addresses as integers.
+    :type addresses: NDArray
+    :return: The sorted, unique addresses.
+    :rtype: NDArray
+    """
+    _require()
+    return np.unique(np.asarray(addresses, dtype = np.uint32))
+
+def subnets(addresses: NDArray, mask: int = 24) -> list[str]:
+    """
+    Returns the subnets with a given mask that contain any of the addresses, lowest first.
+
+    :param addresses: An array of IPv4 addresses as integers.
+    :type addresses: NDArray
+    :param mask: The subnet mask in bits, defaults to 24
+    :type mask: int, optional
+    :return: A list of IPv4 subnets in CIDR form.
+    :rtype: list[str]
+    """
+    return [f'{floor}/{mask}' for floor in to_strings(unique(floors(addresses, mask)))]
@@ -1,11 +1,13 @@
 """
 Module of useful functions for manipulating IPv4 addresses, subnets, and ranges.
+
+The functions working on strings are thin, cached wrappers around an integer core,
+in which an address is an integer and a subnet is a tuple of its lowest address and mask.
 """
 
-import math
 import re
-from collections import deque
-from typing import Any, Generator, Iterable, Union
+from functools import lru_cache
+from typing import Any, Generator, Generic, Iterable, Optional, TypeVar, Union
 
 ####################
 # Module functions #
@@ -17,9 +19,83 @@ regex_ip = re.compile(r'((1?[0-9]{0,2}|2[0-4][0-9]|25[0-5])\.){3}(1?[0-9]{0,2}|2
 regex_subnet = re.compile(rf'{regex_ip.pattern}/([0-2]?[0-9]|3[0-1])')
 regex_range = re.compile(rf'{regex_ip.pattern}-{regex_ip.pattern}')
 
+## Integer core
+
+ADDRESS_BITS = 32
+"""Number of bits in an IPv4 address."""
+ALL_ONES = (1 << ADDRESS_BITS) - 1
+"""The IPv4 address with every bit set, as an integer."""
+CACHE_SIZE = 1 << 16
+"""Maximum number of results cached by each of the string functions."""
+
+IntSubnet = tuple[int, int]
+"""An IPv4 subnet as its lowest address, as an integer, and its mask in bits."""
+
+def netmask(mask: int) -> int:
+    """
+    Returns the netmask for a subnet mask in bits.
+
+    :param mask: The subnet mask in bits.
+    :type mask: int
+    :return: An integer with the highest *mask* bits set.
+    :rtype: int
+    """
+    return (ALL_ONES << (ADDRESS_BITS - mask)) & ALL_ONES
+
+def hostmask(mask: int) -> int:
+    """
+    Returns the hostmask for a subnet mask in bits.
+
+    :param mask: The subnet mask in bits.
+    :type mask: int
+    :return: An integer with the lowest 32 - *mask* bits set.
+    :rtype: int
+    """
+    return ALL_ONES >> mask
+
+def int_subnet(address: int, mask: int) -> IntSubnet:
+    """
+    Returns the subnet with a given mask an IPv4 address is in.
+
+    :param address: An IPv4 address as an integer.
+    :type address: int
+    :param mask: The subnet mask in bits.
+    :type mask: int
+    :return: The subnet.
+    :rtype: IntSubnet
+    """
+    return address & netmask(mask), mask
+
+def int_bounds(subnet: IntSubnet) -> tuple[int, int]:
+    """
+    Returns the lowest and highest addresses in a subnet.
+
+    :param subnet: The subnet.
+    :type subnet: IntSubnet
+    :return: The bounds of *subnet*, as integers.
+    :rtype: tuple[int, int]
+    """
+    base, mask = subnet
+    return base, base | hostmask(mask)
+
+def int_contains(subnet: IntSubnet, other: IntSubnet) -> bool:
+    """
+    Tests if a subnet contains another. Addresses are subnets with a mask of 32.
+
+    :param subnet: The subnet that may or may not contain *other*.
+    :type subnet: IntSubnet
+    :param other: The subnet that may or may not be contained in *subnet*.
+    :type other: IntSubnet
+    :return: True if *subnet* contains *other*.
+    :rtype: bool
+    """
+    base, mask = subnet
+    return other[1] >= mask and (other[0] ^ base) & netmask(mask) == 0
+
 
 ## Validation
 
+@lru_cache(maxsize = CACHE_SIZE)
 def valid_ip(string: str) -> bool:
     """
     Tests if a string is valid as a CIDR IPv4 address.
@@ -29,11 +105,9 @@ def valid_ip(string: str) -> bool:
     :return: A boolean. True if *string* is a valid CIDR IPv4 address.
     :rtype: bool
     """
-    if re.fullmatch(regex_ip, string):
-        return True
-    else:
-        return False
-    
+    return regex_ip.fullmatch(string) is not None
+
+@lru_cache(maxsize = CACHE_SIZE)
 def valid_subnet(string: str) -> bool:
     """
     Tests if a string is valid as a CIDR IPv4 subnet.
@@ -43,11 +117,9 @@ def valid_subnet(string: str) -> bool:
     :return: A boolean. True if *string* is a valid CIDR IPv4 subnet.
     :rtype: bool
     """
-    if re.fullmatch(regex_subnet, string):
-        return True
-    else:
-        return False
+    return regex_subnet.fullmatch(string) is not None
 
+@lru_cache(maxsize = CACHE_SIZE)
 def valid_range(string: str) -> bool:
     """
     Tests if a string is valid as a CIDR IPv4 range.
@@ -57,11 +129,16 @@ def valid_range(string: str) -> bool:
     :return: A boolean. True if *string* is a valid CIDR IPv4 range.
     :rtype: bool
     """
-    if re.fullmatch(regex_range, string):
-        return True
-    else:
-        return False
+    return regex_range.fullmatch(string) is not None
+
+PRIVATE_SUBNETS: tuple[IntSubnet, ...] = (
+    (0xC0A80000, 16),   # 192.168.0.0/16
+    (0x0A000000, 8),    # 10.0.0.0/8
+    (0xAC100000, 12),   # 172.16.0.0/12
+)
+"""The subnets of the private namespace."""
 
+@lru_cache(maxsize = CACHE_SIZE)
 def public_ip(ipv4: str) -> bool:
     """
     Tests if an IP address is part of the public or private namespace
@@ -71,18 +148,43 @@ def public_ip(ipv4: str) -> bool:
     :return: A boolean. True if *ipv4* is a public IP.
     :rtype: bool
     """
-    if subn_contains('192.168.0.0/16', ipv4):
-        return False
-    elif subn_contains('10.0.0.0/8', ipv4):
-        return False
-    elif subn_contains('172.16.0.0/12', ipv4):
-        return False
-    else:
-        return True
+    address = cidr2int(ipv4), ADDRESS_BITS
+    return not any(int_contains(subnet, address) for subnet in PRIVATE_SUBNETS)
 
 
 ## Subnet functions
 
+@lru_cache(maxsize = CACHE_SIZE)
+def parse_subnet(subn: str) -> IntSubnet:
+    """
+    Parses a subnet in CIDR form, discarding any bits of the address outside the mask.
+
+    :param subn: An IPv4 subnet, in CIDR form.
+    :type subn: str
+    :return: The subnet.
+    :rtype: IntSubnet
+    """
+    addr, _, mask = subn.rpartition('/')
+    return int_subnet(cidr2int(addr), int(mask))
+
+@lru_cache(maxsize = CACHE_SIZE)
+def parse_object(object: str) -> IntSubnet:
+    """
+    Parses an IPv4 address or subnet in CIDR form. Addresses are subnets with a mask of 32.
+
+    :param object: An IPv4 address or subnet, in CIDR form.
+    :type object: str
+    :raises ValueError: If object is not a valid IPv4 address or subnet.
+    :return: The subnet.
+    :rtype: IntSubnet
+    """
+    if valid_ip(object):
+        return cidr2int(object), ADDRESS_BITS
+    elif valid_subnet(object):
+        return parse_subnet(object)
+    else:
+        raise ValueError(f'Object to be tested must be a valid ipv4 or subnet.')
+
 def subn_floor(subn: str) -> str:
     """
     Returns the lowest IP address in a subnet
@@ -92,29 +194,7 @@ def subn_floor(subn: str) -> str:
     :return: An IPv4 address in CIDR form.
     :rtype: str
     """
-    mask = int(subn.split('/')[-1])
-    addr = subn.split('/')[0]
-    octets = addr.split('.')
-    for octet in range(4):
-        octets[octet] = int(octets[octet])
-
-    split_octet = mask // 8
-    
-    octet_mask = mask % 8
-    if octet_mask:
-        octets[split_octet] >>= 8 - octet_mask
-        octets[split_octet] <<= 8 - octet_mask  # discard all bits after mask
-    else:
-        octets[split_octet] = 0
-
-    str_octets = []
-    for octet in range(4):
-        if octet > split_octet:
-            octets[octet] = 0
-        str_octets.append(str(octets[octet]))
-            
-    min_addr = '.'.join(str_octets)
-    return min_addr
+    return int2cidr(parse_subnet(subn)[0])
 
 def subn_bounds(subn: str, integer: bool = False) -> dict[str, Union[str, int]]:
     """
@@ -127,22 +207,11 @@ def subn_bounds(subn: str, integer: bool = False) -> dict[str, Union[str, int]]:
     :return: A dictionary with keys 'upper' and 'lower' of the bounds of *subn*.
     :rtype: dict[str, Union[str, int]]
     """
-    lower = cidr2int(subn_floor(subn))
-    bounds = {'lower': lower}
-
-    mask = int(subn.split('/')[-1])
-
-    upper = lower
-    for bit in range(32 - mask):
-        upper += 2**bit    #set all bits out of mask range
-    bounds['upper'] = upper
-
-    if not integer:
-        for bound in bounds:
-            bounds[bound] = int2cidr(bounds[bound])
+    lower, upper = int_bounds(parse_subnet(subn))
+    if integer:
+        return {'lower': lower, 'upper': upper}
+    return {'lower': int2cidr(lower), 'upper': int2cidr(upper)}
 
-    return bounds
-    
 def subn_equiv(subn: str, new_mask: int) -> list[str]:
     """
     Converts a subnet to new subnet(s) with the given mask.
@@ -155,26 +224,19 @@ def subn_equiv(subn: str, new_mask: int) -> list[str]:
     :return: A list of IPv4 subnets in CIDR form, with an equivalent address space to *subn*.
     :rtype: list[str]
     """
-    if valid_subnet(subn):
-        old_mask = int(subn.split('/')[-1])
-    else:
+    if not valid_subnet(subn):
         raise ValueError('Cannot find equivalent subnets to invalid subnet.')
-    subnets = []
-    int_min_addr = cidr2int(subn_floor(subn))
+    base, old_mask = parse_subnet(subn)
 
     if new_mask > old_mask:
-        for _ in range(2**(new_mask - old_mask)):
-            min_addr = int2cidr(int_min_addr)
-            new_subnet = min_addr +'/'+ str(new_mask)
-            subnets.append(new_subnet)
-
-            int_min_addr += (2**(32-new_mask))
+        return [
+            f'{int2cidr(base + offset)}/{new_mask}' for offset in range(
+                0, 1 << (ADDRESS_BITS - old_mask), 1 << (ADDRESS_BITS - new_mask))
+        ]
     else:
-        new_subnet = subn_floor(subn) +'/'+ str(new_mask)
-        subnets.append(subn_floor(new_subnet) +'/'+ str(new_mask))
-
-    return subnets
+        return [f'{int2cidr(int_subnet(base, new_mask)[0])}/{new_mask}']
 
+@lru_cache(maxsize = CACHE_SIZE)
 def subn_contains(subn: str, object: str) -> bool:
     """
     Tests if a subnet contains an IP or subnet.
@@ -187,21 +249,8 @@ def subn_contains(subn: str, object: str) -> bool:
     :return: A boolean. True if *subn* does contain *object*.
     :rtype: bool
     """
-    if valid_ip(object):
-        ip = object
-    elif valid_subnet(object):
-        bounds = subn_bounds(object)
-        return (subn_contains(subn, bounds['upper']) & subn_contains(subn, bounds['lower']))
-    else:
-        raise ValueError(f'Object to be tested must be a valid ipv4 or subnet.')
+    return int_contains(parse_subnet(subn), parse_object(object))
 
-    bin_ip = cidr2int(ip)
-    bounds = subn_bounds(subn, integer=True)
-    if bin_ip >= int(bounds['lower']) and bin_ip <= int(bounds['upper']):
-        return True
-    else:
-        return False
-    
 def subn_iter(subn: str) -> Generator[str, Any, Any]:
     """
     Returns a generator which yields each IP address in a subnet, lowest first.
@@ -212,12 +261,102 @@ def subn_iter(subn: str) -> Generator[str, Any, Any]:
     :yield: Each IPv4 address in the subnet, as a string.
     :rtype: Generator[str, Any, Any]
     """
-    for ip in range_iter(**subn_bounds(subn)):
-        yield ip
+    yield from range_iter(*int_bounds(parse_subnet(subn)))
+
+
+T = TypeVar('T')
+_EMPTY = object()
+
+class _TrieNode:
+    __slots__ = ('children', 'value')
+
+    def __init__(self) -> None:
+        self.children: list[Optional[_TrieNode]] = [None, None]
+        self.value: Any = _EMPTY
+
+class SubnetTrie(Generic[T]):
+    """
+    A binary trie mapping IPv4 subnets to values.
+    Finds the most specific subnet containing an address or subnet in at most 32 steps.
+    """
+    def __init__(self) -> None:
+        self._root = _TrieNode()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _node(self, subnet: IntSubnet, create: bool = False) -> Optional[_TrieNode]:
+        base, mask = subnet
+        node = self._root
+        for depth in range(mask):
+            bit = (base >> (ADDRESS_BITS - 1 - depth)) & 1
+            child = node.children[bit]
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[bit] = _TrieNode()
+            node = child
+        return node
+
+    def setdefault(self, subnet: IntSubnet, default: T) -> T:
+        """
+        Returns the value for *subnet*, first setting it to *default* if it has none.
+
+        :param subnet: The subnet.
+        :type subnet: IntSubnet
+        :param default: The value to set if *subnet* has no value.
+        :type default: T
+        :return: The value for *subnet*.
+        :rtype: T
+        """
+        node = self._node(subnet, create = True)
+        if node.value is _EMPTY:
+            node.value = default
+            self._size += 1
+        return node.value
+
+    def __setitem__(self, subnet: IntSubnet, value: T) -> None:
+        node = self._node(subnet, create = True)
+        if node.value is _EMPTY:
+            self._size += 1
+        node.value = value
+
+    def __getitem__(self, subnet: IntSubnet) -> T:
+        node = self._node(subnet)
+        if node is None or node.value is _EMPTY:
+            raise KeyError(subnet)
+        return node.value
+
+    def __contains__(self, subnet: IntSubnet) -> bool:
+        node = self._node(subnet)
+        return node is not None and node.value is not _EMPTY
+
+    def longest_match(self, subnet: IntSubnet) -> Optional[tuple[int, T]]:
+        """
+        Finds the most specific subnet in the trie that contains *subnet*.
+
+        :param subnet: The subnet to match. Addresses are subnets with a mask of 32.
+        :type subnet: IntSubnet
+        :return: The mask and value of the most specific containing subnet,
+        or None if no subnet in the trie contains *subnet*.
+        :rtype: Optional[tuple[int, T]]
+        """
+        base, mask = subnet
+        node = self._root
+        match = None if node.value is _EMPTY else (0, node.value)
+        for depth in range(mask):
+            node = node.children[(base >> (ADDRESS_BITS - 1 - depth)) & 1]
+            if node is None:
+                break
+            if node.value is not _EMPTY:
+                match = (depth + 1, node.value)
+        return match
 
 
 ## Conversion functions
 
+@lru_cache(maxsize = CACHE_SIZE)
 def cidr2int(ipv4: str) -> int:
     """
     Converts an IPv4 address provided as a string in CIDR form, to an integer.
@@ -228,11 +367,9 @@ def cidr2int(ipv4: str) -> int:
     :rtype: int
     """
     octets = ipv4.split('.')
-    int_ip = 0
-    for octet in range(4):
-        int_ip += int(octets[octet]) << (8 * (3 - octet))
-    return int_ip
+    return (int(octets[0]) << 24) | (int(octets[1]) << 16) | (int(octets[2]) << 8) | int(octets[3])
 
+@lru_cache(maxsize = CACHE_SIZE)
 def int2cidr(ipv4: int) -> str:
     """
     Converts an IPv4 address provided as an integer, to a string in CIDR form.
@@ -242,9 +379,7 @@ def int2cidr(ipv4: int) -> str:
     :return: The same IPv4 address as a string in CIDR format.
     :rtype: str
     """
-    bin_str = bin(ipv4)[2:].zfill(32)
-    str_octets = [str(int(bin_str[octet:octet+8], base = 2)) for octet in range(0,32,8)]
-    return '.'.join(str_octets)
+    return f'{ipv4 >> 24 & 255}.{ipv4 >> 16 & 255}.{ipv4 >> 8 & 255}.{ipv4 & 255}'
 
 
 ## Other
@@ -265,10 +400,8 @@ def range_iter(lower: Union[str, int], upper: Union[str, int]) -> Generator[str,
     if isinstance(upper, str):
         upper = cidr2int(upper)
     if lower > upper: lower, upper = upper, lower
-    current = lower
-    while current <= upper:
-        yield int2cidr(current)
-        current += 1
+    for address in range(lower, upper + 1):
+        yield f'{address >> 24}.{address >> 16 & 255}.{address >> 8 & 255}.{address & 255}'
 
 def search_string(string: str, object: str = 'ipv4', delimiter: str = None) -> list[str]:
     """
@@ -286,11 +419,11 @@ def search_string(string: str, object: str = 'ipv4', delimiter: str = None) -> l
     :rtype: list[str]
     """
     if object == 'ipv4':
-        validate = valid_ip
+        pattern = regex_ip
     elif object == 'ipv4_subnet':
-        validate = valid_subnet
+        pattern = regex_subnet
     elif object == 'ipv4_range':
-        validate = valid_range
+        pattern = regex_range
     else:
         raise ValueError(f'Search object must be one of: ipv4, ipv4_subnet; Not {object}')
 
@@ -299,12 +432,13 @@ def search_string(string: str, object: str = 'ipv4', delimiter: str = None) -> l
         # Ignore comments
         if not (line.startswith('#') or line.startswith('//')):
             cleanline = line.strip()
-            if validate(cleanline):
+            if pattern.fullmatch(cleanline):
                 outlist.append(cleanline)
     outlist = list(dict.fromkeys(outlist))
     return outlist
 
 
+@lru_cache(maxsize = CACHE_SIZE)
 def sort(ip: str, mask: int = 24) -> str:
     """
     Returns the subnet with a given mask an IPv4 address is in
@@ -316,16 +450,94 @@ def sort(ip: str, mask: int = 24) -> str:
     :return: An IPv4 subnet in CIDR format.
     :rtype: str
     """
-    mask = str(mask)
-    subn = ip +'/'+ str(mask)
-    return f'{subn_floor(subn)}/{str(mask)}'
+    mask = int(mask)
+    return f'{int2cidr(int_subnet(cidr2int(ip), mask)[0])}/{mask}'
+
+
+def merge_ranges(ranges: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Merges ranges of IPv4 addresses that overlap or are adjacent.
+    Sorts the ranges once, so runs in O(n log n).
+
+    :param ranges: An iterable of ranges, as tuples of their inclusive bounds as integers.
+    :type ranges: Iterable[tuple[int, int]]
+    :return: A sorted list of the disjoint, non-adjacent ranges covering the same addresses.
+    :rtype: list[tuple[int, int]]
+    """
+    merged: list[tuple[int, int]] = []
+    for lower, upper in sorted(ranges):
+        if merged and lower <= merged[-1][1] + 1:
+            if upper > merged[-1][1]:
+                merged[-1] = (merged[-1][0], upper)
+        else:
+            merged.append((lower, upper))
+    return merged
 
+def range_subnets(lower: int, upper: int) -> list[IntSubnet]:
+    """
+    Returns the fewest subnets that exactly cover a range of IPv4 addresses.
+
+    :param lower: The lowest address in the range, as an integer.
+    :type lower: int
+    :param upper: The highest address in the range, as an integer.
+    :type upper: int
+    :return: A list of subnets, lowest first.
+    :rtype: list[IntSubnet]
+    """
+    subnets = []
+    while lower <= upper:
+        # the largest block that is aligned at lower and does not pass upper
+        aligned = (lower & -lower).bit_length() - 1 if lower else ADDRESS_BITS
+        fits = (upper - lower + 1).bit_length() - 1
+        host_bits = min(aligned, fits)
+        subnets.append((lower, ADDRESS_BITS - host_bits))
+        lower += 1 << host_bits
+    return subnets
+
+def _object_range(object: str) -> Optional[tuple[int, int]]:
+    if valid_ip(object) or (object.endswith('/32') and valid_ip(object[:-3])):
+        address = cidr2int(object.split('/')[0])
+        return address, address
+    elif valid_subnet(object):
+        return int_bounds(parse_subnet(object))
+    elif valid_range(object):
+        lower, upper = sorted(map(cidr2int, object.split('-')))
+        return lower, upper
+    return None
+
+def aggregate(objects: Iterable[str], output: str = 'subnets') -> list[str]:
+    """
+    Replaces IPv4 addresses, subnets and ranges with the fewest subnets or ranges
+    that cover the same addresses. Overlapping and adjacent objects are merged.
+    Strings that are not valid addresses, subnets, or ranges are ignored.
+
+    :param objects: An iterable of IPv4 addresses, subnets, and ranges, as strings in CIDR form.
+    :type objects: Iterable[str]
+    :param output: The type of object to output, one of: 'subnets', 'ranges'. Defaults to 'subnets'
+    :type output: str, optional
+    :raises ValueError: If *output* is not one of: 'ranges', 'subnets'.
+    :return: A list of IPv4 subnets or ranges, lowest first. Single addresses are not given a mask or range.
+    :rtype: list[str]
+    """
+    if output not in ('ranges', 'subnets'):
+        raise ValueError(f'Unknown output mode: {output}. Must be one of: ranges, subnets.')
+    ranges = merge_ranges(bounds for bounds in map(_object_range, objects) if bounds)
+
+    aggregated = []
+    for lower, upper in ranges:
+        if output == 'ranges':
+            aggregated.append(int2cidr(lower) if lower == upper 
+                else f'{int2cidr(lower)}-{int2cidr(upper)}')
+        else:
+            for base, mask in range_subnets(lower, upper):
+                aggregated.append(int2cidr(base) if mask == ADDRESS_BITS 
+                    else f'{int2cidr(base)}/{mask}')
+    return aggregated
 
 def collapse_iplist(iplist: Iterable[str], output = 'ranges') -> list[str]:
     """
     Scans a list of IPv4 addresses and replaces consecutive addresses with an equivalent range or subnet.
-
-    2do: collapse consecutive subnets aswell
+    Like aggregate, but defaults to outputting ranges.
 
     :param iplist: An iterable object containing IPv4 addresses as strings.
     :type iplist: Iterable[str]
@@ -335,44 +547,7 @@ def collapse_iplist(iplist: Iterable[str], output = 'ranges') -> list[str]:
     :return: A list of IPv4 addresses and IPv4 ranges / subnets
     :rtype: list[str]
     """
-    if output not in ('ranges', 'subnets'):
-        raise ValueError(f'Unknown output mode: {output}. Must be one of: ranges, subnets.')
-    # get unique, sorted deque of ips as integers
-    ipdeque = deque(sorted(set([cidr2int(ip) for ip in iplist if valid_ip(ip)])))
-    minlist = []
-    while ipdeque:
-        ip = ipdeque.popleft()
-        currentInt = ip
-        currentSubn = [ip]
-        for nextint in ipdeque:
-            if output == 'subnets':
-                nextmask = math.ceil(math.log2(len(currentSubn) + 1))
-                octet4 = int(int2cidr(ip).split('.')[-1])
-                if not octet4 % (2**nextmask) == 0:
-                    break
-            if nextint == currentInt + 1:
-                currentInt = nextint
-                currentSubn.append(nextint)
-            else:
-                break
-
-        if len(currentSubn) == 1:
-            currentSubn.pop()
-
-        if currentSubn:
-            if output == 'subnets':
-                while not math.log2(len(currentSubn)).is_integer():
-                    currentSubn.pop()
-                mask = int(32 - math.log2(len(currentSubn)))
-                minlist.append(f'{int2cidr(currentSubn[0])}/{mask}')
-            else:
-                minlist.append(f'{int2cidr(ip)}-{int2cidr(currentSubn[-1])}')
-            for _ in range(len(currentSubn) - 1):
-                ipdeque.popleft()
-        else:
-            minlist.append(int2cidr(ip))
-    
-    return minlist
+    return aggregate(iplist, output)
 
 
 def ip_from_rdns_name(dns_name: str) -> str:
@@ -385,4 +560,4 @@ def ip_from_rdns_name(dns_name: str) -> str:
     :return: [description]
     :rtype: str
     """
-    return '.'.join(dns_name.replace('.in-addr.arpa','').split('.')[::-1])
\ No newline at end of file
+    return '.'.join(dns_name.replace('.in-addr.arpa','').split('.')[::-1])
@@ -0,0 +1,174 @@
+"""
+This module contains the upload manifest, which records the content of each document
+in the last successful upload so that only changed documents need to be uploaded.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from netdox.utils import APPDIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(APPDIR, 'src', 'upload-manifest.json')
+"""Default path to the upload manifest."""
+VERSION = 1
+"""Version of the manifest format."""
+_CHUNK_SIZE = 1 << 20
+
+
+def file_hash(path: str) -> str:
+    """
+    Returns a hash of the content of the file at *path*.
+
+    :param path: Path to the file.
+    :type path: str
+    :return: The hex digest of the content.
+    :rtype: str
+    """
+    digest = hashlib.blake2b(digest_size = 16)
+    with open(path, 'rb') as stream:
+        while chunk := stream.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def docid_of(arcname: str) -> Optional[str]:
+    """
+    Returns the docid of the document with the given path in the upload,
+    or None if the file is not a document.
+
+    :param arcname: Path to the file, relative to the output directory.
+    :type arcname: str
+    :return: The docid, which is the filename of the document without its extension.
+    :rtype: Optional[str]
+    """
+    name, ext = os.path.splitext(os.path.basename(arcname))
+    return name if ext == '.psml' else None
+
+
+@dataclass
+class ManifestDiff:
+    """The differences between the files in an upload and the upload manifest."""
+    hashes: dict[str, str]
+    """Maps the path of each file in the upload to the hash of its content."""
+    changed: list[str] = field(default_factory = list)
+    """Paths of files that are new or have changed since the last upload."""
+    removed: list[str] = field(default_factory = list)
+    """Paths of files in the last upload that are no longer present."""
+
+    @property
+    def removed_docids(self) -> list[str]:
+        """Docids of the documents in the last upload that are no longer present."""
+        return [id for id in map(docid_of, self.removed) if id]
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.removed)
+
+
+class UploadManifest:
+    """
+    Maps the path of each file in the last successful upload to the hash of its content.
+    Paths are relative to the output directory.
+    """
+    path: str
+    """Path the manifest is saved to."""
+    hashes: dict[str, str]
+    """Maps the path of each file to the hash of its content."""
+
+    def __init__(self, path: str = DEFAULT_PATH, hashes: dict[str, str] = None) -> None:
+        """
+        Constructor.
+
+        :param path: Path the manifest is saved to, defaults to DEFAULT_PATH
+        :type path: str, optional
+        :param hashes: Maps the path of each file to the hash of its content, defaults to None
+        :type hashes: dict[str, str], optional
+        """
+        self.path = path
+        self.hashes = hashes or {}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> UploadManifest:
+        """
+        Loads the manifest at *path*.
+        If it does not exist or cannot be read, the manifest is empty
+        and every file will be treated as changed.
+
+        :param path: Path to the manifest, defaults to DEFAULT_PATH
+        :type path: str, optional
+        :return: The manifest.
+        :rtype: UploadManifest
+        """
+        try:
+            with open(path, 'r') as stream:
+                content = json.load(stream)
+            if content.get('version') != VERSION:
+                raise ValueError(f'Unknown manifest version: {content.get("version")}')
+            return cls(path, dict(content['files']))
+        except FileNotFoundError:
+            logger.info('No upload manifest found; all documents will be uploaded.')
+        except Exception as exc:
+            logger.warning(f'Failed to read upload manifest; all documents will be uploaded: {exc}')
+        return cls(path)
+
+    def save(self) -> None:
+        """
+        Saves the manifest to *path*, replacing the existing file atomically.
+        """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as stream:
+            json.dump({'version': VERSION, 'files': self.hashes}, stream)
+        os.replace(tmp_path, self.path)
+
+    def diff(self,
+            files: dict[str, str],
+            force: Iterable[str] = (),
+            workers: int = None
+        ) -> ManifestDiff:
+        """
+        Compares the files in an upload to the manifest.
+
+        :param files: Maps the path of each file in the upload, relative to the output directory,
+        to its absolute path.
+        :type files: dict[str, str]
+        :param force: Paths of files to treat as changed regardless of their content,
+        defaults to ()
+        :type force: Iterable[str], optional
+        :param workers: The number of threads to hash files in,
+        defaults to the number of CPUs.
+        :type workers: int, optional
+        :return: The differences between the upload and the manifest.
+        :rtype: ManifestDiff
+        """
+        arcnames = list(files)
+        with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+            hashes = dict(zip(arcnames, pool.map(file_hash, (files[name] for name in arcnames))))
+
+        force = set(force)
+        return ManifestDiff(
+            hashes = hashes,
+            changed = [name for name in arcnames
+                if name in force or self.hashes.get(name) != hashes[name]],
+            removed = [name for name in self.hashes if name not in hashes]
+        )
+
+    def update(self, diff: ManifestDiff, keep: Iterable[str] = ()) -> None:
+        """
+        Updates the manifest to describe the upload that *diff* was computed for.
+
+        :param diff: The differences between the upload and this manifest.
+        :type diff: ManifestDiff
+        :param keep: Paths of removed files to keep in the manifest,
+        e.g. because they could not be archived and should be removed again next time.
+        Defaults to ()
+        :type keep: Iterable[str], optional
+        """
+        kept = {name: self.hashes[name] for name in keep if name in self.hashes}
+        self.hashes = dict(diff.hashes) | kept
@@ -0,0 +1,428 @@
+"""
+A registry of counters, gauges and histograms that is safe to update from many threads.
+
+Each metric keeps one shard of values per thread that updates it,
+so an update only touches a dict owned by the calling thread.
+Only the first update from each thread takes a lock, to add its shard.
+Shards are only summed when the metric is read or exported.
+Metrics can be exported in the Prometheus text format or as JSON.
+"""
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Iterator, Optional, Sequence, TypeVar, cast
+
+LabelValues = tuple
+"""The values of the labels of a metric, in the order of its label names."""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+"""Default upper bounds of the buckets of a histogram, in seconds."""
+
+
+def _label_value(value: Any) -> str:
+    return str(value.value) if isinstance(value, Enum) else str(value)
+
+def _format_number(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Metric:
+    """
+    Base class for a metric, with values sharded by thread.
+    """
+    type: str
+    """The Prometheus type of the metric."""
+    name: str
+    """Name of the metric."""
+    help: str
+    """Description of the metric."""
+    labelnames: tuple[str, ...]
+    """Names of the labels the values of the metric are split by."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: list[dict] = []
+
+    def _shard(self) -> dict:
+        """Returns the shard of values owned by the calling thread."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def collect(self) -> dict[LabelValues, Any]:
+        """
+        Returns the values of the metric, summed across threads.
+
+        :return: A dict mapping the label values of each series to its value.
+        :rtype: dict[LabelValues, Any]
+        """
+        with self._lock:
+            shards = list(self._shards)
+        totals: dict[LabelValues, Any] = {}
+        for shard in shards:
+            for labels, value in list(shard.items()):
+                totals[labels] = self._merge(totals[labels], value) if labels in totals else value
+        return totals
+
+    def _merge(self, total: Any, value: Any) -> Any:
+        return total + value
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        """
+        Yields the samples of the metric, for export.
+
+        :yield: The name, labels and value of each sample.
+        :rtype: Iterator[tuple[str, dict[str, str], float]]
+        """
+        for labels, value in sorted(self.collect().items(), key = lambda item: str(item[0])):
+            yield self.name, self._labels(labels), value
+
+    def _labels(self, labels: LabelValues) -> dict[str, str]:
+        return dict(zip(self.labelnames, map(_label_value, labels)))
+
+    def to_dict(self) -> dict:
+        """
+        Returns the metric as a JSON-serialisable dict.
+
+        :rtype: dict
+        """
+        return {
+            'type': self.type,
+            'help': self.help,
+            'samples': [{'name': name, 'labels': labels, 'value': value}
+                for name, labels, value in self.samples()]
+        }
+
+    def __getstate__(self) -> dict:
+        state = {key: value for key, value in self.__dict__.items()
+            if key not in ('_lock', '_local', '_shards')}
+        state['_values'] = self.collect()
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        values = state.pop('_values')
+        self.__dict__.update(state)
+        self._reset()
+        self._shards.append(values)
+
+
+class _Summed(Metric):
+    """
+    Base class for a metric whose series are numbers, summed across threads.
+    """
+    def _add(self, amount: float, labels: LabelValues) -> None:
+        try:
+            shard = self._local.values
+        except AttributeError:
+            shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        """
+        Returns the value of a series, summed across threads.
+
+        :param labels: The values of the labels of the series, defaults to ()
+        :type labels: LabelValues, optional
+        :rtype: float
+        """
+        with self._lock:
+            shards = list(self._shards)
+        return sum(shard.get(labels, 0) for shard in shards)
+
+
+class Counter(_Summed):
+    """
+    A value that only goes up, e.g. the number of API calls made.
+    """
+    type = 'counter'
+
+    def inc(self, amount: float = 1, labels: LabelValues = ()) -> None:
+        """
+        Increments the counter.
+
+        :param amount: The amount to increment by, defaults to 1
+        :type amount: float, optional
+        :param labels: The values of the labels of the series to increment, defaults to ()
+        :type labels: LabelValues, optional
+        :raises ValueError: If *amount* is negative.
+        """
+        if amount < 0:
+            raise ValueError('Counters can only be incremented by a non-negative amount.')
+        self._add(amount, labels)
+
+
+class Gauge(_Summed):
+    """
+    A value that can go up and down, e.g. the number of objects in the network.
+    """
+    type = 'gauge'
+
+    def inc(self, amount: float = 1, labels: LabelValues = ()) -> None:
+        """
+        Increments the gauge.
+
+        :param amount: The amount to increment by, defaults to 1
+        :type amount: float, optional
+        :param labels: The values of the labels of the series to increment, defaults to ()
+        :type labels: LabelValues, optional
+        """
+        self._add(amount, labels)
+
+    def dec(self, amount: float = 1, labels: LabelValues = ()) -> None:
+        """
+        Decrements the gauge.
+
+        :param amount: The amount to decrement by, defaults to 1
+        :type amount: float, optional
+        :param labels: The values of the labels of the series to decrement, defaults to ()
+        :type labels: LabelValues, optional
+        """
+        self._add(-amount, labels)
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        """
+        Sets the gauge. Not atomic with respect to updates from other threads at the same time.
+
+        :param value: The value to set.
+        :type value: float
+        :param labels: The values of the labels of the series to set, defaults to ()
+        :type labels: LabelValues, optional
+        """
+        self._add(value - self.value(labels), labels)
+
+
+class Histogram(Metric):
+    """
+    Counts observations in buckets, e.g. the latency of API calls.
+    """
+    type = 'histogram'
+    buckets: tuple[float, ...]
+    """The upper bounds of the buckets, ending with infinity."""
+
+    def __init__(self,
+            name: str,
+            help: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+        ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != math.inf:
+            self.buckets += (math.inf,)
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        """
+        Records an observation.
+
+        :param value: The value observed.
+        :type value: float
+        :param labels: The values of the labels of the series, defaults to ()
+        :type labels: LabelValues, optional
+        """
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * len(self.buckets) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-1] += value
+
+    @contextmanager
+    def time(self, labels: LabelValues = ()) -> Iterator[None]:
+        """
+        Observes the seconds taken by the enclosed block.
+
+        :param labels: The values of the labels of the series, defaults to ()
+        :type labels: LabelValues, optional
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, labels)
+
+    def _merge(self, total: list, value: list) -> list:
+        return [a + b for a, b in zip(total, value)]
+
+    def collect(self) -> dict[LabelValues, list]:
+        # copy so observations made while exporting never change the result
+        return {labels: list(series) for labels, series in super().collect().items()}
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for labels, series in sorted(self.collect().items(), key = lambda item: str(item[0])):
+            names = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket', names | {'le': _format_number(bound)}, cumulative
+            yield f'{self.name}_sum', names, series[-1]
+            yield f'{self.name}_count', names, cumulative
+
+
+MetricT = TypeVar('MetricT', bound = Metric)
+
+class Registry:
+    """
+    A collection of metrics, by name.
+    """
+    _metrics: dict[str, Metric]
+    """Maps names to the registered metrics."""
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._registering = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        return {key: value for key, value in self.__dict__.items() if key != '_registering'}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._registering = threading.Lock()
+
+    def __iter__(self) -> Iterator[Metric]:
+        yield from list(self._metrics.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._metrics
+
+    def get(self, name: str) -> Optional[Metric]:
+        """
+        Returns the metric with a given name, if it is registered.
+
+        :param name: The name of the metric.
+        :type name: str
+        :rtype: Optional[Metric]
+        """
+        return self._metrics.get(name)
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Registers a metric, or returns the equivalent metric that is already registered.
+
+        :param metric: The metric to register.
+        :type metric: Metric
+        :raises ValueError: If a different metric is registered with the same name.
+        :return: The registered metric.
+        :rtype: Metric
+        """
+        with self._registering:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if existing is not metric and (
+            type(existing) is not type(metric) or existing.labelnames != metric.labelnames
+        ):
+            raise ValueError(f'A different metric is already registered as {metric.name}.')
+        return existing
+
+    def _registered(self, cls: type[MetricT], name: str, labelnames: Sequence[str]) -> Optional[MetricT]:
+        """
+        Returns the metric registered as *name* if it has the given type and label names,
+        so that looking up a registered metric does not construct a new one.
+        """
+        existing = self._metrics.get(name)
+        if type(existing) is cls and existing.labelnames == tuple(labelnames):
+            return cast(MetricT, existing)
+        return None
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """
+        Registers a counter, or returns it if it is already registered.
+
+        :param name: The name of the counter.
+        :type name: str
+        :param help: A description of the counter.
+        :type help: str
+        :param labelnames: Names of the labels to split the counter by, defaults to ()
+        :type labelnames: Sequence[str], optional
+        :rtype: Counter
+        """
+        return self._registered(Counter, name, labelnames) or \
+            cast(Counter, self.register(Counter(name, help, labelnames)))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """
+        Registers a gauge, or returns it if it is already registered.
+
+        :param name: The name of the gauge.
+        :type name: str
+        :param help: A description of the gauge.
+        :type help: str
+        :param labelnames: Names of the labels to split the gauge by, defaults to ()
+        :type labelnames: Sequence[str], optional
+        :rtype: Gauge
+        """
+        return self._registered(Gauge, name, labelnames) or \
+            cast(Gauge, self.register(Gauge(name, help, labelnames)))
+
+    def histogram(self,
+            name: str,
+            help: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+        ) -> Histogram:
+        """
+        Registers a histogram, or returns it if it is already registered.
+
+        :param name: The name of the histogram.
+        :type name: str
+        :param help: A description of the histogram.
+        :type help: str
+        :param labelnames: Names of the labels to split the histogram by, defaults to ()
+        :type labelnames: Sequence[str], optional
+        :param buckets: Upper bounds of the buckets, defaults to DEFAULT_BUCKETS
+        :type buckets: Sequence[float], optional
+        :rtype: Histogram
+        """
+        return self._registered(Histogram, name, labelnames) or \
+            cast(Histogram, self.register(Histogram(name, help, labelnames, buckets)))
+
+    def to_prometheus(self) -> str:
+        """
+        Exports the metrics in the Prometheus text format.
+
+        :return: The metrics as text.
+        :rtype: str
+        """
+        lines = []
+        for metric in sorted(self, key = lambda metric: metric.name):
+            lines.append(f'# HELP {metric.name} {_escape(metric.help)}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    name += '{' + ','.join(
+                        f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+                lines.append(f'{name} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> str:
+        """
+        Exports the metrics as JSON.
+
+        :return: A JSON object mapping the name of each metric to its type, help and samples.
+        :rtype: str
+        """
+        return json.dumps({metric.name: metric.to_dict() for metric in self}, indent = 2)
@@ -0,0 +1,77 @@
+"""
+Normalises the names of DNS objects in one memoised call.
+
+Every Domain, IPv4Address and DNS link needs a canonical name, its kind, its zone, and for IPs
+its subnet and whether it is private. These are computed once per distinct name and cached.
+Root domains are found offline, using the public suffix list bundled with tldextract.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from netdox import iptools, utils
+
+DOMAIN = 'domain'
+"""Kind of a domain name; the same as the type of a Domain."""
+IPV4 = 'ipv4'
+"""Kind of an IPv4 address; the same as the type of an IPv4Address."""
+
+CACHE_SIZE = 1 << 16
+"""Maximum number of normalised names to cache."""
+
+
+@dataclass(frozen = True)
+class Name:
+    """The normalised form of the name of a DNS object."""
+    name: str
+    """The canonical name; lower case, without surrounding whitespace or dots."""
+    kind: str
+    """The kind of object the name belongs to, *DOMAIN* or *IPV4*."""
+    zone: str
+    """The root domain of a domain, or the reverse lookup zone of an IP."""
+    subnet: Optional[str] = None
+    """The /24 subnet of an IP in CIDR form, or None for a domain."""
+    is_private: bool = False
+    """Whether an IP is in the private namespace. Always False for a domain."""
+
+
+def canonical(name: str) -> str:
+    """
+    Returns the canonical form of a domain name or IPv4 address, without validating it.
+
+    :param name: The name to canonicalise.
+    :type name: str
+    :return: The name in lower case, without surrounding whitespace or dots.
+    :rtype: str
+    """
+    return name.strip().strip('.').lower()
+
+def normalise(name: str) -> Name:
+    """
+    Normalises the name of a DNS object.
+    Results are cached by canonical name, so names differing only in case share an entry.
+
+    :param name: A domain name or IPv4 address.
+    :type name: str
+    :raises ValueError: If *name* is neither a valid domain name nor a valid IPv4 address.
+    :return: The canonical name, kind, zone, and for IPs the subnet and whether it is private.
+    :rtype: Name
+    """
+    return _normalise(canonical(name))
+
+@lru_cache(maxsize = CACHE_SIZE)
+def _normalise(name: str) -> Name:
+    if iptools.valid_ip(name):
+        octets = name.split('.')
+        return Name(
+            name = name,
+            kind = IPV4,
+            zone = '.'.join(octets[-2::-1]) + '.in-addr.arpa',
+            subnet = iptools.int2cidr(iptools.cidr2int(name) & iptools.netmask(24)) + '/24',
+            is_private = not iptools.public_ip(name)
+        )
+    elif utils.valid_domain(name):
+        return Name(name, DOMAIN, utils.root_domain(name))
+    raise ValueError(f'Not a valid domain name or IPv4 address: {name}')
@@ -14,7 +14,7 @@ from bs4.element import Tag
 
 from netdox import base, dns, iptools, utils
 from netdox.helpers import CountedFacets
-from netdox.psml import (NODE_TEMPLATE, Fragment, PropertiesFragment, Property,
+from netdox.psml import (NODE_TEMPLATE, PropertiesFragment, Property,
                          Section, XRef)
 
 if TYPE_CHECKING:
@@ -228,7 +228,7 @@ class Node(base.NetworkObject):
         if notes_section:
             notes_frag = notes_section.find('fragment', id='notes')
             if notes_frag:
-                node.notes = Fragment.from_tag(notes_frag)
+                node.notes = str(notes_frag).encode('utf-8')
 
         return node
 
@@ -588,7 +588,7 @@ class PlaceholderNode(Node):
         node.domains |= self.domains
         node.ips |= self.ips
         node.psmlFooter.extend(self.psmlFooter)
-        if str(node.notes) == self.DEFAULT_NOTES: node.notes = self.notes
+        if node.raw_notes == self.DEFAULT_RAW_NOTES: node.notes = self.raw_notes
 
         for domain in self.domains:
             if self.network.domains[domain].node is self:
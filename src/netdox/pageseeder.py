@@ -4,28 +4,87 @@ Used to interface with the PageSeeder REST API for numerous operations throughou
 Provides many various convenience functions for PageSeeder API actions, returning JSON where possible.
 The decorator ``@auth`` injects default values and authentication details to the most of the functions in this script.
 """
+from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
 import re
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta
-from functools import lru_cache, wraps
+from functools import partial, wraps
 from inspect import signature
-from time import sleep
-from typing import Iterable, Optional
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+from time import monotonic, sleep
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, Union
 from zipfile import ZipFile
 
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
 from netdox import utils
+from netdox.uricache import UriCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
 logging.getLogger('urllib3').setLevel(logging.INFO)
 logging.getLogger('spnego').setLevel(logging.INFO)
 
+POOL_SIZE = 16
+"""Maximum number of connections kept open to each host."""
+RETRIES = 3
+"""Number of times to retry a request that failed to connect or returned a transient error."""
+RETRY_BACKOFF = 0.5
+"""Backoff factor for retries, in seconds."""
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+"""Status codes that are considered transient and retried."""
+CONCURRENCY = POOL_SIZE
+"""Default maximum number of requests an AsyncClient makes at once."""
+RATE_LIMIT = 50.0
+"""Default maximum number of requests an AsyncClient starts per second, for each host."""
+UPLOAD_RETRIES = 3
+"""Number of times to retry an upload that failed."""
+UPLOAD_BACKOFF = 2.0
+"""Seconds to wait before retrying a failed upload. Doubles after each retry."""
+SEARCH_WORKERS = 8
+"""Default maximum number of pages of search results to fetch at once."""
+URI_PAGE_SIZE = 1000
+"""Number of URIs to request in each page from the URI services."""
+URI_WORKERS = 8
+"""Default maximum number of pages of URIs to fetch at once."""
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+"""Size of the chunks to read downloads in."""
+DOWNLOAD_SPOOL_SIZE = 64 << 20
+"""Largest download that is kept in memory instead of a temporary file."""
+
+PATH_CACHE_TTL = 7 * 24 * 60 * 60
+"""Seconds to cache the URI of a path for."""
+URI_CACHE_TTL = 60 * 60
+"""Seconds to cache URI metadata for before revalidating it."""
+_CACHED_URI_FIELDS = ('id', 'docid', 'title', 'displaytitle', 'labels')
+
+TOKEN_LIFETIME = timedelta(hours=1)
+"""Time that a PageSeeder access token is valid for after it is issued."""
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+"""Time before a token expires that it is refreshed."""
+
+_session: Optional[requests.Session] = None
+_upload_session: Optional[requests.Session] = None
+_session_lock = Lock()
+_credentials: Optional[dict] = None
+_token: Optional[tuple[str, datetime]] = None
+"""The current token and the time it should be refreshed at."""
+_auth_lock = Lock()
+
+uri_cache = UriCache()
+"""Cache of URI metadata shared by the functions in this module."""
+
 #####################
 # Utility functions #
 #####################
@@ -39,87 +98,208 @@ def refreshToken(credentials: dict) -> str:
     :return: An access token for use with the PageSeeder API
     :rtype: str
     """
-    #TODO move this off disk
-    with open(utils.APPDIR+ 'src/pstoken.json', 'w') as stream:
-        url = f'https://{credentials["host"]}/ps/oauth/token'
-        refresh_header = {
-            'grant_type': 'client_credentials',
-            'client_id': credentials['id'].lower(),
-            'client_secret': credentials['secret']
-        }
+    url = f'{base_url(credentials)}/ps/oauth/token'
+    refresh_header = {
+        'grant_type': 'client_credentials',
+        'client_id': credentials['id'].lower(),
+        'client_secret': credentials['secret']
+    }
 
-        r = requests.post(url, params=refresh_header)
-        try:
-            token = json.loads(r.text)['access_token']
-        except KeyError:
-            raise ValueError(f'Unexpected response when requesting token: {r.text}')
-        else:
-            issued = datetime.isoformat(datetime.now())
+    r = get_session().post(url, params=refresh_header)
+    try:
+        token = json.loads(r.text)['access_token']
+    except KeyError:
+        raise ValueError(f'Unexpected response when requesting token: {r.text}')
+    else:
+        issued = datetime.isoformat(datetime.now())
+        with open(utils.APPDIR+ 'src/pstoken.json', 'w') as stream:
             stream.write(json.dumps({
                 'token': token,
                 'issued': str(issued)
             }, indent=2))
-            return token
+        return token
+
+def _stored_token() -> Optional[tuple[str, datetime]]:
+    """
+    Returns the token stored on disk and the time it was issued, if there is one.
+    """
+    try:
+        with open(utils.APPDIR+ 'src/pstoken.json', 'r') as stream:
+            details = json.load(stream)
+            return details['token'], datetime.fromisoformat(details['issued'])
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+        return None
 
 def token(credentials: dict) -> str:
     """
     Returns an access token for the PageSeeder configured in *credentials*.
-    If existing token has expired or does not exist, refreshToken is called.
+    The token is kept in memory, and refreshToken is called
+    shortly before it expires or if there is no valid token on disk.
 
     :param credentials: A dictionary like that found in the pageseeder section of ``config.json``
     :type credentials: dict
     :return: An access token for use with the PageSeeder API
     :rtype: str
     """
-    try:
-        with open(utils.APPDIR+ 'src/pstoken.json', 'r') as stream:
-            details = json.load(stream)
-            token = details['token']
-            issued = details['issued']
+    global _token
+    cached = _token
+    if cached is not None and cached[1] > datetime.now():
+        return cached[0]
 
-            if datetime.fromisoformat(issued) <= (datetime.now() - timedelta(hours=1)):
-                token = refreshToken(credentials)
-    except FileNotFoundError:
-        token = refreshToken(credentials)
-    except json.JSONDecodeError:
-        token = refreshToken(credentials)
-    return token
+    with _auth_lock:
+        if _token is None or _token[1] <= datetime.now():
+            stored = None if _token else _stored_token()
+            if stored is None or stored[1] + TOKEN_LIFETIME - TOKEN_REFRESH_MARGIN <= datetime.now():
+                stored = refreshToken(credentials), datetime.now()
+            _token = stored[0], stored[1] + TOKEN_LIFETIME - TOKEN_REFRESH_MARGIN
+        return _token[0]
+
+def credentials() -> dict:
+    """
+    Returns the pageseeder section of the config, which is cached in memory after the first call.
+
+    :return: A dictionary like that found in the pageseeder section of ``config.json``
+    :rtype: dict
+    """
+    global _credentials
+    if _credentials is None:
+        with _auth_lock:
+            if _credentials is None:
+                _credentials = utils.config()['pageseeder']
+    return _credentials
+
+def base_url(creds: dict = None) -> str:
+    """
+    Returns the URL of the PageSeeder server.
+    The scheme defaults to https, but can be set with the *scheme* key in the pageseeder config,
+    e.g. to use a local test server.
+
+    :param creds: A dictionary like that found in the pageseeder section of ``config.json``,
+    defaults to the cached credentials.
+    :type creds: dict, optional
+    :return: The URL, like ``https://host``
+    :rtype: str
+    """
+    creds = creds or credentials()
+    return f'{creds.get("scheme", "https")}://{creds["host"]}'
+
+def clear_auth() -> None:
+    """
+    Clears the credentials and token cached in memory, and the URI cache,
+    e.g. after the config has changed.
+    """
+    global _credentials, _token
+    with _auth_lock:
+        _credentials = None
+        _token = None
+    uri_cache.invalidate()
+
+def _new_session(retry: Retry) -> requests.Session:
+    """
+    Returns a new session with a pool of *POOL_SIZE* connections to each host,
+    which retries requests as configured by *retry*.
+    """
+    adapter = HTTPAdapter(
+        pool_connections = POOL_SIZE,
+        pool_maxsize = POOL_SIZE,
+        max_retries = retry
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session() -> requests.Session:
+    """
+    Returns the session shared by all PageSeeder requests, creating it if necessary.
+    The session keeps connections alive between requests and retries
+    requests that fail to connect or return a transient error status.
+    Only idempotent methods are retried after the server has received them.
+
+    :return: A thread-safe, pooled session.
+    :rtype: requests.Session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session(Retry(
+                    total = RETRIES,
+                    backoff_factor = RETRY_BACKOFF,
+                    status_forcelist = RETRY_STATUSES,
+                    respect_retry_after_header = True,
+                    raise_on_status = False
+                ))
+    return _session
+
+def get_upload_session() -> requests.Session:
+    """
+    Returns the session used for uploads, creating it if necessary.
+    It never retries, as loading_zone_upload retries the whole upload itself.
+
+    :return: A thread-safe, pooled session.
+    :rtype: requests.Session
+    """
+    global _upload_session
+    if _upload_session is None:
+        with _session_lock:
+            if _upload_session is None:
+                _upload_session = _new_session(Retry(total = 0, raise_on_status = False))
+    return _upload_session
+
+_API_FUNCTIONS: set[str] = set()
+"""Names of the functions in this module decorated with auth."""
 
 def auth(func):
     """
-    A decorator that wraps a PageSeeder API function and provides default values for the kwargs 'host', 'member', 'group', and 'header'.
+    A decorator that wraps a PageSeeder API function and provides default values for the kwargs 'host', 'member', 'group', 'header', and 'session'.
+    The kwargs to provide are found once, when the function is decorated.
 
     :param func: A function to wrap
     :type func: function
     :return: A wrapped function
     :rtype: function
     """
+    injected = tuple(kw for kw in signature(func).parameters if kw in _AUTH_DEFAULTS)
+    handled = utils.handle(func)
+    # TODO remove handle functionality
+
     @wraps(func)
     def wrapper(*args, **kwargs):
+        missing = [kw for kw in injected if kw not in kwargs]
+        if missing:
+            creds = credentials()
+            for kw in missing:
+                kwargs[kw] = _AUTH_DEFAULTS[kw](creds)
+        return handled(*args, **kwargs)
+
+    _API_FUNCTIONS.add(func.__name__)
+    return wrapper
 
-        credentials = utils.config()['pageseeder']
-        
-        defaults = {
-            'host': f'https://{credentials["host"]}/ps/service',
-            'member': credentials['username'],
-            'group': credentials['group'],
-            'header': {
-                    'authorization': f'Bearer {token(credentials)}',
-                    'Accept': 'application/json'
-                }
-        }
-
-        for kw in signature(func).parameters:
-            if kw not in kwargs and kw in defaults:
-                kwargs[kw] = defaults[kw]
-        return utils.handle(func)(*args, **kwargs)
-        # TODO remove handle functionality
+_AUTH_DEFAULTS = {
+    'host': lambda creds: f'{base_url(creds)}/ps/service',
+    'member': lambda creds: creds['username'],
+    'group': lambda creds: creds['group'],
+    'header': lambda creds: {
+        'authorization': f'Bearer {token(creds)}',
+        'Accept': 'application/json'
+    },
+    'session': lambda creds: get_session()
+}
+"""Functions returning the default value of each kwarg provided by ``@auth``, from the credentials."""
 
-    return wrapper
+def _cache_key(kind: str, *parts) -> str:
+    """
+    Returns a key for the URI cache, including the host and group in the credentials
+    so that metadata from one group is never used for another.
+    """
+    creds = credentials()
+    return ':'.join((kind, f'{creds["host"]}/{creds["group"]}', *map(str, parts)))
 
 def uri_from_path(path: str) -> int:
     """
     Returns the URI of a PageSeeder folder, from it's filepath.
+    URIs are cached for *PATH_CACHE_TTL* seconds.
 
     :param path: Path to folder, relative to group root directory.
     :type path: str
@@ -127,6 +307,11 @@ def uri_from_path(path: str) -> int:
     :rtype: int
     """
     path = path.strip('/')
+    key = _cache_key('path', path)
+    entry = uri_cache.get(key)
+    if entry is not None and entry.fresh:
+        return entry.value
+
     if '/' in path:
         pathlist = path.split('/')
         filename = pathlist[-1]
@@ -135,7 +320,7 @@ def uri_from_path(path: str) -> int:
         filename = path
         folder = ''
 
-    group = utils.config()["pageseeder"]["group"]
+    group = credentials()["group"]
     dirCheck = json.loads(search({
         'filters': f'pstype:folder,psfilename:{filename},' +
                     f'psfolder:/ps/{group.replace("-","/")}{folder}'
@@ -143,11 +328,197 @@ def uri_from_path(path: str) -> int:
     if dirCheck['results']['totalResults'] > 0:
         for field in dirCheck['results']['result'][0]['fields']:
             if field['name'] == 'psid':
-                return int(field['value'])
+                uri = int(field['value'])
+                uri_cache.put(key, uri, PATH_CACHE_TTL)
+                return uri
 
     raise FileNotFoundError(f"Failed to find object at path: '{path}'")
 
-@lru_cache(maxsize = None)
+def _changed_since(timestamp: float) -> bool:
+    """
+    Returns False if PageSeeder reports no changes to URIs in the group since *timestamp*.
+    Returns True if there were changes, or if the history could not be read.
+    """
+    try:
+        history = json.loads(get_uris_history({
+            'since': datetime.fromtimestamp(timestamp).date().isoformat(),
+            'pagesize': 1
+        }))
+        return history['uris'] != []
+    except Exception:
+        return True
+
+def cached_uris(uri: int, type: str, relationship: str) -> list[dict]:
+    """
+    Returns the metadata of the URIs with some relationship to a given URI, like get_uris.
+    Results are cached for *URI_CACHE_TTL* seconds, and then revalidated
+    against the URI history for the group.
+    Only the id, docid, title, displaytitle, and labels of each URI are kept.
+
+    :param uri: The URI to find related URIs of.
+    :type uri: int
+    :param type: Type of URIs to return, e.g. 'folder' or 'document'.
+    :type type: str
+    :param relationship: Relationship to *uri* of URIs to return. One of: 
+    'children', 'descendants', 'ancestors', 'ancestors-siblings', 'siblings'.
+    :type relationship: str
+    :return: A list of dictionaries of URI metadata.
+    :rtype: list[dict]
+    """
+    key = _cache_key('uris', uri, type, relationship)
+    entry = uri_cache.get(key)
+    if entry is not None:
+        if entry.fresh:
+            return entry.value
+        if not _changed_since(entry.fetched):
+            uri_cache.revalidate(key, URI_CACHE_TTL)
+            return entry.value
+
+    uris = [
+        {field: details[field] for field in _CACHED_URI_FIELDS if field in details}
+        for details in iter_uris(uri, params={
+            'type': type,
+            'relationship': relationship
+        })
+    ]
+    uri_cache.put(key, uris, URI_CACHE_TTL)
+    return uris
+
+def _intern(labels: Iterable[str], table: dict[frozenset, frozenset]) -> frozenset[str]:
+    """
+    Returns the frozenset of *labels* in *table*, adding it if it is not there yet.
+    """
+    labels = frozenset(labels)
+    return table.setdefault(labels, labels)
+
+def _encode_labels(labels: dict[str, frozenset[str]]) -> dict:
+    """
+    Encodes labels by docid for the URI cache, storing each distinct set of labels once.
+    """
+    indices: dict[frozenset, int] = {}
+    docids = {docid: indices.setdefault(labelset, len(indices)) for docid, labelset in labels.items()}
+    return {'labelsets': [sorted(labelset) for labelset in indices], 'docids': docids}
+
+def _decode_labels(value: dict, table: dict[frozenset, frozenset]) -> dict[str, frozenset[str]]:
+    """
+    Decodes labels by docid from the URI cache, interning each set of labels in *table*.
+    """
+    labelsets = [_intern(labelset, table) for labelset in value['labelsets']]
+    return {docid: labelsets[index] for docid, index in value['docids'].items()}
+
+def _removed(details: dict) -> bool:
+    """
+    Returns True if a URI from the URI history has been archived or deleted.
+    """
+    return bool(details.get('archived') or details.get('deleted'))
+
+def uri_labels(path: str) -> dict[str, frozenset[str]]:
+    """
+    Returns the labels of the documents in a folder and its subfolders, by docid.
+    Documents with the same labels share one frozenset.
+
+    The URIs are fetched in pages, concurrently, and the labels are cached for *URI_CACHE_TTL* seconds.
+    After that, the cached labels are updated from the URI history of the group
+    since they were last fetched, and are only fetched in full again if the history cannot be read.
+    Documents in the history that were archived, deleted, or are outside the folder are dropped.
+    The labels are not invalidated by uploads, as the history includes the uploaded changes.
+    If fetching the labels fails, any cached labels are used even if they are stale.
+
+    :param path: Path to the folder, relative to the group root directory.
+    :type path: str
+    :raises ValueError: If PageSeeder returns a bad response, and no labels are cached.
+    :return: A dict mapping docids to the labels on the document.
+    :rtype: dict[str, frozenset[str]]
+    """
+    path = path.strip('/')
+    folder = f'/ps/{credentials()["group"].replace("-","/")}/{path}/'
+    key = _cache_key('labels', path)
+    table: dict[frozenset, frozenset] = {}
+    cached = None
+    entry = uri_cache.get(key)
+    if entry is not None:
+        try:
+            cached = _decode_labels(entry.value, table)
+        except (KeyError, IndexError, TypeError):
+            logger.warning('Ignoring malformed URI labels in the cache.')
+
+    if cached is not None:
+        if entry.fresh:
+            return cached
+        try:
+            changed = list(iter_uris_history({
+                'since': datetime.fromtimestamp(entry.fetched).date().isoformat()
+            }))
+        except Exception as exc:
+            logger.warning(f'Failed to read URI history; fetching all URI labels again: {exc}')
+        else:
+            for details in changed:
+                if 'docid' not in details:
+                    continue
+                if _removed(details) or not details.get('path', '').startswith(folder):
+                    cached.pop(details['docid'], None)
+                else:
+                    cached[details['docid']] = _intern(details.get('labels', ()), table)
+            uri_cache.put(key, _encode_labels(cached), URI_CACHE_TTL)
+            return cached
+
+    try:
+        labels = {
+            details['docid']: _intern(details.get('labels', ()), table)
+            for details in iter_uris(uri_from_path(path), params={
+                'type': 'file',
+                'relationship': 'descendants'
+            })
+            if 'docid' in details
+        }
+    except Exception:
+        if cached is None:
+            raise
+        logger.exception('Failed to fetch URI labels; using the stale labels in the cache.')
+        return cached
+    uri_cache.put(key, _encode_labels(labels), URI_CACHE_TTL)
+    return labels
+
+def invalidate_uris() -> None:
+    """
+    Removes cached URI metadata, after documents have been changed on PageSeeder.
+    Cached labels are kept, as they are updated from the URI history.
+    """
+    uri_cache.invalidate('uris:')
+
+def _iter_uri_pages(fetch: Callable[[dict], str], params: dict, workers: int) -> Iterator[dict]:
+    """
+    Yields each URI returned by a paged URI service as soon as its page arrives.
+    If no page is specified in *params*, the number of pages is read from the total in the first page,
+    and the rest are fetched concurrently by up to *workers* threads.
+
+    :param fetch: A function that takes the params of a request and returns the response text.
+    :type fetch: Callable[[dict], str]
+    :raises ValueError: If a page could not be parsed.
+    """
+    def parse(text: str) -> tuple[list[dict], int]:
+        try:
+            resp = json.loads(text)
+            return resp['uris'], int(resp['totalUris'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Bad response from URI service; failed to parse URIs.')
+
+    params = {'pagesize': URI_PAGE_SIZE} | params
+    uris, total = parse(fetch(params))
+    yield from uris
+    if 'page' in params:
+        return
+    pages = range(2, -(-total // int(params['pagesize'])) + 1)
+    if not pages:
+        return
+
+    pool = ThreadPoolExecutor(min(workers, len(pages)))
+    try:
+        for page in pool.map(lambda page: fetch(params | {'page': page}), pages):
+            yield from parse(page)[0]
+    finally:
+        pool.shutdown(wait = False, cancel_futures = True)
+
 def urimap(
         path: str = 'website', 
         type: str = 'folder', 
@@ -167,16 +538,151 @@ def urimap(
     :return: A dictionary mapping filenames to URIs.
     :rtype: dict[str, int]
     """
-    uris = get_uris(uri_from_path(path), params={
-        'type': type,
-        'relationship': relationship
-    })
     return {
         uri['displaytitle']: uri['id'] for uri in 
-        json.loads(uris)['uris']
+        cached_uris(uri_from_path(path), type, relationship)
     }
 
 
+######################
+# Background threads #
+######################
+
+THREAD_ACTIVE_STATUSES = frozenset(('initialised', 'inprogress'))
+"""Statuses of a PageSeeder thread that has not finished yet."""
+
+@dataclass(frozen = True)
+class ThreadStatus:
+    """The status of a PageSeeder background thread, e.g. an export or unzip."""
+    id: str
+    """ID of the thread."""
+    status: str
+    """Status of the thread, e.g. 'inprogress' or 'completed'."""
+    message: Optional[str] = None
+    """Latest message from the thread."""
+    zip: Optional[str] = None
+    """Name of the ZIP file produced by an export thread."""
+    attrs: dict[str, str] = field(default_factory = dict, compare = False)
+    """All attributes of the thread element."""
+
+    @property
+    def active(self) -> bool:
+        """Whether the thread has not finished yet."""
+        return self.status in THREAD_ACTIVE_STATUSES
+
+    @classmethod
+    def from_xml(cls, xml: Optional[str]) -> Optional[ThreadStatus]:
+        """
+        Parses the status of a thread from a PageSeeder response.
+
+        :param xml: The XML response containing a thread element.
+        :type xml: Optional[str]
+        :return: The thread status, or None if the response contains no thread.
+        :rtype: Optional[ThreadStatus]
+        """
+        if not xml:
+            return None
+        try:
+            root = etree.fromstring(xml.encode('utf-8') if isinstance(xml, str) else xml)
+        except etree.XMLSyntaxError:
+            return None
+        thread = root if root.tag == 'thread' else root.find('.//thread')
+        if thread is None or 'id' not in thread.attrib or 'status' not in thread.attrib:
+            return None
+        return cls(
+            id = thread.get('id'),
+            status = thread.get('status'),
+            message = thread.findtext('message'),
+            zip = thread.findtext('zip'),
+            attrs = dict(thread.attrib)
+        )
+
+class ThreadWaiter:
+    """
+    Waits for a PageSeeder background thread to finish.
+    Polls quickly at first, and then less often the longer the thread runs.
+    """
+    initial: float
+    """Seconds to wait before the first poll."""
+    maximum: float
+    """Maximum seconds to wait between polls."""
+    factor: float
+    """Factor to increase the wait between polls by after each poll."""
+    timeout: Optional[float]
+    """Seconds to wait for the thread in total. No limit if None."""
+    callback: Optional[Callable[[ThreadStatus], None]]
+    """Called with the status of the thread after each poll."""
+    polls: int
+    """Number of polls made in the most recent wait."""
+
+    def __init__(self,
+        initial: float = 0.25,
+        maximum: float = 5.0,
+        factor: float = 1.5,
+        timeout: Optional[float] = None,
+        callback: Optional[Callable[[ThreadStatus], None]] = None,
+        poll: Callable[[str], Optional[str]] = None
+    ) -> None:
+        """
+        Constructor.
+
+        :param initial: Seconds to wait before the first poll, defaults to 0.25
+        :type initial: float, optional
+        :param maximum: Maximum seconds to wait between polls, defaults to 5.0
+        :type maximum: float, optional
+        :param factor: Factor to increase the wait between polls by, defaults to 1.5
+        :type factor: float, optional
+        :param timeout: Seconds to wait for the thread in total, defaults to None (no limit).
+        :type timeout: float, optional
+        :param callback: Called with the status of the thread after each poll, defaults to None
+        :type callback: Callable[[ThreadStatus], None], optional
+        :param poll: Returns the progress of a thread from its ID, defaults to get_thread_progress.
+        :type poll: Callable[[str], Optional[str]], optional
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.timeout = timeout
+        self.callback = callback
+        self.polls = 0
+        self._poll = poll if poll is not None else get_thread_progress
+
+    def wait(self, thread: Union[str, ThreadStatus, None]) -> Optional[ThreadStatus]:
+        """
+        Waits for a thread to finish.
+
+        :param thread: The thread to wait for, or the response that started it.
+        :type thread: Union[str, ThreadStatus, None]
+        :raises TimeoutError: If the thread has not finished before the timeout.
+        :return: The final status of the thread,
+        or None if PageSeeder stopped returning its status.
+        :rtype: Optional[ThreadStatus]
+        """
+        status = thread if isinstance(thread, ThreadStatus) else ThreadStatus.from_xml(thread)
+        deadline = None if self.timeout is None else monotonic() + self.timeout
+        delay = self.initial
+        self.polls = 0
+        while status is not None and status.active:
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f'PageSeeder thread {status.id} did not finish in time. '
+                        + f'Last status: "{status.status}"')
+                delay = min(delay, remaining)
+            sleep(delay)
+            delay = min(delay * self.factor, self.maximum)
+
+            self.polls += 1
+            status = ThreadStatus.from_xml(self._poll(status.id))
+            if status is not None and self.callback:
+                self.callback(status)
+        return status
+
+def _log_thread(thread: ThreadStatus) -> None:
+    """Logs the progress of a PageSeeder thread."""
+    logger.debug(f'PageSeeder thread {thread.id} is {thread.status}'
+        + (f': {thread.message}' if thread.message else ''))
+
 ##############
 # Sentencing #
 ##############
@@ -226,6 +732,30 @@ def sentence_uris(uris: list[str], assignee: str) -> None:
         'action.status': 'Initiated'
     })
 
+def archive_docids(docids: Iterable[str], batch_size: int = 100) -> list[str]:
+    """
+    Archives the documents with the given docids, with one batch action per *batch_size* documents.
+
+    :param docids: The docids of the documents to archive.
+    :type docids: Iterable[str]
+    :param batch_size: Maximum number of documents to archive per request, defaults to 100
+    :type batch_size: int, optional
+    :return: The docids in batches that failed to be archived.
+    :rtype: list[str]
+    """
+    docids = list(docids)
+    logger.debug(f'Archiving {len(docids)} documents.')
+    failed = []
+    for i in range(0, len(docids), batch_size):
+        batch = docids[i:i + batch_size]
+        if batch_document_action('archive', {
+            'filters': ','.join(f'psdocid:{docid}' for docid in batch)
+        }) is None:
+            failed.extend(batch)
+    if failed:
+        logger.error(f'Failed to archive {len(failed)} documents.')
+    return failed
+
 def clear_sentence(uri: str) -> None: # TODO remove this function
     """
     DEPRECATED
@@ -298,6 +828,7 @@ def sentenceStale(dir: str) -> dict[date, list[str]]:
 
         sentence = []
         clear = []
+        archived = []
         for file in remote:
             uri = file["psid"]
             status = statusFromFile(file)
@@ -312,7 +843,7 @@ def sentenceStale(dir: str) -> dict[date, list[str]]:
             elif commonpath not in local:
                 # File is stale and has been approved for archival
                 if status == 'Approved':
-                    archive(uri)
+                    archived.append(uri)
                     title = file['title'] if 'title' in file else f'(URI={file["id"]})'
                     logger.info(f"Archiving document '{title}' as it has been approved.")
 
@@ -321,6 +852,8 @@ def sentenceStale(dir: str) -> dict[date, list[str]]:
                     logger.debug(f'Sentencing new file: {file["psfilename"]}')
                     sentence.append(uri)
                     
+        if len(archived) > 0:
+            gather(archive, archived)
         if len(clear) > 0:
             clear_sentences(clear)
         if len(sentence) > 0:
@@ -351,42 +884,185 @@ def findStale(dirs: Iterable[str]) -> dict[date, set[str]]:
 ##########################
 
 @auth
-def get_default_docid(docid, params={}, header={}):
+def get_default_docid(docid, params={}, header={}, session=None):
     """
     Returns the content of a document, from it's docid.
     """
-    url = f'https://{utils.config()["pageseeder"]["host"]}/ps/docid/{docid}'
-    return requests.get(url, headers=header, params=params)
+    url = f'{base_url()}/ps/docid/{docid}'
+    return session.get(url, headers=header, params=params)
 
 @auth
-def get_default_uriid(uriid, params={}, header={}):
+def get_default_uriid(uriid, params={}, header={}, session=None):
     """
     Returns the content of a document, from it's uriid.
     """
-    url = f'https://{utils.config()["pageseeder"]["host"]}/ps/uri/{uriid}'
-    return requests.get(url, headers=header, params=params)
+    url = f'{base_url()}/ps/uri/{uriid}'
+    return session.get(url, headers=header, params=params)
+
+class UploadReader:
+    """
+    Wraps a file being uploaded, so that it is sent in chunks as it is read
+    and its progress is reported.
+    """
+    total: int
+    """Size of the file in bytes."""
+    sent: int
+    """Number of bytes read so far."""
+    interval: float
+    """Minimum seconds between progress reports."""
+
+    def __init__(self, 
+            stream: IO[bytes], 
+            callback: Optional[Callable[[int, int, float], None]] = None,
+            interval: float = 5.0
+        ) -> None:
+        """
+        Constructor.
+
+        :param stream: The file to upload, opened in binary mode.
+        :type stream: IO[bytes]
+        :param callback: Called with the bytes sent, the total bytes, and the seconds elapsed
+        as the file is read. Defaults to logging the progress.
+        :type callback: Callable[[int, int, float], None], optional
+        :param interval: Minimum seconds between calls to *callback*, defaults to 5.0
+        :type interval: float, optional
+        """
+        self._stream = stream
+        self._start = stream.tell()
+        self.total = os.fstat(stream.fileno()).st_size - self._start
+        self.sent = 0
+        self.interval = interval
+        self.callback = callback or _log_upload
+        self._started = monotonic()
+        self._reported = self._started
+
+    def __len__(self) -> int:
+        return self.total
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.sent += len(data)
+        now = monotonic()
+        if data and (now - self._reported >= self.interval or self.sent == self.total):
+            self._reported = now
+            self.callback(self.sent, self.total, now - self._started)
+        return data
+
+    def tell(self) -> int:
+        return self.sent
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.sent
+        elif whence == os.SEEK_END:
+            offset += self.total
+        self._stream.seek(self._start + offset)
+        self.sent = offset
+        return offset
+
+def _log_upload(sent: int, total: int, seconds: float) -> None:
+    """Logs the progress and throughput of an upload."""
+    rate = (sent / seconds) if seconds else 0
+    logger.info(f'Uploaded {sent / (1 << 20):.1f} of {total / (1 << 20):.1f} MiB '
+        + f'({rate / (1 << 20):.2f} MiB/s)')
 
 @auth
-def loading_zone_upload(path, params={}, host='', group='', header={}):
-    with open(path, 'rb') as stream:
-        payload = stream.read()
+def loading_zone_upload(
+        path, params={}, host='', group='', header={},
+        progress: Optional[Callable[[int, int, float], None]] = None,
+        retries: int = UPLOAD_RETRIES
+    ):
+    """
+    Uploads a file to the loading zone, streaming it from disk.
+    If the upload fails to connect, is interrupted, or returns a server error,
+    the whole file is sent again after a backoff, up to *retries* times.
+    The upload session does not retry, so the file is sent at most *retries* + 1 times.
 
+    :param path: Path to the file to upload.
+    :type path: str
+    :param progress: Called with the bytes sent, the total bytes, and the seconds elapsed
+    during the upload. Defaults to logging the progress.
+    :type progress: Callable[[int, int, float], None], optional
+    :param retries: Number of times to retry the upload, defaults to UPLOAD_RETRIES
+    :type retries: int, optional
+    :return: The response text.
+    :rtype: str
+    """
     if 'group' not in params:
         params['group'] = group
     if 'filename' not in params and 'X-File-Name' not in header:
         params['filename'] = 'netdox-psml.zip'
 
-    url = f'https://{utils.config()["pageseeder"]["host"]}/ps/servlet/upload'
-    r = requests.put(url, headers=header, params=params, data=payload)
-    return r.text
+    url = f'{base_url()}/ps/servlet/upload'
+    session = get_upload_session()
+    error = 'no attempts were made'
+    with open(path, 'rb') as stream:
+        for attempt in range(retries + 1):
+            stream.seek(0)
+            try:
+                r = session.put(url, headers=header, params=params, 
+                    data=UploadReader(stream, progress))
+                if r.status_code < 500:
+                    return r.text
+                error = f'status {r.status_code}'
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                error = str(exc)
+
+            if attempt < retries:
+                delay = UPLOAD_BACKOFF * (2 ** attempt)
+                logger.warning(f'Upload of "{path}" failed ({error}). Retrying in {delay}s...')
+                sleep(delay)
+    raise RuntimeError(f'Upload of "{path}" failed after {max(retries + 1, 0)} attempts: {error}')
 
 @auth
-def member_resource(file: str, host='', group='', header='') -> requests.Response:
+def member_resource(file: str, host='', group='', header='', session=None) -> requests.Response:
     """
     Returns a streamed response object containing a ZIP file found on PageSeeder.
     """
-    url = f'https://{utils.config()["pageseeder"]["host"]}/ps/member-resource/{group}/{file}'
-    return requests.get(url, headers=header, stream=True)
+    url = f'{base_url()}/ps/member-resource/{group}/{file}'
+    return session.get(url, headers=header, stream=True)
+
+def download_export(path: str, timeout: int = 60000) -> IO[bytes]:
+    """
+    Exports a directory from PageSeeder and downloads the ZIP file.
+    The ZIP is kept in memory unless it is larger than *DOWNLOAD_SPOOL_SIZE*.
+    Times out after *timeout* milliseconds.
+
+    :param path: Path on PageSeeder to download, relative to the group root.
+    :type path: str
+    :param timeout: Number of milliseconds to timeout after, defaults to 60000
+    :type timeout: int, optional
+    :raises TimeoutError: If the export does not finish before the timeout.
+    :return: A file object containing the ZIP, positioned at the start.
+    :rtype: IO[bytes]
+    """
+    waiter = ThreadWaiter(timeout = timeout / 1000, callback = _log_thread)
+    thread = waiter.wait(export({
+        'path': f'/{credentials()["group"].replace("-","/")}/{path}'
+    }, directory = True))
+    if thread is None:
+        raise AttributeError('Download thread never had status "completed" (thread is None).')
+    logger.debug(f'Export of "{path}" finished after {waiter.polls} polls.')
+
+    if thread.status == 'failed':
+        raise RuntimeError(f'Failed to export directory at "{path}" from PageSeeder.'
+            + f' Message: "{thread.message or "[ERROR MSG NOT FOUND]"}"')
+
+    elif thread.status != 'completed':
+        logger.warning('Unknown thread final thread status while downloading '
+            + f'directory at "{path}" from PageSeeder: "{thread.status}"')
+
+    stream = SpooledTemporaryFile(DOWNLOAD_SPOOL_SIZE)
+    try:
+        with member_resource(thread.zip) as zip:
+            zip.raise_for_status()
+            for chunk in zip.iter_content(DOWNLOAD_CHUNK_SIZE):
+                stream.write(chunk)
+    except BaseException:
+        stream.close()
+        raise
+    stream.seek(0)
+    return stream
 
 @auth
 def download_dir(path: str, outpath: str, timeout: int = 60000) -> str:
@@ -398,56 +1074,17 @@ def download_dir(path: str, outpath: str, timeout: int = 60000) -> str:
     :type path: str
     :param outpath: Where to unzip the downloaded directory on the local machine.
     :type outpath: str
-    :param timeout: Number of milliseconds to timeout after, defaults to 5000
+    :param timeout: Number of milliseconds to timeout after, defaults to 60000
     :type timeout: int, optional
+    :raises TimeoutError: If the export does not finish before the timeout.
     :return: The path to the downloaded directory
     :rtype: str
     """
-    _thread = export({
-        'path': f'/{utils.config()["pageseeder"]["group"].replace("-","/")}/{path}'
-    }, directory = True)
-    thread = BeautifulSoup(_thread, 'xml').thread
-    last_thread = thread
-    try:
-        while thread['status'] in ('initialised', 'inprogress'):
-            sleep(0.5)
-            last_thread = thread
-            thread = BeautifulSoup(get_thread_progress(thread['id']), 'xml').thread
-    except KeyError as err:
-        print(err)
-        raise AttributeError('Download thread never had status "completed".\n' + str(thread))
-    except TypeError:
-        assert thread is None, 'Strange fail state: TypeError when accessing thread like dict.'
-        raise AttributeError('Download thread never had status "completed" (thread is None).\n'
-            + str(last_thread))
-    
-    if thread['status'] == 'failed':
-        try:
-            message = thread.message.string
-        except Exception:
-            message = '[ERROR MSG NOT FOUND]'
-        finally:
-            raise RuntimeError(f'Failed to export directory at "{path}" from PageSeeder.'
-                + f' Message: "{message}"')
-
-    elif thread['status'] != 'completed':
-        logger.warning('Unknown thread final thread status while downloading '
-            + f'directory at "{path}" from PageSeeder: "{thread["status"]}"')
-
     if os.path.exists(outpath) and not os.path.isdir(outpath):
         raise FileExistsError('File object exists at output path, is not a directory.')
-    elif not os.path.exists(outpath):
-        os.mkdir(outpath)
-
-    zip_path = outpath + '.zip'
-    with member_resource(thread.zip.text) as zip:
-        zip.raise_for_status()
-        with open(zip_path, 'wb') as stream:
-            for chunk in zip.iter_content(8192):
-                stream.write(chunk)
 
-    ZipFile(zip_path).extractall(outpath)
-    os.remove(zip_path)
+    with download_export(path, timeout) as stream, ZipFile(stream) as zip:
+        zip.extractall(outpath)
                 
     return outpath
 
@@ -460,17 +1097,17 @@ def get_version(host, **kwargs):
     Returns the version of a PageSeeder server.
     """
     soup = BeautifulSoup(
-        requests.get(f'https://{host}/ps/service/version', **kwargs).text, 'xml')
+        get_session().get(f'https://{host}/ps/service/version', **kwargs).text, 'xml')
     return soup.find('version')['string']
 
 @auth
-def get_self(host = '', header={}):
+def get_self(host = '', header={}, session=None):
     """Returns details of the currently authenticated member."""
-    r = requests.get(host+'/self', headers=header)
+    r = session.get(host+'/self', headers=header)
     return r.text
 
 @auth
-def get_uri(locator, params={}, forurl=False, host='', group='', header={}):
+def get_uri(locator, params={}, forurl=False, host='', group='', header={}, session=None):
     """
     Returns some info on a uri
     """
@@ -480,11 +1117,11 @@ def get_uri(locator, params={}, forurl=False, host='', group='', header={}):
     else:
         service = f'/groups/~{group}/uris/{locator}'
 
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 @auth
-def get_uris(uri, params={}, host='', group='', header={}):
+def get_uris(uri, params={}, host='', group='', header={}, session=None):
     """
     Returns all uris with some relationship to a given uri
     """
@@ -492,9 +1129,21 @@ def get_uris(uri, params={}, host='', group='', header={}):
         params['pagesize'] = 9999
 
     service = f'/groups/~{group}/uris/{uri}/uris'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
+@auth
+def iter_uris(
+        uri, params={}, host='', group='', header={}, session=None, workers: int = URI_WORKERS
+    ) -> Iterator[dict]:
+    """
+    Like get_uris but fetches the URIs in pages of *URI_PAGE_SIZE*,
+    and yields the metadata of each URI as soon as its page arrives.
+    The pages after the first are fetched concurrently by up to *workers* threads.
+    """
+    kwargs = {'host': host, 'group': group, 'header': header, 'session': session}
+    return _iter_uri_pages(lambda params: get_uris(uri, params, **kwargs), params, workers)
+
 
 @auth
 def get_files(uri, params={}, group=''):
@@ -511,64 +1160,66 @@ def get_files(uri, params={}, group=''):
     return files
 
 @auth
-def get_fragment(uri, fragment_id, params={}, host='', group='', member='', header={}):
+def get_fragment(uri, fragment_id, params={}, host='', group='', member='', header={}, session=None):
     """
     Returns content of a fragment in some given uri
     """
     service = f'/members/~{member}/groups/~{group}/uris/{uri}/fragments/{fragment_id}'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def export(params={}, directory = False, host='', member='', header={}):
+def export(params={}, directory = False, host='', member='', header={}, session=None):
     """
     Begins export process for some URI and returns relevant thread ID
     """
     service = f'/members/~{member}/export' if directory else f'/members/~{member}/uris/{params["uri"]}/export'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def put_group_resource(location: str, content: str, overwrite: bool, host='', group='', header=''):
+def put_group_resource(location: str, content: str, overwrite: bool, host='', group='', header='', session=None):
     service = f'/groups/{"-".join(group.split("-")[:-1])}/resources'
     params = {'location': location, 'overwrite': str(overwrite).lower()}
-    return requests.put(host+service, data=content, headers=header, params=params)
+    return session.put(host+service, data=content, headers=header, params=params)
 
 
 @auth
-def get_thread_progress(id, host='', group='', header={}):
+def get_thread_progress(id, host='', group='', header={}, session=None):
     """
     Returns information about some PageSeeder process thread
     """
     service = f'/groups/{group}/threads/{id}/progress'
-    r = requests.get(host+service, headers=header)
+    r = session.get(host+service, headers=header)
     return r.text
 
 
 @auth
-def get_thread_logs(id, host='', group='', header={}):
+def get_thread_logs(id, host='', group='', header={}, session=None):
     """
     Returns information about some PageSeeder process thread
     """
     service = f'/groups/{group}/threads/{id}/logs'
-    r = requests.get(host+service, headers=header)
+    r = session.get(host+service, headers=header)
     return r.text
 
 
 @auth
-def archive(uri, params={}, host='', group='', member='', header={}):
+def archive(uri, params={}, host='', group='', member='', header={}, session=None):
     """
     Begins archive process for some URI
     """
     service = f'/members/~{member}/groups/~{group}/uris/{uri}/archive'
-    r = requests.post(host+service, headers=header, params=params)
+    r = session.post(host+service, headers=header, params=params)
+    invalidate_uris()
+    uri_cache.invalidate('path:')
     return r.text
 
 
 @auth
-def version(uri, params={}, host='', group='', member='', header={}):
+def version(uri, params={}, host='', group='', member='', header={}, session=None):
     """
     Adds a version to some URI. Default name is current date/time
     """
@@ -576,207 +1227,385 @@ def version(uri, params={}, host='', group='', member='', header={}):
         params['name'] = datetime.now().replace(microsecond=0)
         
     service = f'/members/~{member}/groups/~{group}/uris/{uri}/versions'
-    r = requests.post(host+service, headers=header, params=params)   # version all docs that are not archived => current
+    r = session.post(host+service, headers=header, params=params)   # version all docs that are not archived => current
     return r.text
 
 
 @auth
-def get_versions(uri, host='', group='', header={}):
+def get_versions(uri, host='', group='', header={}, session=None):
     """
     Lists the versions 
     """
     service = f'/groups/{group}/uris/{uri}/versions'
-    r = requests.get(host+service, headers=header)
+    r = session.get(host+service, headers=header)
     return r.text
 
 
 @auth
-def patch_uri(uri, params={}, host='', group='', member='', header={}):
+def patch_uri(uri, params={}, host='', group='', member='', header={}, session=None):
     """
     Sets the specified properties of a URI
     """
     service = f'/members/{member}/groups/{group}/uris/{uri}'
-    r = requests.patch(host+service, headers=header, params=params)
+    r = session.patch(host+service, headers=header, params=params)
+    invalidate_uris()
     return r.text
 
 @auth
-def get_group(host='', group='', header={}):
+def get_group(host='', group='', header={}, session=None):
     """
     Gets a group
     """
     service = f'/groups/{group}'
-    r = requests.get(host+service, headers=header)
+    r = session.get(host+service, headers=header)
     return r.text
 
 @auth
-def get_groupfolder(id, params={}, host='', group='', member='', header={}):
+def get_groupfolder(id, params={}, host='', group='', member='', header={}, session=None):
     """
     Gets some groupfolder
     """
     service = f'/members/{member}/groups/{group}/groupfolders/{id}'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 @auth
-def get_groupfolders(params={}, host='', group='', member='', header={}):
+def get_groupfolders(params={}, host='', group='', member='', header={}, session=None):
     """
     Gets the groupfolders for some group
     """
     service = f'/members/{member}/groups/{group}/groupfolders'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def get_comment(commentid, params={}, host='', member='', header={}):
+def get_comment(commentid, params={}, host='', member='', header={}, session=None):
     """
     Gets some comment
     """
     service = f'/members/{member}/comments/{commentid}'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def get_xrefs(uri, params={}, host='', group='', header={}):
+def get_xrefs(uri, params={}, host='', group='', header={}, session=None):
     """
     Gets the xrefs of some uri
     """
     service = f'/groups/{group}/uris/{uri}/xrefs'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def get_xref_tree(uri, params={}, host='', group='', header={}):
+def get_xref_tree(uri, params={}, host='', group='', header={}, session=None):
     """
     Gets the xref tree for some uri
     """
     service = f'/groups/{group}/uris/{uri}/xreftree'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def get_toc(uri, params={}, host='', group='', member='', header={}):
+def get_toc(uri, params={}, host='', group='', member='', header={}, session=None):
     """
     Output the partial TOC for a publication including a content document and its ancestors.
     If URI is not in a publication, output the TOC for the URI only with no publications.
     """
     service = f'/members/{member}/groups/{group}/uris/{uri}/toc'
-    r = requests.get(host+service, params=params, headers=header)
+    r = session.get(host+service, params=params, headers=header)
     return r.text
 
 
 @auth
-def search(params={}, host='', group='', header={}):
+def search(params={}, host='', group='', header={}, session=None):
     service = f'/groups/{group}/search'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
+def _parse_results(resp: dict) -> list[dict[str, str]]:
+    """
+    Parses each result in a page of search results into a map of its fields.
+    """
+    return [
+        {field['name']: field['value'] for field in result['fields']}
+        for result in resp['results']['result']
+    ]
+
 @auth
-def search_parsed(params={}, host='', group='', header={}) -> list[dict[str, str]]:
+def iter_search_parsed(
+        params={}, host='', group='', header={}, session=None, workers: int = SEARCH_WORKERS
+    ) -> Iterator[dict[str, str]]:
     """
-    Like search but parses each result into a map of its fields.
+    Like search_parsed but yields each result as soon as its page arrives.
+    If no page is specified in *params*, the number of pages is read from the first page,
+    and the rest are fetched concurrently by up to *workers* threads.
+    Results are yielded in the same order as search_parsed returns them.
     """
-    resp = json.loads(search(params=params, host=host, group=group, header=header))
+    kwargs = {'host': host, 'group': group, 'header': header, 'session': session}
     try:
-        results: list[dict] = resp['results']['result']
-        if 'page' not in params:
-            current_page = int(resp['results']['page'])
-            while int(resp['results']['totalPages']) > current_page:
-                current_page += 1
-                resp = json.loads(search(params | {'page': current_page}, host=host, group=group, header=header))
-                results.extend(resp['results']['result'])
-        parsed_results = []
-        for result in results:
-            parsed_result = {}
-            for field in result['fields']:
-                parsed_result[field['name']] = field['value']
-            parsed_results.append(parsed_result)
-
-        return parsed_results
-                
+        resp = json.loads(search(params=params, **kwargs))
+        yield from _parse_results(resp)
+        if 'page' in params:
+            return
+        pages = range(int(resp['results']['page']) + 1, int(resp['results']['totalPages']) + 1)
     except KeyError:
         raise ValueError('Bad response from search; failed to parse results.')
+    if not pages:
+        return
+
+    pool = ThreadPoolExecutor(min(workers, len(pages)))
+    try:
+        for page in pool.map(
+            lambda page: search(params | {'page': page}, **kwargs), pages
+        ):
+            try:
+                yield from _parse_results(json.loads(page))
+            except KeyError:
+                raise ValueError('Bad response from search; failed to parse results.')
+    finally:
+        pool.shutdown(wait = False, cancel_futures = True)
+
+@auth
+def search_parsed(params={}, host='', group='', header={}, session=None) -> list[dict[str, str]]:
+    """
+    Like search but parses each result into a map of its fields.
+    The pages of results after the first are fetched concurrently.
+    """
+    return list(iter_search_parsed(
+        params, host=host, group=group, header=header, session=session))
 
 
 @auth
-def resolve_group_refs(params={}, host='', group='', member='', header={}):
+def resolve_group_refs(params={}, host='', group='', member='', header={}, session=None):
     service = f'/members/{member}/groups/{group}/resolverefs'
-    r = requests.post(host+service, headers=header, params=params)
+    r = session.post(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def get_loading_zone(params={}, host='', group='', member='', header={}):
+def get_loading_zone(params={}, host='', group='', member='', header={}, session=None):
     service = f'/members/{member}/groups/{group}/loadingzone'
-    r = requests.get(host+service, headers=header, params=params)
+    r = session.get(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def unzip_loading_zone(path, params={}, host='', group='', member='', header={}):
+def unzip_loading_zone(path, params={}, host='', group='', member='', header={}, session=None):
     params['path'] = path
     service = f'/members/{member}/groups/{group}/loadingzone/unzip'
-    r = requests.post(host+service, headers=header, params=params)
+    r = session.post(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def load_loading_zone(params={}, host='', group='', member='', header={}):
+def load_loading_zone(params={}, host='', group='', member='', header={}, session=None):
     service = f'/members/{member}/groups/{group}/loadingzone/start'
-    r = requests.post(host+service, headers=header, params=params)
+    r = session.post(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def clear_loading_zone(params={}, host='', group='', member='', header={}):
+def clear_loading_zone(params={}, host='', group='', member='', header={}, session=None):
     service = f'/members/{member}/groups/{group}/loadingzone/clear'
-    r = requests.post(host+service, headers=header, params=params)
+    r = session.post(host+service, headers=header, params=params)
     return r.text
 
 
 @auth
-def zip_upload(path, uploadpath, host='', group='', header={}):
-    loading_zone_upload(path, params={'file':'netdox-psml.zip'}, host=host, group=group, header=header)
+def zip_upload(path, uploadpath, host='', group='', header={}, timeout: float = None) -> Optional[ThreadStatus]:
+    """
+    Uploads a ZIP file of documents to PageSeeder,
+    and waits for it to be unzipped and loaded into *uploadpath*.
+
+    :param path: Path to the ZIP file on the local machine.
+    :type path: str
+    :param uploadpath: Path to load the documents into on PageSeeder, relative to the group root.
+    :type uploadpath: str
+    :param timeout: Seconds to wait for each of the unzip and load threads, defaults to None (no limit).
+    :type timeout: float, optional
+    :raises TimeoutError: If a thread does not finish before the timeout.
+    :return: The final status of the load thread, or None if the upload failed.
+    :rtype: Optional[ThreadStatus]
+    """
+    if loading_zone_upload(path, params={'file':'netdox-psml.zip'}, host=host, group=group, header=header) is None:
+        logger.error('Failed to send file to the loading zone.')
+        return None
     logger.info('File sent successfully.')
-    thread = BeautifulSoup(unzip_loading_zone('netdox-psml.zip', params={'deleteoriginal':'true'}), features = 'xml').thread
-    while thread and thread['status'] != 'completed':
-        sleep(2)
-        try:
-            thread = BeautifulSoup(get_thread_progress(thread['id']), features = 'xml').thread
-        except TypeError:
+    waiter = ThreadWaiter(timeout = timeout, callback = _log_thread)
+    thread = ThreadStatus.from_xml(
+        unzip_loading_zone('netdox-psml.zip', params={'deleteoriginal':'true'}))
+    if thread is not None:
+        thread = waiter.wait(thread)
+        if thread is None or thread.status != 'completed':
             logger.error('Upload failed. Clearing loading zone...')
             clear_loading_zone()
-            return
+            return None
 
     logger.info('File unzipped. Loading files into PageSeeder.')
-    return load_loading_zone(params={
+    thread = waiter.wait(load_loading_zone(params={
         'folder': uploadpath,
         'overwrite': 'true',
         'overwrite-properties': 'true',
         'validate': 'false'
-        })
+        }))
+    invalidate_uris()
+    if thread is not None:
+        logger.info(f'Finished loading files into PageSeeder with status "{thread.status}".')
+    return thread
 
 
 @auth
-def get_uri_history(uri='', params={}, host='', group='', header={}):
+def get_uri_history(uri='', params={}, host='', group='', header={}, session=None):
     service = f'/groups/{group}/uris/{uri}/history'
-    r = requests.get(host+service, params=params, headers=header)
+    r = session.get(host+service, params=params, headers=header)
     return r.text
 
 @auth
-def get_uris_history(params={}, host='', group='', header={}):
+def get_uris_history(params={}, host='', group='', header={}, session=None):
     service = f'/groups/{group}/uris/history'
-    r = requests.get(host+service, params=params, headers=header)
+    r = session.get(host+service, params=params, headers=header)
     return r.text
 
 @auth
-def batch_document_action(action, params={}, host='', group='', member='', header={}):
+def iter_uris_history(
+        params={}, host='', group='', header={}, session=None, workers: int = URI_WORKERS
+    ) -> Iterator[dict]:
+    """
+    Like get_uris_history but fetches the history in pages of *URI_PAGE_SIZE*,
+    and yields each URI as soon as its page arrives.
+    The pages after the first are fetched concurrently by up to *workers* threads.
+    """
+    kwargs = {'host': host, 'group': group, 'header': header, 'session': session}
+    return _iter_uri_pages(lambda params: get_uris_history(params, **kwargs), params, workers)
+
+@auth
+def batch_document_action(action, params={}, host='', group='', member='', header={}, session=None):
     service = f'/members/{member}/groups/{group}/batch/uri/{action}/search'
-    r = requests.post(host+service, params=params, headers=header)
+    r = session.post(host+service, params=params, headers=header)
+    invalidate_uris()
+    r.raise_for_status()
     return r.text
 
+#######################
+# Asynchronous client #
+#######################
+
+class AsyncClient:
+    """
+    Exposes the functions in this module as coroutines, for making many requests at once.
+    Requests are made on worker threads through the shared session,
+    so they benefit from its connection pool and retries.
+
+    At most *concurrency* requests are in flight at once,
+    and at most *rate* requests are started per second for each host.
+
+    PageSeeder API functions in this module (those decorated with auth)
+    can be accessed as attributes, e.g.:
+
+    ``await client.get_uri(uri)``
+    """
+    concurrency: int
+    """Maximum number of requests in flight at once."""
+    rate: Optional[float]
+    """Maximum number of requests started per second for each host. No limit if None."""
+
+    def __init__(self, concurrency: int = CONCURRENCY, rate: Optional[float] = RATE_LIMIT) -> None:
+        """
+        Constructor.
+
+        :param concurrency: Maximum number of requests in flight at once, defaults to CONCURRENCY
+        :type concurrency: int, optional
+        :param rate: Maximum number of requests started per second for each host,
+        defaults to RATE_LIMIT. No limit if None.
+        :type rate: float, optional
+        """
+        self.concurrency = concurrency
+        self.rate = rate
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._next_start: dict[str, float] = {}
+
+    def __getattr__(self, name: str) -> Callable:
+        if name not in _API_FUNCTIONS:
+            raise AttributeError(f"'{type(self).__name__}' has no attribute '{name}'")
+        func = globals()[name]
+        async def coroutine(*args, **kwargs):
+            return await self.call(func, *args, **kwargs)
+        return coroutine
+
+    async def _throttle(self, host: str) -> None:
+        """
+        Waits until another request may be started for *host*.
+        """
+        if not self.rate:
+            return
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start.get(host, now))
+        self._next_start[host] = start + (1 / self.rate)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _call(self, host: str, func: Callable, *args, **kwargs) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            await self._throttle(host)
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def call(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Calls *func* with the given arguments on a worker thread.
+        The call is rate limited against the configured PageSeeder host.
+
+        :param func: The function to call.
+        :type func: Callable
+        :return: The value returned by *func*.
+        :rtype: Any
+        """
+        return await self._call(credentials()['host'], func, *args, **kwargs)
+
+    async def get_version(self, host: str, **kwargs) -> str:
+        """
+        Returns the version of a PageSeeder server.
+        The call is rate limited against *host*.
+        """
+        return await self._call(host, get_version, host, **kwargs)
+
+    async def map(self, func: Callable, *iterables: Iterable, **kwargs) -> list:
+        """
+        Calls *func* once for each set of positional arguments taken from *iterables*,
+        like the builtin map, and waits for all of the calls to return.
+        Any exceptions raised are returned in place of the result.
+
+        :param func: The function to call, or a coroutine function of this client.
+        :type func: Callable
+        :return: A list of the values returned, in the same order as the arguments.
+        :rtype: list
+        """
+        if not asyncio.iscoroutinefunction(func):
+            func = partial(self.call, func)
+        return await asyncio.gather(
+            *(func(*args, **kwargs) for args in zip(*iterables)),
+            return_exceptions = True
+        )
+
+
+def gather(func: Callable, *iterables: Iterable, **kwargs) -> list:
+    """
+    Calls *func* once for each set of positional arguments taken from *iterables*,
+    making the calls concurrently with an AsyncClient.
+    Blocks until all calls have returned.
+    Any exceptions raised are returned in place of the result.
+
+    :param func: The function to call.
+    :type func: Callable
+    :return: A list of the values returned, in the same order as the arguments.
+    :rtype: list
+    """
+    return asyncio.run(AsyncClient().map(func, *iterables, **kwargs))
+
 if __name__ == '__main__':
     urimap()
@@ -10,7 +10,7 @@ import json
 from typing import Generator, Tuple
 
 import requests
-from netdox import Network, utils
+from netdox import Network, names, utils
 from datetime import datetime
 import hmac
 import hashlib
@@ -46,14 +46,41 @@ def genheader() -> dict[str, str]:
 	return header
 
 
-def fetch_domains() -> Generator[Tuple[str, str], None, None]:
+def get(url: str, network: Network = None) -> str:
+    """
+    Makes a GET request to the DNSMadeEasy API, 
+    and records it in the metrics of *network* if one is given.
+
+    :param url: The URL to request.
+    :type url: str
+    :param network: The network to record metrics in, defaults to None
+    :type network: Network, optional
+    :return: The text of the response.
+    :rtype: str
+    """
+    if network is None:
+        return requests.get(url, headers=genheader()).text
+
+    metrics = network.counter
+    with metrics.histogram('dnsmadeeasy_request_seconds', 
+            'Seconds taken by requests to the DNSMadeEasy API.').time():
+        response = requests.get(url, headers=genheader())
+    metrics.counter('dnsmadeeasy_requests', 'Requests made to the DNSMadeEasy API.').inc()
+    metrics.counter('dnsmadeeasy_bytes_fetched', 
+        'Bytes received from the DNSMadeEasy API.').inc(len(response.content))
+    return response.text
+
+
+def fetch_domains(network: Network = None) -> Generator[Tuple[str, str], None, None]:
     """
     Generator which returns a tuple containing one managed domain's ID and name.
 
+    :param network: The network to record metrics in, defaults to None
+    :type network: Network, optional
     :yield: A 2-tuple containing the domain's ID and name as strings.
     :rtype: Generator[Tuple[str, str], None, None]
     """
-    response = requests.get('https://api.dnsmadeeasy.com/V2.0/dns/managed/', headers=genheader()).text
+    response = get('https://api.dnsmadeeasy.com/V2.0/dns/managed/', network)
     jsondata = json.loads(response)['data']
     if "error" in response:
         raise RuntimeError('DNSMadeEasy authentication failed.')
@@ -69,9 +96,12 @@ def fetch_dns(network: Network):
     :param network: The network.
     :type network: Network
     """
-    for id, domain in fetch_domains():
-        response = requests.get('https://api.dnsmadeeasy.com/V2.0/dns/managed/{0}/records'.format(id), headers=genheader()).text
+    zone_records = network.counter.counter('dnsmadeeasy_records', 
+        'DNS records read from DNSMadeEasy, by zone.', ('zone',))
+    for id, domain in fetch_domains(network):
+        response = get('https://api.dnsmadeeasy.com/V2.0/dns/managed/{0}/records'.format(id), network)
         records = json.loads(response)['data']
+        zone_records.inc(len(records), (domain,))
 
         for record in records:
             if record['type'] == 'A':
@@ -201,4 +231,4 @@ def assemble_fqdn(subdomain: str, root: str) -> str:
         fqdn = '_wildcard_.' + root
     else:
         fqdn = subdomain +'.'+ root
-    return fqdn.strip('.').strip().lower()
+    return names.canonical(fqdn)
@@ -161,4 +161,5 @@ __stages__ = {
     LifecycleStage.NODES: runner
 }
 __nodes__ = [HardwareNode]
+__remote__ = {'hardware'}
 # __output__ = {'hardware'}
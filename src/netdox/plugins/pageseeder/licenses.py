@@ -1,11 +1,14 @@
+import asyncio
 import logging
 import json
+from typing import Optional, Union
 
 from bs4 import BeautifulSoup
 from netdox import Network, pageseeder, psml
 from netdox.base import NetworkObject
 from netdox.dns import DNSObject
 from netdox.utils import valid_domain
+from urllib3.exceptions import InsecureRequestWarning
 import warnings
 
 logger = logging.getLogger(__name__)
@@ -13,47 +16,91 @@ logger = logging.getLogger(__name__)
 def runner(network: Network):
     urimap = pageseeder.urimap('website/ps-licenses', 'document')
     cache: set[str] = set()
-    for uri in urimap.values():
+    licenses = asyncio.run(_fetch_licenses(list(urimap.values())))
+
+    for uri, domain, license_type, version, org in licenses:
+        cache |= apply_licenses(network.find_dns(domain), 
+            uri, license_type, version, org, cache)
+
+async def _fetch_licenses(uris: list[str]) -> list[tuple]:
+    """
+    Fetches the license documents with the given URIs, resolves their domains,
+    and probes the PageSeeder version on each domain, making requests concurrently.
+
+    :param uris: URIs of the license documents.
+    :type uris: list[str]
+    :return: A list of tuples containing the URI, domain, license type, version, and
+    organization URI of each valid license, in the same order as *uris*.
+    :rtype: list[tuple]
+    """
+    client = pageseeder.AsyncClient()
+    licenses: list[tuple[str, Union[str, psml.XRef], dict]] = []
+    for uri, response in zip(uris, await client.map(pageseeder.get_default_uriid, uris)):
         try:
-            license_soup = BeautifulSoup(pageseeder.get_default_uriid(uri).text, 'xml')
+            license_soup = BeautifulSoup(response.text, 'xml')
             details = psml.PropertiesFragment.from_tag(
                 license_soup.find('section', id = 'details').find('properties-fragment')
             ).to_dict()
-
-            domain = details['domain']
-            try:
-                if isinstance(domain, str):
-                    assert valid_domain(domain)
-                elif isinstance(domain, psml.XRef):
-                    domain = _domain_from_xref(domain)
-                else:
-                    raise TypeError()
-            
-            except AssertionError:
-                logger.warning(f'License with uri {uri} has invalid domain: {domain}')
-            except AttributeError:
-                logger.warning(f'Domain is unresolved xref in license with uri {uri}.')
-            except TypeError:
-                logger.warning(
-                    f'Unable to parse domain from PSML for license with uri {uri}.')
-            else:
-                license_type = details.get('license-type')
-                org = None
-                xref = details.get('organization')
-                if isinstance(xref, psml.XRef) and 'uriid' in xref.tag.attrs:
-                    org = xref.tag['uriid']
-                try:
-                    with warnings.catch_warnings(): #TODO investigate alternatives to this
-                        warnings.simplefilter('ignore')
-                        version = pageseeder.get_version(domain, timeout = 1, verify = False)
-                except Exception:
-                    version = None
-
-                cache |= apply_licenses(network.find_dns(domain), 
-                    uri, license_type, version, org, cache)
-                    
+            licenses.append((uri, details['domain'], details))
         except KeyError:
             logger.warning(f'License with uri {uri} missing property \'domain\'.')
+        except AttributeError:
+            logger.warning(f'Failed to fetch or parse license with uri {uri}.')
+
+    # only xrefs need requests to resolve, so plain domains skip the client
+    domains = [domain if isinstance(domain, str) else None for _, domain, _ in licenses]
+    xrefs = [index for index, domain in enumerate(domains) if domain is None]
+    for index, domain in zip(xrefs, await client.map(
+            _resolve_domain, (licenses[index][1] for index in xrefs))):
+        domains[index] = domain
+    valid: list[tuple[str, str, dict]] = []
+    for (uri, _, details), domain in zip(licenses, domains):
+        try:
+            if isinstance(domain, Exception):
+                raise domain
+            assert valid_domain(domain)
+        except AssertionError:
+            logger.warning(f'License with uri {uri} has invalid domain: {domain}')
+        except AttributeError:
+            logger.warning(f'Domain is unresolved xref in license with uri {uri}.')
+        except (TypeError, ValueError):
+            logger.warning(
+                f'Unable to parse domain from PSML for license with uri {uri}.')
+        else:
+            valid.append((uri, domain, details))
+
+    # versions are probed without verifying certificates, from worker threads,
+    # so the warning is filtered for the process until all of the probes return
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', InsecureRequestWarning)
+        versions = await client.map(client.get_version, (domain for _, domain, _ in valid),
+            timeout = 1, verify = False)
+    output = []
+    for (uri, domain, details), version in zip(valid, versions):
+        org = None
+        xref = details.get('organization')
+        if isinstance(xref, psml.XRef) and 'uriid' in xref.tag.attrs:
+            org = xref.tag['uriid']
+        output.append((uri, domain, details.get('license-type'),
+            None if isinstance(version, Exception) else version, org))
+    return output
+
+def _resolve_domain(domain: Union[str, psml.XRef]) -> Optional[str]:
+    """
+    Returns the domain name of a license, from the value of its domain property.
+
+    :param domain: The value of the domain property.
+    :type domain: Union[str, psml.XRef]
+    :raises TypeError: If the value is not a string or XRef.
+    :return: The domain name.
+    :rtype: Optional[str]
+    """
+    if isinstance(domain, str):
+        return domain
+    elif isinstance(domain, psml.XRef):
+        return _domain_from_xref(domain)
+    else:
+        raise TypeError()
 
 def _domain_from_xref(input: psml.XRef) -> str:
     """
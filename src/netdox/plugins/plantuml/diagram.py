@@ -195,7 +195,7 @@ class NodeDiagramFactory:
 
 
 if __name__ == '__main__':
-    net = Network.from_dump()
+    net = Network.from_dump(lazy = True)
     factory = NodeDiagramFactory()
     for node in net.nodes:
         factory.draw(node)
@@ -229,19 +229,32 @@ class ScreenshotManager:
         Also clears the sentence of any screenshots wrongfully marked as stale.
         """
         # TODO remove this method
+        stale, current = [], []
         for file in self.existingScreens:
             if file.replace('_','.')[:-4] not in self.domains:
-                info = json.loads(pageseeder.get_uri(self.urimap[file]))
-                labels = info['labels'] if 'labels' in info else []
-                if 'stale' in labels:
-                    for label in labels:
-                        match = re.fullmatch(utils.expiry_date_pattern, label)
-                        if match and ( date.fromisoformat(match['date']) <= date.today() ):
-                            pageseeder.archive(self.urimap[file])
-                else:
-                    pageseeder.sentence_uri(self.urimap[file])
+                stale.append(self.urimap[file])
+            else:
+                current.append(self.urimap[file])
+
+        archived, sentenced = [], []
+        for uri, info in zip(stale, pageseeder.gather(pageseeder.get_uri, stale)):
+            if not isinstance(info, str):
+                logger.warning(f'Failed to get info for stale screenshot with URI {uri}')
+                continue
+            info = json.loads(info)
+            labels = info['labels'] if 'labels' in info else []
+            if 'stale' in labels:
+                for label in labels:
+                    match = re.fullmatch(utils.expiry_date_pattern, label)
+                    if match and ( date.fromisoformat(match['date']) <= date.today() ):
+                        archived.append(uri)
+                        break
             else:
-                pageseeder.clear_sentence(self.urimap[file])
+                sentenced.append(uri)
+
+        pageseeder.gather(pageseeder.archive, archived)
+        pageseeder.gather(pageseeder.sentence_uri, sentenced)
+        pageseeder.gather(pageseeder.clear_sentence, current)
 
         if 'diffimg' in pageseeder.urimap():
             pageseeder.archive(pageseeder.urimap()['diffimg'])
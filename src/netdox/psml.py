@@ -286,7 +286,7 @@ class PropertiesFragment(PSMLFragment):
         properties = []
         for property in fragment('property'):
             properties.append(Property.from_tag(property))
-        return cls(fragment['id'], properties)
+        return cls(fragment['id'], properties, fragment.attrs)
 
     ## methods 
 
@@ -497,7 +497,7 @@ class Property(PSMLElement):
                     'Failed to parse property from the following tag: '+ str(property))
 
         else:
-            return cls(name)
+            return cls(name, title = title, attrs = property.attrs)
 
 
 class PSMLLink(PSMLElement):
@@ -748,3 +748,26 @@ NODE_TEMPLATE = '''
 
     </document>
 '''
+
+SUBNET_TEMPLATE = '''
+    <document type="subnet" level="portable">
+
+        <documentinfo>
+            <uri docid="#!docid" title="#!name" />
+        </documentinfo>
+
+        <section id="title" lockstructure="true">
+            <fragment id="title">
+                <heading level="2">Subnet</heading>
+                <heading level="1">#!name</heading>
+            </fragment>
+        </section>
+
+        <section id="header" lockstructure="true" />
+
+        <section id="unused" title="Unused Addresses" lockstructure="true">
+            <fragment id="unused" />
+        </section>
+
+    </document>
+'''
@@ -0,0 +1,911 @@
+"""
+This module contains the binary snapshot format used to dump and load Networks.
+
+A snapshot is laid out as follows (all integers little-endian):
+
++-------------+--------------------------------------------------------------+
+| header      | ``MAGIC`` followed by the format version as a u16.           |
++-------------+--------------------------------------------------------------+
+| records     | One record per NetworkObject. References to other objects    |
+|             | are stored as integer record indices, strings as indices     |
+|             | into the string table, and PSML fragments as raw bytes.      |
++-------------+--------------------------------------------------------------+
+| meta        | JSON describing the network config, labels, locations, etc.  |
++-------------+--------------------------------------------------------------+
+| strings     | Interned string table, with an offset array for random       |
+|             | access.                                                      |
++-------------+--------------------------------------------------------------+
+| index       | Kind, offset and length of each record.                      |
++-------------+--------------------------------------------------------------+
+| keys        | Container keys (e.g. domain names, node refs) mapped to      |
+|             | record indices.                                              |
++-------------+--------------------------------------------------------------+
+| trailer     | Offsets of the sections above.                               |
++-------------+--------------------------------------------------------------+
+
+Records are written sequentially, so a snapshot can be written to a stream in a single pass.
+Reading only requires a buffer that supports slicing, such as a memory-mapped file,
+so single objects can be loaded without deserialising the rest of the network.
+"""
+from __future__ import annotations
+
+import importlib
+import io
+import json
+import logging
+import pickle
+import struct
+from collections import OrderedDict
+from typing import IO, TYPE_CHECKING, Any, Iterable, Iterator, Optional, Type
+
+from netdox import base, dns, helpers, nodes
+from netdox.config import NetworkConfig
+
+if TYPE_CHECKING:
+    from netdox.containers import Network
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'NDXSNP'
+"""Bytes every snapshot starts with."""
+VERSION = 1
+"""Version of the snapshot format written by this module."""
+
+_HEADER = struct.Struct(f'<{len(MAGIC)}sH')
+_TRAILER = struct.Struct('<QQQQ')
+_INDEX_ENTRY = struct.Struct('<BQI')
+_KEY_ENTRY = struct.Struct('<BII')
+_U8 = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+
+NONE = 0xFFFFFFFF
+"""Sentinel value for a missing string or reference."""
+MAX_RESIDENT = 1024
+"""Default number of objects a LazySnapshot keeps loaded."""
+
+## Record kinds
+
+KIND_DOMAIN = 0
+KIND_IPV4 = 1
+KIND_NODE = 2
+
+CONTAINERS = {
+    KIND_DOMAIN: 'domains',
+    KIND_IPV4: 'ips',
+    KIND_NODE: 'nodes'
+}
+"""Maps record kinds to the name of the Network attribute holding their container."""
+
+_BASE_ATTRS = frozenset((
+    'network', 'name', 'identity', 'labels', '_organization',
+    '_notes', '_raw_notes', '_footer', '_raw_footer'
+))
+_DNS_ATTRS = _BASE_ATTRS | {'zone', '_node', 'links', 'implied_links'}
+_KNOWN_ATTRS = {
+    KIND_DOMAIN: _DNS_ATTRS | {'txt_records', 'caa_records'},
+    KIND_IPV4: _DNS_ATTRS | {'NAT', 'is_private', 'subnet'},
+    KIND_NODE: _BASE_ATTRS | {'_location', '_domains', '_ips', 'proxy'}
+}
+"""Attributes encoded explicitly for each kind. Any others are pickled as extras."""
+_TRANSIENT_ATTRS = frozenset(('_label_attrs',))
+"""Attributes that only cache derived values, and are never written."""
+
+
+def _kind(nwobj: base.NetworkObject) -> int:
+    if isinstance(nwobj, dns.Domain):
+        return KIND_DOMAIN
+    elif isinstance(nwobj, dns.IPv4Address):
+        return KIND_IPV4
+    elif isinstance(nwobj, nodes.Node):
+        return KIND_NODE
+    raise TypeError(f'Cannot write object of type {type(nwobj)} to a snapshot.')
+
+def _class_path(cls: type) -> str:
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+def _class_from_path(path: str) -> Type[base.NetworkObject]:
+    module, _, qualname = path.partition(':')
+    obj: Any = importlib.import_module(module)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+##########
+# Writer #
+##########
+
+class _ExtrasPickler(pickle.Pickler):
+    """Pickles the extra attributes of an object, replacing network objects with references."""
+
+    def __init__(self, file: IO[bytes], writer: SnapshotWriter) -> None:
+        super().__init__(file, protocol = pickle.HIGHEST_PROTOCOL)
+        self.writer = writer
+
+    def persistent_id(self, obj: Any) -> Optional[tuple]:
+        if obj is self.writer.network:
+            return ('network',)
+        elif isinstance(obj, base.NetworkObject):
+            return ('object', self.writer.ref(obj))
+        elif isinstance(obj, nodes.NodeProxy):
+            return ('proxy', self.writer.ref(obj.backend))
+        return None
+
+class _Record:
+    """Buffer for encoding a single record."""
+    buffer: bytearray
+
+    def __init__(self, writer: SnapshotWriter) -> None:
+        self.writer = writer
+        self.buffer = bytearray()
+
+    def u8(self, value: int) -> None:
+        self.buffer += _U8.pack(value)
+
+    def u32(self, value: int) -> None:
+        self.buffer += _U32.pack(value)
+
+    def string(self, value: Optional[str]) -> None:
+        self.u32(NONE if value is None else self.writer.intern(value))
+
+    def strings(self, values: Iterable[str]) -> None:
+        values = sorted(values)
+        self.u32(len(values))
+        for value in values:
+            self.string(value)
+
+    def ref(self, nwobj: Optional[base.NetworkObject]) -> None:
+        self.u32(NONE if nwobj is None else self.writer.ref(nwobj))
+
+    def blob(self, value: bytes) -> None:
+        self.u32(len(value))
+        self.buffer += value
+
+class SnapshotWriter:
+    """
+    Writes a Network to a stream as a snapshot.
+    Only the string table and the index are held in memory;
+    records are written to the stream as they are encoded.
+    """
+    network: Network
+    """The network being written."""
+    stream: IO[bytes]
+    """The stream to write to."""
+    _strings: dict[str, int]
+    """Maps interned strings to their index in the string table."""
+    _refs: dict[int, int]
+    """Maps the ids of objects to their record index."""
+    _queue: list[base.NetworkObject]
+    """Objects in order of their record index."""
+    _index: list[tuple[int, int, int]]
+    """Kind, offset and length of each written record."""
+
+    def __init__(self, network: Network, stream: IO[bytes]) -> None:
+        self.network = network
+        self.stream = stream
+        self._strings = {}
+        self._refs = {}
+        self._queue = []
+        self._index = []
+        self._offset = 0
+
+    def _write(self, data: bytes) -> None:
+        self.stream.write(data)
+        self._offset += len(data)
+
+    def intern(self, value: str) -> int:
+        """
+        Returns the index of *value* in the string table, adding it if necessary.
+        """
+        try:
+            return self._strings[value]
+        except KeyError:
+            self._strings[value] = len(self._strings)
+            return self._strings[value]
+
+    def ref(self, nwobj: base.NetworkObject) -> int:
+        """
+        Returns the record index of *nwobj*, queueing it to be written if necessary.
+        """
+        try:
+            return self._refs[id(nwobj)]
+        except KeyError:
+            self._refs[id(nwobj)] = len(self._queue)
+            self._queue.append(nwobj)
+            return self._refs[id(nwobj)]
+
+    def write(self) -> None:
+        """
+        Writes the whole network to the stream.
+        """
+        self._write(_HEADER.pack(MAGIC, VERSION))
+
+        keys = []
+        for kind, attr in CONTAINERS.items():
+            container: base.NetworkObjectContainer = getattr(self.network, attr)
+            for key, nwobj in container.objects.items():
+                keys.append((kind, self.intern(key), self.ref(nwobj)))
+
+        count = 0
+        while count < len(self._queue):
+            nwobj = self._queue[count]
+            kind = _kind(nwobj)
+            record = self._encode(nwobj, kind)
+            self._index.append((kind, self._offset, len(record)))
+            self._write(record)
+            count += 1
+
+        meta_offset = self._offset
+        self._write(json.dumps(self._meta()).encode('utf-8'))
+
+        strings_offset = self._offset
+        encoded = [string.encode('utf-8') for string in self._strings]
+        self._write(_U32.pack(len(encoded)))
+        position = 0
+        offsets = bytearray()
+        for string in encoded:
+            offsets += _U32.pack(position)
+            position += len(string)
+        offsets += _U32.pack(position)
+        self._write(bytes(offsets))
+        for string in encoded:
+            self._write(string)
+
+        index_offset = self._offset
+        self._write(_U32.pack(len(self._index)))
+        self._write(b''.join(_INDEX_ENTRY.pack(*entry) for entry in self._index))
+
+        keys_offset = self._offset
+        self._write(_U32.pack(len(keys)))
+        self._write(b''.join(_KEY_ENTRY.pack(*key) for key in keys))
+
+        self._write(_TRAILER.pack(meta_offset, strings_offset, index_offset, keys_offset))
+
+    def _meta(self) -> dict:
+        """
+        Returns a JSON serialisable description of the network-level data.
+        """
+        config = self.network.config
+        return {
+            'config': {
+                'exclusions': sorted(config.exclusions),
+                'labels': config.labels,
+                'organizations': {
+                    uri: sorted(labels) for uri, labels in config.organizations.items()},
+                'subnets': config.subnets
+            },
+            'labels': {
+                docid: sorted(labels) for docid, labels in self.network.labels.items()},
+            'locations': {
+                location: sorted(subnets)
+                for location, subnets in self.network.locator.location_map.items()},
+            'counts': {
+                facet.name: count for facet, count in self.network.counter.counts.items()},
+            'report': {
+                'sections': self.network.report.sections,
+                'logs': self.network.report.logs
+            }
+        }
+
+    def _encode(self, nwobj: base.NetworkObject, kind: int) -> bytes:
+        """
+        Encodes a NetworkObject as a record.
+        """
+        record = _Record(self)
+        record.string(_class_path(type(nwobj)))
+        record.string(nwobj.name)
+        record.string(nwobj.identity)
+        record.strings(nwobj.labels)
+        record.string(nwobj._organization)
+        record.blob(nwobj.raw_notes)
+        record.blob(nwobj.raw_footer)
+
+        if isinstance(nwobj, dns.DNSObject):
+            record.string(nwobj.zone)
+            if isinstance(nwobj._node, nodes.NodeProxy):
+                record.ref(nwobj._node.backend)
+                record.u8(1)
+            else:
+                record.ref(nwobj._node)
+                record.u8(0)
+            for linkset in (nwobj.links, nwobj.implied_links):
+                record.u32(len(linkset))
+                for link in linkset:
+                    record.ref(link.destination)
+                    record.string(link.source)
+
+            if isinstance(nwobj, dns.Domain):
+                record.u32(len(nwobj.txt_records))
+                for txt in nwobj.txt_records:
+                    record.string(txt.name)
+                    record.string(txt.value)
+                    record.string(txt.source)
+                record.u32(len(nwobj.caa_records))
+                for caa in nwobj.caa_records:
+                    record.string(caa.name)
+                    record.string(caa.value)
+                    record.string(caa.caa_type)
+                    record.string(caa.source)
+            else:
+                assert isinstance(nwobj, dns.IPv4Address)
+                record.u8(int(nwobj.is_private))
+                record.string(nwobj.subnet)
+                record.u32(len(nwobj.NAT))
+                for nat in nwobj.NAT:
+                    record.ref(nat.destination)
+                    record.string(nat.source)
+
+        else:
+            assert isinstance(nwobj, nodes.Node)
+            record.string(nwobj._location)
+            record.strings(nwobj.domains)
+            record.strings(nwobj.ips)
+            if isinstance(nwobj, nodes.ProxiedNode):
+                record.ref(nwobj.proxy.node)
+                record.strings(nwobj.proxy.addresses)
+            else:
+                record.ref(None)
+
+        extras = {
+            attr: value for attr, value in vars(nwobj).items()
+            if attr not in _KNOWN_ATTRS[kind] and attr not in _TRANSIENT_ATTRS
+        }
+        if extras:
+            with io.BytesIO() as stream:
+                _ExtrasPickler(stream, self).dump(extras)
+                record.blob(stream.getvalue())
+        else:
+            record.blob(b'')
+
+        return bytes(record.buffer)
+
+
+def dump(network: Network, stream: IO[bytes]) -> None:
+    """
+    Writes *network* to *stream* as a snapshot.
+
+    :param network: The network to write.
+    :type network: Network
+    :param stream: A binary stream to write to.
+    :type stream: IO[bytes]
+    """
+    SnapshotWriter(network, stream).write()
+
+def dumps(network: Network) -> bytes:
+    """
+    Returns *network* as a snapshot.
+
+    :param network: The network to serialise.
+    :type network: Network
+    :return: The snapshot bytes.
+    :rtype: bytes
+    """
+    with io.BytesIO() as stream:
+        dump(network, stream)
+        return stream.getvalue()
+
+
+##########
+# Reader #
+##########
+
+class _ExtrasUnpickler(pickle.Unpickler):
+    """Unpickles the extra attributes of an object, resolving references to network objects."""
+
+    def __init__(self, file: IO[bytes], snapshot: Snapshot) -> None:
+        super().__init__(file)
+        self.snapshot = snapshot
+
+    def persistent_load(self, pid: tuple) -> Any:
+        if pid[0] == 'network':
+            return self.snapshot.network
+        elif pid[0] == 'object':
+            return self.snapshot.reference(pid[1])
+        elif pid[0] == 'proxy':
+            return self.snapshot.reference(pid[1]).proxy
+        raise pickle.UnpicklingError(f'Unknown persistent id in snapshot: {pid}')
+
+class _Cursor:
+    """Reads values from a record, in the order they were written."""
+
+    def __init__(self, snapshot: Snapshot, offset: int) -> None:
+        self.snapshot = snapshot
+        self.buffer = snapshot.buffer
+        self.offset = offset
+
+    def u8(self) -> int:
+        value = _U8.unpack_from(self.buffer, self.offset)[0]
+        self.offset += 1
+        return value
+
+    def u32(self) -> int:
+        value = _U32.unpack_from(self.buffer, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def string(self) -> Optional[str]:
+        sid = self.u32()
+        return None if sid == NONE else self.snapshot.string(sid)
+
+    def strings(self) -> list[str]:
+        return [self.string() for _ in range(self.u32())] # type: ignore
+
+    def ref(self) -> Optional[int]:
+        ref = self.u32()
+        return None if ref == NONE else ref
+
+    def skip(self, size: int, counted: bool = False) -> None:
+        """
+        Skips *size* bytes, or *size* bytes per item of a counted sequence.
+        """
+        if counted:
+            size *= self.u32()
+        self.offset += size
+
+    def blob(self) -> bytes:
+        length = self.u32()
+        self.offset += length
+        return bytes(self.buffer[self.offset - length: self.offset])
+
+class Snapshot:
+    """
+    Read access to a snapshot held in some buffer.
+
+    Objects are loaded on request; each object is first created *shallow*,
+    with every attribute except its links to other objects,
+    and then *hydrated* with its links when it is explicitly loaded.
+    """
+    buffer: Any
+    """The buffer containing the snapshot, e.g. bytes or an mmap."""
+    network: Network
+    """The network objects are loaded into."""
+    meta: dict
+    """The network-level data stored in the snapshot."""
+    _index: list[tuple[int, int, int]]
+    """Kind, offset and length of each record."""
+    _objects: dict[int, base.NetworkObject]
+    """Maps record indices to the objects loaded from them."""
+    _hydrated: set[int]
+    """Indices of the records whose objects have been hydrated."""
+    _keys: Optional[dict[tuple[int, str], int]]
+    """Maps container kind and key to record index. Built on first use."""
+
+    def __init__(self, buffer: Any, network_cls: Type[Network] = None) -> None:
+        """
+        Constructor.
+
+        :param buffer: A buffer containing a snapshot.
+        :type buffer: Any
+        :param network_cls: The Network class to instantiate, defaults to Network.
+        :type network_cls: Type[Network], optional
+        :raises ValueError: If the buffer does not contain a snapshot of a supported version.
+        """
+        if not is_snapshot(buffer):
+            raise ValueError('Buffer does not contain a network snapshot.')
+        magic, version = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('Buffer does not contain a network snapshot.')
+        if version > VERSION:
+            raise ValueError(f'Unsupported snapshot version: {version}')
+        self.buffer = buffer
+
+        meta_offset, self._strings_offset, index_offset, self._keys_offset = \
+            _TRAILER.unpack_from(buffer, len(buffer) - _TRAILER.size)
+        self.meta = json.loads(bytes(buffer[meta_offset: self._strings_offset]))
+
+        count = _U32.unpack_from(buffer, index_offset)[0]
+        self._index = [
+            _INDEX_ENTRY.unpack_from(buffer, index_offset + 4 + (i * _INDEX_ENTRY.size))
+            for i in range(count)
+        ]
+        self._string_count = _U32.unpack_from(buffer, self._strings_offset)[0]
+        self._string_data = self._strings_offset + 4 * (self._string_count + 2)
+        self._string_cache: dict[int, str] = {}
+
+        self._objects = {}
+        self._hydrated = set()
+        self._keys = None
+        self.network = self._new_network(network_cls)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _new_network(self, network_cls: Optional[Type[Network]]) -> Network:
+        """
+        Instantiates an empty Network from the snapshot metadata.
+        """
+        if network_cls is None:
+            from netdox.containers import Network
+            network_cls = Network
+
+        config = self.meta['config']
+        network = network_cls(
+            config = NetworkConfig(
+                exclusions = config['exclusions'],
+                labels = config['labels'],
+                organizations = {
+                    uri: set(labels) for uri, labels in config['organizations'].items()},
+                subnets = config['subnets']
+            ),
+            labels = helpers.LabelDict({
+                docid: set(labels) for docid, labels in self.meta['labels'].items()}),
+            locations = {
+                location: set(subnets)
+                for location, subnets in self.meta['locations'].items()}
+        )
+        for facet, count in self.meta['counts'].items():
+            network.counter.set_facet(helpers.CountedFacets[facet], count)
+        network.report.sections = list(self.meta['report']['sections'])
+        network.report.logs = self.meta['report']['logs']
+        return network
+
+    ## strings and keys
+
+    def string(self, sid: int) -> str:
+        """
+        Returns the string at index *sid* in the string table.
+        """
+        try:
+            return self._string_cache[sid]
+        except KeyError:
+            start, end = struct.unpack_from('<II', self.buffer, self._strings_offset + 4 + (4 * sid))
+            value = bytes(self.buffer[self._string_data + start: self._string_data + end]).decode('utf-8')
+            self._string_cache[sid] = value
+            return value
+
+    def _entries(self) -> Iterator[tuple[int, str, int]]:
+        """
+        Yields the kind, key and record index of each container key.
+        """
+        count = _U32.unpack_from(self.buffer, self._keys_offset)[0]
+        for i in range(count):
+            kind, sid, index = _KEY_ENTRY.unpack_from(
+                self.buffer, self._keys_offset + 4 + (i * _KEY_ENTRY.size))
+            yield kind, self.string(sid), index
+
+    @property
+    def keys(self) -> dict[tuple[int, str], int]:
+        """
+        Maps a record kind and a key in the corresponding container to a record index.
+        """
+        if self._keys is None:
+            self._keys = {(kind, key): index for kind, key, index in self._entries()}
+        return self._keys
+
+    def find(self, kind: int, key: str) -> int:
+        """
+        Returns the index of the record stored under *key* in the container for *kind*.
+
+        :raises KeyError: If there is no such key.
+        """
+        return self.keys[(kind, key.lower())]
+
+    def kind(self, index: int) -> int:
+        """Returns the kind of the record at *index*."""
+        return self._index[index][0]
+
+    def header(self, index: int) -> tuple[str, str, str]:
+        """
+        Returns the class path, name, and identity of the record at *index*,
+        without loading it.
+        """
+        cursor = _Cursor(self, self._index[index][1])
+        return cursor.string(), cursor.string(), cursor.string() # type: ignore
+
+    ## loading
+
+    def object(self, index: int) -> base.NetworkObject:
+        """
+        Returns the object for the record at *index*, creating it shallow if necessary.
+        """
+        try:
+            return self._objects[index]
+        except KeyError:
+            return self._create(index)
+
+    def reference(self, index: int) -> base.NetworkObject:
+        """
+        Returns the value to use for a reference from one object to the record at *index*.
+        """
+        return self.object(index)
+
+    def hydrate(self, index: int) -> base.NetworkObject:
+        """
+        Returns the object for the record at *index*, with its links to other objects loaded.
+        """
+        nwobj = self.object(index)
+        if index not in self._hydrated:
+            self._hydrated.add(index)
+            self._link(index, nwobj)
+        return nwobj
+
+    def load(self, indices: Iterable[int] = None) -> Network:
+        """
+        Hydrates the records at *indices*, or all records,
+        and adds all loaded objects to the network's containers.
+
+        Objects that are referenced by a hydrated object but were not requested themselves
+        are loaded shallow: they are present in the network, but have no links.
+
+        :param indices: The record indices to load, defaults to all of them.
+        :type indices: Iterable[int], optional
+        :return: The network containing the loaded objects.
+        :rtype: Network
+        """
+        if indices is None:
+            indices = range(len(self))
+        for index in indices:
+            self.hydrate(index)
+
+        for kind, key, index in self._entries():
+            if index in self._objects:
+                container = getattr(self.network, CONTAINERS[kind])
+                container.objects[key] = self._objects[index]
+        return self.network
+
+    def load_keys(self, kind: int, keys: Iterable[str]) -> Network:
+        """
+        Like load, but selects the records by their key in a container.
+
+        :param kind: Kind of the records, one of KIND_DOMAIN, KIND_IPV4, KIND_NODE.
+        :type kind: int
+        :param keys: Keys of the objects to load, e.g. domain names.
+        :type keys: Iterable[str]
+        :return: The network containing the loaded objects.
+        :rtype: Network
+        """
+        return self.load([self.find(kind, key) for key in keys])
+
+    def _create(self, index: int) -> base.NetworkObject:
+        """
+        Creates the object for the record at *index* with every attribute except its links.
+        """
+        kind, offset, _ = self._index[index]
+        cursor = _Cursor(self, offset)
+        cls = _class_from_path(cursor.string()) # type: ignore
+        nwobj = cls.__new__(cls)
+        self._objects[index] = nwobj
+
+        nwobj.network = self.network
+        nwobj.name = cursor.string() # type: ignore
+        nwobj.identity = cursor.string() # type: ignore
+        labels = cursor.strings()
+        nwobj._organization = cursor.string()
+        notes = cursor.blob()
+        nwobj.notes = nwobj.DEFAULT_RAW_NOTES if notes == nwobj.DEFAULT_RAW_NOTES else notes
+        nwobj.psmlFooter = cursor.blob()
+
+        if isinstance(nwobj, dns.DNSObject):
+            nwobj.zone = cursor.string()
+            nwobj._node = None
+            nwobj.links = dns.DNSLinkSet()
+            nwobj.implied_links = dns.DNSLinkSet()
+            node_ref, proxied = cursor.ref(), cursor.u8()
+            for _ in range(2):
+                cursor.skip(8, counted = True)
+
+            if isinstance(nwobj, dns.Domain):
+                nwobj.txt_records = {
+                    dns.TXTRecord(cursor.string(), cursor.string(), cursor.string()) # type: ignore
+                    for _ in range(cursor.u32())
+                }
+                nwobj.caa_records = {
+                    dns.CAARecord(cursor.string(), cursor.string(), cursor.string(), cursor.string()) # type: ignore
+                    for _ in range(cursor.u32())
+                }
+            else:
+                assert isinstance(nwobj, dns.IPv4Address)
+                nwobj.is_private = bool(cursor.u8())
+                nwobj.subnet = cursor.string() # type: ignore
+                nwobj.NAT = set()
+                cursor.skip(8, counted = True)
+
+        else:
+            assert isinstance(nwobj, nodes.Node)
+            nwobj._location = cursor.string()
+            nwobj._domains = set(cursor.strings())
+            nwobj._ips = set(cursor.strings())
+            proxy_ref = cursor.ref()
+            if isinstance(nwobj, nodes.ProxiedNode):
+                proxy = nodes.NodeProxy.__new__(nodes.NodeProxy)
+                proxy.backend = nwobj
+                proxy.addresses = set(cursor.strings())
+                nwobj.proxy = proxy
+                proxy.node = self.reference(proxy_ref) if proxy_ref is not None else None # type: ignore
+
+        extras = cursor.blob()
+        if extras:
+            with io.BytesIO(extras) as stream:
+                for attr, value in _ExtrasUnpickler(stream, self).load().items():
+                    setattr(nwobj, attr, value)
+
+        nwobj.labels = self.network.labels[nwobj.docid]
+        nwobj.labels.update(labels)
+
+        if isinstance(nwobj, dns.DNSObject) and node_ref is not None:
+            node = self.reference(node_ref)
+            nwobj._node = node.proxy if proxied else node # type: ignore
+
+        return nwobj
+
+    def _link(self, index: int, nwobj: base.NetworkObject) -> None:
+        """
+        Loads the links from the object at *index* to other objects.
+        """
+        if not isinstance(nwobj, dns.DNSObject):
+            return
+
+        cursor = _Cursor(self, self._index[index][1])
+        cursor.skip(12)
+        cursor.skip(4, counted = True)
+        cursor.skip(4)
+        for _ in range(2):
+            cursor.skip(1, counted = True)
+        cursor.skip(9)
+
+        for linkset in (nwobj.links, nwobj.implied_links):
+            for _ in range(cursor.u32()):
+                dest = self.reference(cursor.ref()) # type: ignore
+                linkset.add(dns.DNSLink(nwobj, dest, cursor.string())) # type: ignore
+
+        if isinstance(nwobj, dns.IPv4Address):
+            cursor.skip(5)
+            for _ in range(cursor.u32()):
+                dest = self.reference(cursor.ref()) # type: ignore
+                nwobj.NAT.add(dns.NATLink(nwobj, dest, cursor.string())) # type: ignore
+
+
+class LazyObject:
+    """
+    Stands in for a NetworkObject in a lazily loaded network.
+    The object is loaded from the snapshot when any of its attributes are accessed,
+    and may be evicted again once enough other objects have been loaded.
+
+    Passes isinstance checks for the class of the object it stands in for.
+    Changes made through a LazyObject are lost if the object is evicted.
+    """
+    __slots__ = ('_snapshot', '_index')
+
+    def __init__(self, snapshot: LazySnapshot, index: int) -> None:
+        object.__setattr__(self, '_snapshot', snapshot)
+        object.__setattr__(self, '_index', index)
+
+    @property # type: ignore
+    def __class__(self) -> type:
+        return self._snapshot.object_class(self._index)
+
+    @property
+    def name(self) -> str:
+        """Name of the object, read without loading it."""
+        return self._snapshot.header(self._index)[1]
+
+    @property
+    def identity(self) -> str:
+        """Identity of the object, read without loading it."""
+        return self._snapshot.header(self._index)[2]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._snapshot.resolve(self._index), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._snapshot.resolve(self._index), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self._snapshot.resolve(self._index), name)
+
+    def __str__(self) -> str:
+        cls = self.__class__
+        return f'<{cls.__module__}.{cls.__name__} {self.identity}>'
+
+    def __repr__(self) -> str:
+        return str(self)
+
+class LazySnapshot(Snapshot):
+    """
+    A Snapshot that loads a network of LazyObjects.
+    At most *max_resident* objects are loaded at once;
+    the least recently used object is evicted when another is loaded.
+    """
+    max_resident: int
+    """The maximum number of objects to keep loaded."""
+    _stubs: dict[int, LazyObject]
+    """Maps record indices to the LazyObject standing in for them."""
+    _resident: OrderedDict[int, base.NetworkObject]
+    """Loaded objects, from least to most recently used."""
+    _classes: dict[int, type]
+    """Maps record indices to the class of their object."""
+
+    def __init__(self, 
+            buffer: Any, 
+            network_cls: Type[Network] = None, 
+            max_resident: int = MAX_RESIDENT
+        ) -> None:
+        """
+        Constructor.
+
+        :param buffer: A buffer containing a snapshot.
+        :type buffer: Any
+        :param network_cls: The Network class to instantiate, defaults to Network.
+        :type network_cls: Type[Network], optional
+        :param max_resident: The maximum number of objects to keep loaded, 
+        defaults to MAX_RESIDENT
+        :type max_resident: int, optional
+        :raises ValueError: If the buffer does not contain a snapshot of a supported version.
+        """
+        if max_resident < 1:
+            raise ValueError('Must allow at least one resident object.')
+        super().__init__(buffer, network_cls)
+        self.max_resident = max_resident
+        self._stubs = {}
+        self._resident = OrderedDict()
+        self._classes = {}
+
+    def object_class(self, index: int) -> type:
+        """
+        Returns the class of the object for the record at *index*, without loading it.
+        """
+        try:
+            return self._classes[index]
+        except KeyError:
+            self._classes[index] = _class_from_path(self.header(index)[0])
+            return self._classes[index]
+
+    def reference(self, index: int) -> LazyObject: # type: ignore
+        try:
+            return self._stubs[index]
+        except KeyError:
+            self._stubs[index] = LazyObject(self, index)
+            return self._stubs[index]
+
+    def resolve(self, index: int) -> base.NetworkObject:
+        """
+        Returns the hydrated object for the record at *index*,
+        evicting the least recently used object if necessary.
+        """
+        try:
+            self._resident.move_to_end(index)
+            return self._resident[index]
+        except KeyError:
+            nwobj = self._resident[index] = self.hydrate(index)
+            while len(self._resident) > self.max_resident:
+                evicted, _ = self._resident.popitem(last = False)
+                self._objects.pop(evicted, None)
+                self._hydrated.discard(evicted)
+            return nwobj
+
+    def load(self, indices: Iterable[int] = None) -> Network:
+        """
+        Adds LazyObjects for the records at *indices*, or all records,
+        to the network's containers. Nothing is loaded until it is accessed.
+
+        :param indices: The record indices to load, defaults to all of them.
+        :type indices: Iterable[int], optional
+        :return: The network containing the LazyObjects.
+        :rtype: Network
+        """
+        selected = None if indices is None else set(indices)
+        for kind, key, index in self._entries():
+            if selected is None or index in selected:
+                container = getattr(self.network, CONTAINERS[kind])
+                container.objects[key] = self.reference(index)
+        return self.network
+
+
+def is_snapshot(buffer: Any) -> bool:
+    """
+    Returns True if *buffer* starts with the snapshot magic bytes.
+    """
+    return bytes(buffer[:len(MAGIC)]) == MAGIC
+
+def loads(buffer: Any, network_cls: Type[Network] = None) -> Network:
+    """
+    Loads a complete Network from a buffer containing a snapshot.
+
+    :param buffer: The buffer to read from, e.g. bytes or an mmap.
+    :type buffer: Any
+    :param network_cls: The Network class to instantiate, defaults to Network.
+    :type network_cls: Type[Network], optional
+    :return: The Network stored in the snapshot.
+    :rtype: Network
+    """
+    return Snapshot(buffer, network_cls).load()
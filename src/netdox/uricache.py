@@ -0,0 +1,158 @@
+"""
+This module contains a persistent cache of metadata about URIs on PageSeeder,
+such as the URI of a path or the URIs in a folder.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from threading import RLock
+from typing import Any, Optional
+
+from netdox.utils import APPDIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(APPDIR, 'src', 'uri-cache.json')
+"""Default path to the URI cache."""
+VERSION = 1
+"""Version of the cache format."""
+
+
+@dataclass
+class UriCacheEntry:
+    """A value in the URI cache."""
+    value: Any
+    """The cached value."""
+    fetched: float
+    """Time the value was last fetched or revalidated, as a UNIX timestamp."""
+    expires: float
+    """Time the value must be revalidated after, as a UNIX timestamp."""
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the value can be used without revalidating it."""
+        return time.time() < self.expires
+
+
+class UriCache:
+    """
+    A cache of URI metadata, persisted to disk.
+    Each value expires after a TTL, after which it should be revalidated or fetched again.
+    Keys are strings, and values must be serialisable to JSON.
+    """
+    path: str
+    """Path the cache is saved to."""
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        """
+        Constructor.
+
+        :param path: Path the cache is saved to, defaults to DEFAULT_PATH
+        :type path: str, optional
+        """
+        self.path = path
+        self._entries: Optional[dict[str, UriCacheEntry]] = None
+        self._lock = RLock()
+
+    @property
+    def entries(self) -> dict[str, UriCacheEntry]:
+        """The entries in the cache, loaded from disk on first access."""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            return self._entries
+
+    def _load(self) -> dict[str, UriCacheEntry]:
+        try:
+            with open(self.path, 'r') as stream:
+                content = json.load(stream)
+            if content.get('version') != VERSION:
+                return {}
+            return {
+                key: UriCacheEntry(value, fetched, expires)
+                for key, (value, fetched, expires) in content['entries'].items()
+            }
+        except FileNotFoundError:
+            return {}
+        except Exception as exc:
+            logger.warning(f'Failed to read URI cache: {exc}')
+            return {}
+
+    def save(self) -> None:
+        """
+        Saves the cache to *path*, replacing the existing file atomically.
+        Failing to save is logged, as the cache can always be rebuilt.
+        """
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w') as stream:
+                    json.dump({'version': VERSION, 'entries': {
+                        key: (entry.value, entry.fetched, entry.expires)
+                        for key, entry in self.entries.items()
+                    }}, stream)
+                os.replace(tmp_path, self.path)
+            except OSError as exc:
+                logger.warning(f'Failed to save URI cache: {exc}')
+
+    def get(self, key: str) -> Optional[UriCacheEntry]:
+        """
+        Returns the entry for *key*, fresh or not.
+
+        :param key: The key of the entry.
+        :type key: str
+        :return: The entry, or None if there is no entry for *key*.
+        :rtype: Optional[UriCacheEntry]
+        """
+        return self.entries.get(key)
+
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        """
+        Adds a value that was just fetched to the cache, and saves it.
+
+        :param key: The key of the entry.
+        :type key: str
+        :param value: The value to cache.
+        :type value: Any
+        :param ttl: Seconds until the value must be revalidated.
+        :type ttl: float
+        """
+        now = time.time()
+        with self._lock:
+            self.entries[key] = UriCacheEntry(value, now, now + ttl)
+            self.save()
+
+    def revalidate(self, key: str, ttl: float) -> None:
+        """
+        Marks the entry for *key* as fresh for another *ttl* seconds,
+        after it was found to be unchanged.
+
+        :param key: The key of the entry.
+        :type key: str
+        :param ttl: Seconds until the value must be revalidated again.
+        :type ttl: float
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.fetched = time.time()
+                entry.expires = entry.fetched + ttl
+                self.save()
+
+    def invalidate(self, prefix: str = '') -> None:
+        """
+        Removes the entries with keys starting with *prefix*, or all entries.
+
+        :param prefix: The prefix of keys to remove, defaults to '' (all keys).
+        :type prefix: str, optional
+        """
+        with self._lock:
+            stale = [key for key in self.entries if key.startswith(prefix)]
+            if stale:
+                for key in stale:
+                    del self.entries[key]
+                self.save()
@@ -4,18 +4,26 @@ This module contains some utility functions / useful constants.
 
 from __future__ import annotations
 
+import base64
+import io
 import json
 import logging
 import os
 import re
+import struct
 from functools import lru_cache, wraps
 from traceback import format_exc
-from tldextract import extract
+from typing import BinaryIO, Iterator, Optional
+from tldextract import TLDExtract
 from datetime import date, timedelta
 from bs4.element import Tag
 from lxml import etree
 
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +31,13 @@ logger = logging.getLogger(__name__)
 # Constants #
 #############
 
-APPDIR = os.path.normpath(os.path.dirname(os.path.realpath(__file__))) + os.sep
-"""Absolute path to the directory containing the running source code."""
+APPDIR = os.path.normpath(
+    os.environ.get('NETDOX_APPDIR') or os.path.dirname(os.path.realpath(__file__))
+) + os.sep
+"""
+Absolute path to the directory containing the running source code.
+Can be overridden with the NETDOX_APPDIR environment variable.
+"""
 OUTDIR = os.path.join(APPDIR, 'out')
 """Absolute path to the directory to be used for output."""
 CFGPATH = os.path.join(APPDIR, 'src', 'config.bin')
@@ -44,9 +57,24 @@ docid_invalid_pattern = re.compile(r'[^a-zA-Z0-9_-]')
 # Cryptography #
 ################
 
+STREAM_MAGIC = b'NDXENC'
+"""Bytes every file encrypted with the streaming format starts with."""
+STREAM_CHUNK_SIZE = 1 << 20
+"""Default size of the plaintext in each frame of an encrypted stream."""
+
+_STREAM_HEADER = struct.Struct(f'<{len(STREAM_MAGIC)}sBI7s')
+_STREAM_FRAME = struct.Struct('<I')
+_STREAM_VERSION = 1
+
 class Cryptor(Fernet):
     """
     Can encrypt and decrypt files using the generated cryptography key.
+
+    Besides Fernet tokens, this class reads and writes a streaming format,
+    so that large files can be encrypted and decrypted in constant memory.
+    A stream is a header followed by AES-GCM frames, each holding one chunk of plaintext.
+    Frame nonces are a random prefix from the header, the frame counter,
+    and a flag marking the last frame, so frames cannot be reordered, dropped or truncated.
     """
     def __init__(self):
         try:
@@ -56,26 +84,197 @@ class Cryptor(Fernet):
             raise FileNotFoundError('Failed to locate cryptography key. Try \'netdox init\'.')
         else:
             super().__init__(key)
+            self._aead = AESGCM(HKDF(
+                algorithm = hashes.SHA256(),
+                length = 32,
+                salt = None,
+                info = b'netdox stream'
+            ).derive(base64.urlsafe_b64decode(key)))
+
+    def writer(self, outstream: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE) -> EncryptedWriter:
+        """
+        Returns a writable object that encrypts data to *outstream*.
+        The writer must be closed to write the final frame.
+
+        :param outstream: A binary stream to write the encrypted data to.
+        :type outstream: BinaryIO
+        :param chunk_size: The size of the plaintext in each frame, 
+        defaults to STREAM_CHUNK_SIZE
+        :type chunk_size: int, optional
+        :return: A writer for the encrypted stream.
+        :rtype: EncryptedWriter
+        """
+        return EncryptedWriter(self._aead, outstream, chunk_size)
+
+    def reader(self, instream: BinaryIO) -> Iterator[bytes]:
+        """
+        Yields the decrypted chunks of the data in *instream*.
+        Fernet tokens are also accepted, but are decrypted in one go.
+
+        :param instream: A binary stream of encrypted data.
+        :type instream: BinaryIO
+        :raises cryptography.fernet.InvalidToken: If the data cannot be authenticated.
+        :yield: Chunks of plaintext.
+        :rtype: Iterator[bytes]
+        """
+        header = instream.read(_STREAM_HEADER.size)
+        if not header.startswith(STREAM_MAGIC):
+            yield self.decrypt(header + instream.read())
+            return
+        if len(header) < _STREAM_HEADER.size:
+            raise InvalidToken
+
+        _, version, chunk_size, prefix = _STREAM_HEADER.unpack(header)
+        if version != _STREAM_VERSION:
+            raise InvalidToken
+        
+        counter = 0
+        frame = _read_frame(instream, chunk_size)
+        if frame is None:
+            # writers always write a last frame, so a stream without frames was truncated
+            raise InvalidToken
+        while frame is not None:
+            following = _read_frame(instream, chunk_size)
+            try:
+                yield self._aead.decrypt(
+                    _nonce(prefix, counter, following is None), frame, header)
+            except InvalidTag:
+                raise InvalidToken
+            frame = following
+            counter += 1
+
+    def encrypt_stream(self, 
+            instream: BinaryIO, 
+            outstream: BinaryIO, 
+            chunk_size: int = STREAM_CHUNK_SIZE
+        ) -> None:
+        """
+        Encrypts the data in *instream* to *outstream*.
+
+        :param instream: A binary stream of plaintext.
+        :type instream: BinaryIO
+        :param outstream: A binary stream to write the encrypted data to.
+        :type outstream: BinaryIO
+        :param chunk_size: The size of the plaintext in each frame, 
+        defaults to STREAM_CHUNK_SIZE
+        :type chunk_size: int, optional
+        """
+        with self.writer(outstream, chunk_size) as writer:
+            for chunk in iter(lambda: instream.read(chunk_size), b''):
+                writer.write(chunk)
+
+    def decrypt_stream(self, instream: BinaryIO, outstream: BinaryIO) -> None:
+        """
+        Decrypts the data in *instream* to *outstream*.
+
+        :param instream: A binary stream of encrypted data.
+        :type instream: BinaryIO
+        :param outstream: A binary stream to write the plaintext to.
+        :type outstream: BinaryIO
+        :raises cryptography.fernet.InvalidToken: If the data cannot be authenticated.
+        """
+        for chunk in self.reader(instream):
+            outstream.write(chunk)
+
+    def decrypt_bytes(self, data: bytes) -> bytes:
+        """
+        Decrypts *data* in either the streaming format or as a Fernet token.
+
+        :param data: Some encrypted data.
+        :type data: bytes
+        :raises cryptography.fernet.InvalidToken: If the data cannot be authenticated.
+        :return: The plaintext.
+        :rtype: bytes
+        """
+        return b''.join(self.reader(io.BytesIO(data)))
+
+class EncryptedWriter:
+    """
+    Encrypts data written to it in frames of a fixed size.
+    """
+    def __init__(self, aead: AESGCM, outstream: BinaryIO, chunk_size: int) -> None:
+        self._aead = aead
+        self._outstream = outstream
+        self._chunk_size = chunk_size
+        self._prefix = os.urandom(7)
+        self._header = _STREAM_HEADER.pack(
+            STREAM_MAGIC, _STREAM_VERSION, chunk_size, self._prefix)
+        self._buffer = bytearray()
+        self._counter = 0
+        self.closed = False
+        outstream.write(self._header)
+
+    def __enter__(self) -> EncryptedWriter:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _frame(self, chunk: bytes, last: bool) -> None:
+        frame = self._aead.encrypt(_nonce(self._prefix, self._counter, last), chunk, self._header)
+        self._outstream.write(_STREAM_FRAME.pack(len(frame)))
+        self._outstream.write(frame)
+        self._counter += 1
+
+    def write(self, data: bytes) -> int:
+        """
+        Buffers *data*, encrypting and writing any full frames.
+        """
+        if self.closed:
+            raise ValueError('Cannot write to a closed EncryptedWriter.')
+        self._buffer += data
+        # a full chunk is held back so only an empty stream has an empty last frame
+        while len(self._buffer) > self._chunk_size:
+            self._frame(bytes(self._buffer[:self._chunk_size]), False)
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def close(self) -> None:
+        """
+        Encrypts and writes the last frame.
+        """
+        if not self.closed:
+            self._frame(bytes(self._buffer), True)
+            self._buffer.clear()
+            self.closed = True
+
+def _nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    return prefix + counter.to_bytes(4, 'big') + (b'\x01' if last else b'\x00')
+
+def _read_frame(instream: BinaryIO, chunk_size: int) -> Optional[bytes]:
+    length = instream.read(_STREAM_FRAME.size)
+    if not length:
+        return None
+    elif len(length) < _STREAM_FRAME.size:
+        raise InvalidToken
+    length = _STREAM_FRAME.unpack(length)[0]
+    if length > chunk_size + 16:
+        raise InvalidToken
+    frame = instream.read(length)
+    if len(frame) < length:
+        raise InvalidToken
+    return frame
 
 def encrypt_file(inpath: str, outpath: str = None) -> str:
     """
-    Encrypts the file at *inpath* and saves the resulting fernet token to *outpath*.
+    Encrypts the file at *inpath* and saves the resulting stream to *outpath*.
 
     :param inpath: The file to encrypt.
     :type inpath: str
-    :param outpath: The path to save the resulting token to, defaults to *inpath* + '.bin'.
+    :param outpath: The path to save the encrypted stream to, defaults to *inpath* + '.bin'.
     :type outpath: str, optional
     :return: The absolute path of the output file.
     :rtype: str
     """
     outpath = outpath or (inpath + '.bin')
     with open(inpath, 'rb') as instream, open(outpath, 'wb') as outstream:
-        outstream.write(Cryptor().encrypt(instream.read()))
+        Cryptor().encrypt_stream(instream, outstream)
     return os.path.abspath(outpath)
 
 def decrypt_file(inpath: str, outpath: str = None) -> str:
     """
-    Decrypts the fernet token at *inpath* and saves the resulting content to *outpath*.
+    Decrypts the encrypted stream or fernet token at *inpath* 
+    and saves the resulting content to *outpath*.
 
     :param inpath: The file to decrypt.
     :type inpath: str
@@ -86,7 +285,7 @@ def decrypt_file(inpath: str, outpath: str = None) -> str:
     """
     outpath = outpath or (inpath + '.txt')
     with open(inpath, 'rb') as instream, open(outpath, 'wb') as outstream:
-        outstream.write(Cryptor().decrypt(instream.read()))
+        Cryptor().decrypt_stream(instream, outstream)
     return os.path.abspath(outpath)
 
 ##################
@@ -106,7 +305,7 @@ def config(plugin: str = None) -> dict:
     """
     try:
         with open(APPDIR+ 'src/config.bin', 'rb') as stream:
-            conf = json.loads(str(Cryptor().decrypt(stream.read()), encoding='utf-8'))
+            conf = json.loads(b''.join(Cryptor().reader(stream)))
             return conf['plugins'][plugin] if plugin else conf
     except KeyError:
         raise AttributeError(f"Missing key 'plugins' or 'plugins.{plugin}' in primary config file.")
@@ -162,17 +361,22 @@ def path_list(dir: str, relative: str = None) -> list[str]:
             fileset.append(os.path.relpath(file.path, relative))
     return fileset
 
+_extract = TLDExtract(cache_dir = None, suffix_list_urls = ())
+"""Extracts the parts of a domain name using the public suffix list bundled with tldextract."""
+
+@lru_cache(maxsize = 1 << 16)
 def root_domain(fqdn: str) -> str:
     """
     Returns the root domain and TLD suffix of a FQDN.
     e.g. for subsub.sub.domain.com.au, would return domain.com.au
+    Uses the bundled public suffix list, so never fetches it over the network.
 
     :param fqdn: The full qualified domain name to extract the root domain from.
     :type fqdn: str
     :return: The root domain and TLD suffix.
     :rtype: str
     """
-    result = extract(fqdn)
+    result = _extract(fqdn)
     if not result.suffix:
         return result.domain
     return result.domain +'.'+ result.suffix
@@ -0,0 +1,72 @@
+import os
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from netdox import archive
+from netdox.archive import ZipBuilder
+from pytest import fixture, raises
+
+
+@fixture
+def files(tmp_path) -> dict[str, bytes]:
+    contents = {
+        'doc.psml': b'<document>' + b'<para>text</para>' * 100 + b'</document>',
+        'diagram.svg': b'<svg>' + b'<rect/>' * 100 + b'</svg>',
+        'placeholder1.jpg': b'\xff\xd8' + os.urandom(2048),
+        'big.bin': os.urandom(1 << 16)
+    }
+    contents['placeholder2.jpg'] = contents['placeholder1.jpg']
+    contents['copy.psml'] = contents['doc.psml']
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content)
+    return contents
+
+
+def test_build(files: dict[str, bytes], tmp_path):
+    outpath = str(tmp_path / 'out.zip')
+    builder = ZipBuilder(outpath, workers = 2)
+    for name in files:
+        builder.add(str(tmp_path / name), f'dir/{name}')
+    builder.build()
+
+    with ZipFile(outpath) as zip:
+        assert zip.testzip() is None
+        assert zip.namelist() == [f'dir/{name}' for name in files]
+        for name, content in files.items():
+            assert zip.read(f'dir/{name}') == content
+        assert zip.getinfo('dir/placeholder1.jpg').compress_type == ZIP_STORED
+        assert zip.getinfo('dir/doc.psml').compress_type == ZIP_DEFLATED
+
+    assert builder.stats.members == len(files)
+    assert builder.stats.stored == 2
+    assert builder.stats.deduplicated == 2
+    assert builder.stats.input_bytes == sum(len(content) for content in files.values())
+    assert builder.stats.ratio < 1
+
+
+def test_missing(files: dict[str, bytes], tmp_path):
+    outpath = str(tmp_path / 'out.zip')
+    builder = ZipBuilder(outpath)
+    builder.add(str(tmp_path / 'doc.psml'), 'doc.psml')
+    builder.add(str(tmp_path / 'missing.psml'), 'missing.psml')
+    builder.build()
+
+    with ZipFile(outpath) as zip:
+        assert zip.namelist() == ['doc.psml']
+
+
+def test_level():
+    with raises(ValueError):
+        ZipBuilder('out.zip', level = 10)
+
+
+def test_zip64_end_record(files: dict[str, bytes], tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'ZIP_FILECOUNT_LIMIT', 1)
+    outpath = str(tmp_path / 'out.zip')
+    builder = ZipBuilder(outpath)
+    for name in files:
+        builder.add(str(tmp_path / name), name)
+    builder.build()
+
+    with ZipFile(outpath) as zip:
+        assert zip.testzip() is None
+        assert {name: zip.read(name) for name in zip.namelist()} == files
@@ -17,3 +17,28 @@ class TestNetworkConfig:
     def test_psml_roundtrip(self, network_config: config.NetworkConfig):
         assert network_config == config.NetworkConfig.from_psml(
             network_config.to_psml())
+
+    def test_label_attrs(self):
+        cfg = config.NetworkConfig(labels = {
+            'first': {'attr1': 'first1', 'attr2': None},
+            'second': {'attr1': 'second1', 'attr2': 'second2'}
+        })
+        assert cfg.label_attrs({'second', 'first', 'other'}) == {
+            'attr1': 'first1', 'attr2': 'second2'}
+        assert cfg.label_attrs(['second']) == {'attr1': 'second1', 'attr2': 'second2'}
+        assert cfg.label_attrs(set()) == {}
+        assert cfg.label_attrs({'first', 'second'}) is cfg.label_attrs(['second', 'first'])
+
+        cfg.update_attrs(['attr2'])
+        assert cfg.label_attrs({'first', 'second'}) == {'attr2': 'second2'}
+
+    def test_label_organization(self):
+        cfg = config.NetworkConfig(organizations = {
+            'first': {'label1', 'shared'},
+            'second': {'label2', 'shared'}
+        })
+        assert cfg.label_organization({'label2'}) == 'second'
+        assert cfg.label_organization({'label2', 'shared'}) == 'first'
+        assert cfg.label_organization(['label2', 'label1']) == 'first'
+        assert cfg.label_organization({'other'}) == None
+        assert cfg.label_organization(set()) == None
@@ -1,8 +1,11 @@
+import os
 from typing import cast
+from zipfile import ZipFile
+
 from conftest import randstr
 from fixtures import *
 from netdox import IPv4Address, Network
-from netdox import iptools
+from netdox import iparray, iptools, utils
 from netdox.iptools import subn_iter
 from netdox.nodes import Node, ProxiedNode
 from netdox.app import PluginManager
@@ -11,13 +14,42 @@ from pytest import fixture, raises
 
 class TestIPv4AddressSet:
 
-    def test_fillSubnets(self, network: Network):
+    def test_fillSubnets(self, network: Network, eg_subnet: str, eg_location: str, monkeypatch):
         """
-        Tests that the fillSubnets method correctly populates existing subnets.
+        Tests that the fillSubnets method records the used addresses in each subnet
+        without creating objects for the unused ones.
         """
+        for ip in ('192.168.254.1', '192.168.254.200', '10.0.0.5', '8.8.8.8'):
+            network.ips[ip]
         network.ips.fillSubnets()
         assert set(network.ips.objects) == {
-            ip for subnet in network.config.subnets for ip in subn_iter(subnet)}
+            '192.168.254.1', '192.168.254.200', '10.0.0.5', '8.8.8.8'}
+
+        assert set(network.ips.subnet_usage) == {eg_subnet, '10.0.0.0/24'}
+        usage = network.ips.subnet_usage[eg_subnet]
+        assert usage.location == eg_location
+        assert usage.used == 2
+        assert set(usage.unused()) == set(subn_iter(eg_subnet)) - {
+            '192.168.254.1', '192.168.254.200'}
+        assert network.ips.subnet_usage['10.0.0.0/24'].used == 1
+
+        monkeypatch.setattr(iparray, 'AVAILABLE', False)
+        network.ips.fillSubnets()
+        assert network.ips.subnet_usage[eg_subnet].used == 2
+        assert set(network.ips.subnet_usage) == {eg_subnet, '10.0.0.0/24'}
+
+    def test_private_subnets(self, network: Network, monkeypatch):
+        """
+        Tests that private_subnets finds the subnets of the private IPs, with and without NumPy.
+        """
+        for ip in ('10.1.2.3', '10.1.2.4', '10.200.0.1', '8.8.8.8'):
+            network.ips[ip]
+        expected = {iptools.sort(ip.name, 16) for ip in network.ips.private_ips}
+        assert '10.1.0.0/16' in expected and '8.8.0.0/16' not in expected
+
+        assert network.ips.private_subnets(16) == expected
+        monkeypatch.setattr(iparray, 'AVAILABLE', False)
+        assert network.ips.private_subnets(16) == expected
 
 
 class TestNodeSet:
@@ -47,10 +79,56 @@ class TestNetwork:
         assert network.resolvesTo('0.0.0.0', 'sub.domain.com')
         assert network.resolvesTo('0.0.0.0', 'target.domain.com')
 
+    def test_link(self, network: Network, excluded_domain: str):
+        """
+        Tests that link normalises names and skips excluded or invalid ones.
+        """
+        network.link(' Sub.Domain.com. ', '192.168.0.1', 'source')
+        network.link('sub.domain.com', excluded_domain.upper(), 'source')
+        network.link('sub.domain.com', '!& invalid name &!', 'source')
+        network.link(excluded_domain, '192.168.0.1', 'source')
+
+        assert set(network.domains.objects) == {'sub.domain.com'}
+        assert network.domains['SUB.domain.com'].links.names == {'192.168.0.1'}
+        assert 'sub.domain.com.' in network.domains
+
+    def test_link_mixed_case_exclusion(self):
+        network = Network(config = NetworkConfig(exclusions = [' Excluded.Domain.com ']))
+        network.link('excluded.domain.com', '192.168.0.1', 'source')
+        network.link('sub.domain.com', 'EXCLUDED.domain.com', 'source')
+
+        assert set(network.domains.objects) == {'sub.domain.com'}
+        assert not network.domains['sub.domain.com'].links.names
+
     def test_dump(self, network: Network):
         network.dump()
         Network.from_dump()
 
+    def test_from_zip(self, network: Network, tmp_path):
+        network.domains['sub.domain.com'].link('192.168.0.1', 'source')
+
+        outdir = tmp_path / 'website'
+        outdir.mkdir()
+        (outdir / 'config.psml').write_text(network.config.to_psml())
+        for nwobj in (*network.domains, *network.ips):
+            path = outdir / os.path.relpath(nwobj.outpath, utils.OUTDIR)
+            path.parent.mkdir(parents = True, exist_ok = True)
+            path.write_text(str(nwobj.to_psml()), encoding = 'utf-8')
+
+        with ZipFile(tmp_path / 'website.zip', 'w') as zip:
+            for path in outdir.rglob('*.psml'):
+                zip.write(path, path.relative_to(outdir).as_posix())
+
+        expected = Network.from_psml(str(outdir))
+        with ZipFile(tmp_path / 'website.zip') as zip:
+            loaded = Network.from_zip(zip)
+
+        for container in ('domains', 'ips'):
+            assert getattr(loaded, container).objects.keys() == \
+                getattr(expected, container).objects.keys() == \
+                getattr(network, container).objects.keys()
+        assert loaded.labels == expected.labels
+
     # @fixture
     # def network_from_psml(self, plugin_mgr: PluginManager) -> Network:
     #     return Network.from_psml('resources/network', plugin_mgr.nodes)
@@ -138,6 +138,25 @@ class TestDomain:
     def test_serialise(self, domain: dns.Domain, psml_schema: etree.XMLSchema):
         assert psml_schema.validate(etree.fromstring(domain.to_psml().encode('utf-8')))
 
+    def test_raw_fragments(self, network: Network):
+        domain = dns.Domain(network, 'sub.domain.com', 'domain.com')
+        assert domain.raw_notes is domain.DEFAULT_RAW_NOTES
+        assert domain.raw_footer == str(psml.Section('footer', fragments = [
+            psml.PropertiesFragment('search', [
+                psml.Property('terms', domain.search_terms, 'Search Terms')
+            ], attrs = {'labels': 's-hide-content'})
+        ])).encode('utf-8')
+
+        unparsed = str(domain.to_psml())
+        assert domain._notes is None and domain._footer is None
+        domain.notes, domain.psmlFooter
+        assert str(domain.to_psml()) == unparsed
+
+        domain.notes.tag.para.string = 'Some & notes'
+        assert domain.raw_notes == b'<fragment id="notes"><para>Some &amp; notes</para></fragment>'
+        del domain.notes
+        assert domain.raw_notes is domain.DEFAULT_RAW_NOTES
+
     def test_organization(self, mock_domain: dns.Domain, eg_org: str, eg_org_label: str):
         assert mock_domain.organization == None
 
@@ -150,6 +169,17 @@ class TestDomain:
         mock_domain.labels.add(eg_org_label)
         assert mock_domain.organization == eg_org
 
+    def test_getAttr(self, mock_domain: dns.Domain, attr_label: str, attr_label_attrs: dict):
+        attr, value = next(iter(attr_label_attrs.items()))
+        assert mock_domain.getAttr(attr) == None
+
+        mock_domain.labels.add(attr_label)
+        assert mock_domain.getAttr(attr) == value
+        assert mock_domain.getAttr('missing') == None
+
+        mock_domain.labels.remove(attr_label)
+        assert mock_domain.getAttr(attr) == None
+
 class TestIPv4Address:
 
     MOCK_NAME = '10.0.0.0'
@@ -1,7 +1,8 @@
+import pickle
 import pytest
 from conftest import LOCATIONS, hide_file
 from netdox import utils
-from netdox import helpers
+from netdox import helpers, iptools
 from fixtures import *
 from os import remove
 from lxml import etree
@@ -19,6 +20,75 @@ class TestLocator:
 
         assert locator.locate(['192.168.0.0', '192.168.1.0']) == None   
 
+        assert locator.locate('192.168.5.5') == 'Internal'
+        assert locator.locate('8.8.8.8') == 'Any'
+        assert locator.locate(['192.168.5.5', '192.168.0.1']) == 'Subnet0'
+        assert locator.locate(['192.168.0.0/25']) == 'Subnet0'
+        assert locator.locate([]) == None
+
+class TestSubnetUsage:
+
+    def test_mark(self):
+        usage = helpers.SubnetUsage('192.168.0.77/24')
+        assert usage.name == '192.168.0.0/24'
+        assert usage.size == 256 and usage.used == 0
+
+        assert usage.mark(iptools.cidr2int('192.168.0.10'))
+        assert not usage.mark(iptools.cidr2int('192.168.1.10'))
+        assert iptools.cidr2int('192.168.0.10') in usage
+        assert iptools.cidr2int('192.168.0.11') not in usage
+        assert usage.used == 1
+
+        with pytest.raises(ValueError):
+            helpers.SubnetUsage('192.168.0.0')
+        with pytest.raises(ValueError):
+            helpers.SubnetUsage('0.0.0.0/0')
+
+    def test_unused_ranges(self):
+        usage = helpers.SubnetUsage('10.0.0.0/22')
+        for offset in (0, 1, 7, 8, 100, 1023):
+            usage.mark(usage.lower + offset)
+        lower = usage.lower
+        assert usage.unused_ranges() == [
+            (lower + 2, lower + 6), (lower + 9, lower + 99), (lower + 101, lower + 1022)]
+        assert len(list(usage.unused())) == usage.size - usage.used
+
+        small = helpers.SubnetUsage('10.0.0.4/30')
+        assert small.unused_ranges() == [(small.lower, small.lower + 3)]
+        for offset in range(4):
+            small.mark(small.lower + offset)
+        assert small.unused_ranges() == []
+
+    def test_to_psml(self):
+        usage = helpers.SubnetUsage('192.168.0.0/24', 'eg_location')
+        usage.mark(iptools.cidr2int('192.168.0.1'))
+        psml = usage.to_psml()
+        assert psml.find('uri')['docid'] == usage.docid
+        assert psml.find(attrs = {'name': 'location'})['value'] == 'eg_location'
+        assert psml.find(attrs = {'name': 'unused'})['value'] == '255'
+        assert psml.find('preformat').string == '192.168.0.0\n192.168.0.2-192.168.0.255'
+
+class TestLabelDict:
+
+    def test_getitem(self):
+        shared = frozenset(['label'])
+        labels = helpers.LabelDict({'doc1': shared, 'doc2': shared})
+        labels['doc1'].add('other')
+        assert labels['doc1'] == {'label', 'other'}
+        assert labels['doc2'] == {'label'} and labels.get('doc2') is not shared
+        assert labels['missing'] == set() and 'missing' in labels
+
+    def test_from_pageseeder(self, monkeypatch):
+        monkeypatch.setattr(helpers.pageseeder, 'uri_labels',
+            lambda path: {'doc': frozenset(['label'])})
+        assert helpers.LabelDict.from_pageseeder() == {'doc': {'label'}}
+
+        def fail(path):
+            raise ValueError()
+        monkeypatch.setattr(helpers.pageseeder, 'uri_labels', fail)
+        with pytest.raises(ValueError):
+            helpers.LabelDict.from_pageseeder()
+
 class TestReport:
     SECTION_ID = 'section_id'
     OUTPATH = 'test_report.psml'
@@ -121,3 +191,20 @@ class TestCounter:
         mock_counter.dec_facet(helpers.CountedFacets.DNSLink)
         assert mock_counter.counts[helpers.CountedFacets.DNSLink] == 0
 
+    def test_legacy_state(self):
+        counter = helpers.Counter.__new__(helpers.Counter)
+        counter.__setstate__({'_counts': helpers.Counter.DEFAULT_COUNTS | {
+            helpers.CountedFacets.Domain: 3}})
+        assert counter.counts[helpers.CountedFacets.Domain] == 3
+        counter.inc_facet(helpers.CountedFacets.Domain)
+        assert counter.counts[helpers.CountedFacets.Domain] == 4
+        assert pickle.loads(pickle.dumps(counter)).counts == counter.counts
+        counter.generate_report()
+
+    def test_export(self, mock_counter: helpers.Counter):
+        mock_counter.inc_facet(helpers.CountedFacets.Domain)
+        mock_counter.set_facet(helpers.CountedFacets.IPv4, 5)
+        prometheus = mock_counter.to_prometheus()
+        assert 'netdox_facets{facet="domain"} 1\n' in prometheus
+        assert 'netdox_facets{facet="ipv4"} 5\n' in prometheus
+
@@ -0,0 +1,39 @@
+import pytest
+from netdox import iparray, iptools
+
+np = pytest.importorskip('numpy')
+
+ADDRESSES = ['0.0.0.0', '10.1.2.3', '172.31.255.255', '192.168.0.1', '8.8.8.8', '255.255.255.255']
+
+
+def test_to_ints():
+    ints = iparray.to_ints(ADDRESSES)
+    assert ints.dtype == np.uint32
+    assert ints.tolist() == [iptools.cidr2int(ip) for ip in ADDRESSES]
+    assert iparray.to_strings(ints) == ADDRESSES
+    assert iparray.to_ints([]).size == 0
+
+    for invalid in (['1.2.3'], ['1.2.3.4.5'], ['1.2.3.256'], ['a.b.c.d'], ['1.2.3', '4.5.6.7.8']):
+        with pytest.raises(ValueError):
+            iparray.to_ints(invalid)
+
+
+def test_private():
+    assert iparray.private(iparray.to_ints(ADDRESSES)).tolist() == [
+        not iptools.public_ip(ip) for ip in ADDRESSES]
+
+
+def test_contained():
+    subnets = [iptools.parse_subnet(subnet) for subnet in 
+        ('10.0.0.0/8', '10.1.0.0/16', '192.168.0.0/31', '255.255.255.255/32')]
+    assert iparray.contained(iparray.to_ints(ADDRESSES), subnets).tolist() == [
+        False, True, False, True, False, True]
+    assert not iparray.contained(iparray.to_ints(ADDRESSES), []).any()
+
+
+def test_subnets():
+    ints = iparray.to_ints(ADDRESSES + ['10.1.2.200', '10.1.3.0'])
+    assert iparray.unique(ints).tolist() == sorted(set(ints.tolist()))
+    assert iparray.subnets(ints[iparray.private(ints)], 24) == [
+        '10.1.2.0/24', '10.1.3.0/24', '172.31.255.0/24', '192.168.0.0/24']
+    assert iparray.subnets(ints, 0) == ['0.0.0.0/0']
@@ -146,6 +146,50 @@ def test_range_iter():
     ]
 
 
+def test_int_core():
+    """
+    Tests the integer functions the string functions are built on.
+    """
+    assert iptools.netmask(0) == 0
+    assert iptools.netmask(24) == 0xFFFFFF00
+    assert iptools.netmask(32) == iptools.ALL_ONES
+    assert iptools.hostmask(24) == 0xFF
+
+    assert iptools.int_subnet(iptools.cidr2int('10.1.2.3'), 16) == (iptools.cidr2int('10.1.0.0'), 16)
+    assert iptools.parse_subnet('10.1.2.3/16') == (iptools.cidr2int('10.1.0.0'), 16)
+    assert iptools.int_bounds((0, 0)) == (0, iptools.ALL_ONES)
+    assert iptools.int_bounds(iptools.parse_subnet('10.0.0.0/31')) == (
+        iptools.cidr2int('10.0.0.0'), iptools.cidr2int('10.0.0.1'))
+
+    assert iptools.int_contains((0, 0), (iptools.ALL_ONES, 32))
+    assert iptools.int_contains(iptools.parse_subnet('10.0.0.0/8'), iptools.parse_subnet('10.1.0.0/16'))
+    assert not iptools.int_contains(iptools.parse_subnet('10.1.0.0/16'), iptools.parse_subnet('10.0.0.0/8'))
+    assert not iptools.int_contains(iptools.parse_subnet('10.0.0.0/8'), (iptools.cidr2int('11.0.0.0'), 32))
+
+
+def test_subnet_trie():
+    """
+    Tests if SubnetTrie finds the most specific subnet containing an object.
+    """
+    trie = iptools.SubnetTrie()
+    trie[iptools.parse_subnet('10.0.0.0/8')] = 'eight'
+    trie[iptools.parse_subnet('10.1.0.0/16')] = 'sixteen'
+    assert trie.setdefault(iptools.parse_subnet('10.1.0.0/16'), 'other') == 'sixteen'
+    assert len(trie) == 2
+    assert iptools.parse_subnet('10.0.0.0/8') in trie
+    assert iptools.parse_subnet('10.0.0.0/9') not in trie
+    with raises(KeyError):
+        trie[iptools.parse_subnet('10.0.0.0/9')]
+
+    assert trie.longest_match(iptools.parse_object('10.1.2.3')) == (16, 'sixteen')
+    assert trie.longest_match(iptools.parse_object('10.2.2.3')) == (8, 'eight')
+    assert trie.longest_match(iptools.parse_object('10.1.0.0/12')) == (8, 'eight')
+    assert trie.longest_match(iptools.parse_object('11.0.0.0')) is None
+
+    trie[(0, 0)] = 'any'
+    assert trie.longest_match(iptools.parse_object('11.0.0.0')) == (0, 'any')
+
+
 ## Conversion
 
 def test_cidr2int():
@@ -265,6 +309,46 @@ def test_collapse_iplist():
     with raises(ValueError):
         iptools.collapse_iplist(iplist, output = 'invalid value')
 
+def test_merge_ranges():
+    """
+    Tests if merge_ranges merges overlapping and adjacent ranges.
+    """
+    assert iptools.merge_ranges([(10, 20), (0, 5), (6, 8), (15, 30), (40, 40)]) == [
+        (0, 8), (10, 30), (40, 40)]
+    assert iptools.merge_ranges([]) == []
+
+def test_range_subnets():
+    """
+    Tests if range_subnets finds the fewest subnets covering a range.
+    """
+    assert iptools.range_subnets(0, iptools.ALL_ONES) == [(0, 0)]
+    assert iptools.range_subnets(iptools.ALL_ONES, iptools.ALL_ONES) == [(iptools.ALL_ONES, 32)]
+    assert iptools.range_subnets(1, 6) == [(1, 32), (2, 31), (4, 31), (6, 32)]
+
+def test_aggregate():
+    """
+    Tests if aggregate merges addresses, subnets and ranges into the fewest subnets or ranges.
+    """
+    objects = [
+        '10.0.0.0/25',
+        '10.0.0.128-10.0.1.255',
+        '10.0.2.0',
+        '10.0.2.1/32',
+        '10.0.0.5',
+        'not an ip',
+        '255.255.255.255',
+        '255.255.255.254'
+    ]
+    assert iptools.aggregate(objects) == ['10.0.0.0/23', '10.0.2.0/31', '255.255.255.254/31']
+    assert iptools.aggregate(objects, 'ranges') == [
+        '10.0.0.0-10.0.2.1', '255.255.255.254-255.255.255.255']
+
+    assert iptools.aggregate(['0.0.0.0/1', '128.0.0.0/1']) == ['0.0.0.0/0']
+    assert iptools.aggregate(['10.0.0.9-10.0.0.0']) == ['10.0.0.0/29', '10.0.0.8/31']
+
+    with raises(ValueError):
+        iptools.aggregate(objects, output = 'invalid value')
+
 def test_ip_from_rdns_name():
     """
     Tests if ip_from_rdns_name correctly parses IP addresses from PTR record names.
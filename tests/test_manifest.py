@@ -0,0 +1,47 @@
+import json
+
+from netdox.manifest import UploadManifest, docid_of
+
+
+def test_diff(tmp_path):
+    files = {}
+    for name in ('domains/_nd_domain_a.psml', 'domains/_nd_domain_b.psml', 'report.psml'):
+        path = tmp_path / name.replace('/', '_')
+        path.write_text(name)
+        files[name] = str(path)
+
+    manifest = UploadManifest(str(tmp_path / 'manifest.json'))
+    delta = manifest.diff(files)
+    assert delta.changed == list(files)
+    assert not delta.removed
+    manifest.update(delta)
+
+    (tmp_path / 'domains__nd_domain_a.psml').write_text('changed')
+    del files['domains/_nd_domain_b.psml']
+    delta = manifest.diff(files, force = ['report.psml'])
+    assert delta.changed == ['domains/_nd_domain_a.psml', 'report.psml']
+    assert delta.removed == ['domains/_nd_domain_b.psml']
+    assert delta.removed_docids == ['_nd_domain_b']
+
+    # removed files that failed to archive are kept, so they are removed again next time
+    manifest.update(delta, keep = delta.removed)
+    assert manifest.diff(files).removed == ['domains/_nd_domain_b.psml']
+
+    manifest.update(delta)
+    assert not manifest.diff(files)
+
+
+def test_save(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    UploadManifest(path, {'report.psml': 'abc'}).save()
+    assert UploadManifest.load(path).hashes == {'report.psml': 'abc'}
+
+    with open(path, 'w') as stream:
+        json.dump({'version': -1, 'files': {'report.psml': 'abc'}}, stream)
+    assert UploadManifest.load(path).hashes == {}
+    assert UploadManifest.load(str(tmp_path / 'missing.json')).hashes == {}
+
+
+def test_docid_of():
+    assert docid_of('ips/192.168.0.0_24/_nd_ipv4_192_168_0_1.psml') == '_nd_ipv4_192_168_0_1'
+    assert docid_of('screenshots/domain_com.jpg') is None
@@ -0,0 +1,114 @@
+import json
+import pickle
+import threading
+
+import pytest
+from netdox import metrics
+
+
+@pytest.fixture
+def registry() -> metrics.Registry:
+    return metrics.Registry()
+
+
+def test_counter(registry: metrics.Registry):
+    counter = registry.counter('requests', 'Requests made.', ('endpoint',))
+    counter.inc(labels = ('search',))
+    counter.inc(2, ('search',))
+    counter.inc(labels = ('upload',))
+    assert counter.value(('search',)) == 3
+    assert counter.collect() == {('search',): 3, ('upload',): 1}
+
+    with pytest.raises(ValueError):
+        counter.inc(-1, ('search',))
+
+
+def test_gauge(registry: metrics.Registry):
+    gauge = registry.gauge('objects', 'Objects in the network.')
+    gauge.inc(5)
+    gauge.dec(2)
+    assert gauge.value() == 3
+    gauge.set(10)
+    assert gauge.value() == 10
+
+
+def test_histogram(registry: metrics.Registry):
+    histogram = registry.histogram('latency', 'Request latency.', buckets = (0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value)
+    with histogram.time():
+        pass
+    assert histogram.buckets[-1] == float('inf')
+    assert list(histogram.samples()) == [
+        ('latency_bucket', {'le': '0.1'}, 2),
+        ('latency_bucket', {'le': '1'}, 4),
+        ('latency_bucket', {'le': '+Inf'}, 5),
+        ('latency_sum', {}, pytest.approx(6.05, abs = 0.01)),
+        ('latency_count', {}, 5)
+    ]
+
+
+def test_threads(registry: metrics.Registry):
+    counter = registry.counter('links', 'Links created.')
+    threads = [threading.Thread(target = lambda: [counter.inc() for _ in range(1000)])
+        for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value() == 8000
+    assert len(counter._shards) == 8
+
+
+def test_register(registry: metrics.Registry, monkeypatch):
+    counter = registry.counter('requests', 'Requests made.')
+    assert registry.counter('requests', 'Requests made.') is counter
+    assert 'requests' in registry and registry.get('requests') is counter
+    # registered metrics are returned without constructing a new one
+    monkeypatch.setattr(metrics.Counter, '__init__', None)
+    assert registry.counter('requests', 'Requests made.') is counter
+    monkeypatch.undo()
+    with pytest.raises(ValueError):
+        registry.gauge('requests', 'Requests made.')
+    with pytest.raises(ValueError):
+        registry.counter('requests', 'Requests made.', ('endpoint',))
+
+
+def test_export(registry: metrics.Registry):
+    registry.counter('requests', 'Requests "made".', ('endpoint',)).inc(3, ('search',))
+    registry.gauge('objects', 'Objects.').set(1.5)
+    assert registry.to_prometheus() == '\n'.join([
+        '# HELP objects Objects.',
+        '# TYPE objects gauge',
+        'objects 1.5',
+        '# HELP requests Requests \\"made\\".',
+        '# TYPE requests counter',
+        'requests{endpoint="search"} 3',
+    ]) + '\n'
+    assert json.loads(registry.to_json())['requests'] == {
+        'type': 'counter',
+        'help': 'Requests "made".',
+        'samples': [{'name': 'requests', 'labels': {'endpoint': 'search'}, 'value': 3}]
+    }
+
+
+def test_export_special_values(registry: metrics.Registry):
+    gauge = registry.gauge('drift', 'Clock drift.', ('host',))
+    gauge.set(float('inf'), ('a',))
+    gauge.set(float('-inf'), ('b',))
+    gauge.set(float('nan'), ('c',))
+    assert registry.to_prometheus().splitlines()[2:] == [
+        'drift{host="a"} +Inf',
+        'drift{host="b"} -Inf',
+        'drift{host="c"} NaN',
+    ]
+
+
+def test_pickle(registry: metrics.Registry):
+    registry.counter('requests', 'Requests made.').inc(2)
+    registry.histogram('latency', 'Request latency.').observe(0.2)
+    loaded = pickle.loads(pickle.dumps(registry))
+    assert loaded.get('requests').value() == 2
+    loaded.get('requests').inc()
+    assert loaded.get('requests').value() == 3
+    assert list(loaded.get('latency').samples()) == list(registry.get('latency').samples())
@@ -0,0 +1,31 @@
+import pytest
+from netdox import names
+
+
+def test_canonical():
+    assert names.canonical(' Sub.Domain.COM. ') == 'sub.domain.com'
+    assert names.canonical('10.0.0.1') == '10.0.0.1'
+
+
+def test_normalise_domain():
+    name = names.normalise('Sub.Domain.co.uk.')
+    assert name == names.Name('sub.domain.co.uk', names.DOMAIN, 'domain.co.uk')
+    assert name.subnet is None and not name.is_private
+    assert names.normalise('sub.domain.faketld').zone == 'faketld'
+
+
+def test_normalise_ipv4():
+    assert names.normalise('10.1.2.3') == names.Name(
+        '10.1.2.3', names.IPV4, '2.1.10.in-addr.arpa', '10.1.2.0/24', True)
+    assert names.normalise(' 8.8.8.8 ') == names.Name(
+        '8.8.8.8', names.IPV4, '8.8.8.in-addr.arpa', '8.8.8.0/24', False)
+
+
+def test_normalise_invalid():
+    for invalid in ('!& invalid name &!', 'nodots', '', 'a' * 90 + '.com'):
+        with pytest.raises(ValueError):
+            names.normalise(invalid)
+
+
+def test_normalise_cached():
+    assert names.normalise('sub.domain.com') is names.normalise('SUB.domain.com')
@@ -0,0 +1,217 @@
+import json
+from functools import partial
+from types import SimpleNamespace
+
+from netdox import pageseeder
+from netdox.pageseeder import ThreadStatus, ThreadWaiter
+from netdox.uricache import UriCache
+from pytest import raises
+
+
+def _thread(status: str, message: str = '') -> str:
+    return (f'<progress><thread id="1" status="{status}">'
+        f'<message>{message}</message><zip>export.zip</zip></thread></progress>')
+
+
+def test_thread_status():
+    thread = ThreadStatus.from_xml(_thread('inprogress', 'Exporting'))
+    assert thread == ThreadStatus('1', 'inprogress', 'Exporting', 'export.zip')
+    assert thread.active
+    assert not ThreadStatus.from_xml(_thread('completed')).active
+
+    assert ThreadStatus.from_xml(None) is None
+    assert ThreadStatus.from_xml('not xml') is None
+    assert ThreadStatus.from_xml('<error/>') is None
+
+
+def test_wait():
+    responses = iter([_thread('inprogress', 'Half'), _thread('completed', 'Done')])
+    seen = []
+    waiter = ThreadWaiter(initial = 0, callback = seen.append,
+        poll = lambda id: next(responses))
+
+    thread = waiter.wait(_thread('initialised'))
+    assert thread is not None and thread.status == 'completed'
+    assert waiter.polls == 2
+    assert [status.message for status in seen] == ['Half', 'Done']
+
+
+def test_wait_lost():
+    waiter = ThreadWaiter(initial = 0, poll = lambda id: None)
+    assert waiter.wait(_thread('inprogress')) is None
+
+
+def test_wait_timeout():
+    waiter = ThreadWaiter(initial = 0.01, timeout = 0.05,
+        poll = lambda id: _thread('inprogress'))
+    with raises(TimeoutError):
+        waiter.wait(_thread('inprogress'))
+    assert waiter.polls > 1
+
+
+def test_iter_search_parsed(monkeypatch):
+    def search(params = {}, **kwargs):
+        page = params.get('page', 1)
+        return json.dumps({'results': {'page': page, 'totalPages': 3, 'result': [
+            {'fields': [{'name': 'psid', 'value': f'{page}-{i}'}]} for i in range(2)
+        ]}})
+    monkeypatch.setattr(pageseeder, 'search', search)
+    auth = {'host': '', 'group': '', 'header': {}, 'session': None}
+
+    assert [result['psid'] for result in pageseeder.iter_search_parsed(**auth)] == [
+        '1-0', '1-1', '2-0', '2-1', '3-0', '3-1']
+    assert [result['psid'] for result in 
+        pageseeder.iter_search_parsed({'page': 2}, **auth)] == ['2-0', '2-1']
+
+    monkeypatch.setattr(pageseeder, 'search', lambda params = {}, **kwargs: '{}')
+    with raises(ValueError):
+        list(pageseeder.iter_search_parsed(**auth))
+
+
+def test_upload_reader(tmp_path):
+    path = tmp_path / 'upload.zip'
+    path.write_bytes(bytes(range(256)) * 40)
+    reports = []
+    with open(path, 'rb') as stream:
+        reader = pageseeder.UploadReader(stream, 
+            lambda *args: reports.append(args), interval = 0)
+        assert len(reader) == reader.total == 10240
+
+        chunks = []
+        while chunk := reader.read(4096):
+            chunks.append(chunk)
+        assert b''.join(chunks) == path.read_bytes()
+        assert [report[:2] for report in reports] == [
+            (4096, 10240), (8192, 10240), (10240, 10240)]
+
+        assert reader.seek(0) == reader.tell() == 0
+        assert reader.read() == path.read_bytes()
+
+
+def test_loading_zone_upload(monkeypatch, tmp_path):
+    path = tmp_path / 'upload.zip'
+    path.write_bytes(b'zip')
+    statuses = [503, 500, 200]
+    sent = []
+
+    class Session:
+        def put(self, url, data, **kwargs):
+            sent.append(data.read())
+            return SimpleNamespace(status_code = statuses[len(sent) - 1], text = 'done')
+
+    assert pageseeder.get_upload_session().get_adapter('https://').max_retries.total == 0
+    monkeypatch.setattr(pageseeder, 'get_upload_session', Session)
+    monkeypatch.setattr(pageseeder, 'UPLOAD_BACKOFF', 0)
+    monkeypatch.setattr(pageseeder, 'base_url', lambda: 'https://ps')
+    auth = {'host': '', 'group': '', 'header': {}}
+
+    assert pageseeder.loading_zone_upload(str(path), {}, **auth) == 'done'
+    assert sent == [b'zip'] * 3
+
+    # failures are logged and return None, like other @auth functions
+    assert pageseeder.loading_zone_upload(str(path), {}, retries = -1, **auth) is None
+
+
+def test_archive_docids(monkeypatch):
+    batches = []
+    def batch_document_action(action, params):
+        batches.append(params['filters'])
+        return None if len(batches) == 2 else '<ok/>'
+    monkeypatch.setattr(pageseeder, 'batch_document_action', batch_document_action)
+
+    assert pageseeder.archive_docids(['a', 'b', 'c', 'd', 'e'], batch_size = 2) == ['c', 'd']
+    assert batches == ['psdocid:a,psdocid:b', 'psdocid:c,psdocid:d', 'psdocid:e']
+
+
+def test_base_url():
+    assert pageseeder.base_url({'host': 'ps.example.com'}) == 'https://ps.example.com'
+    assert pageseeder.base_url({'host': '127.0.0.1:8080', 'scheme': 'http'}) == \
+        'http://127.0.0.1:8080'
+
+
+def _uri_pages(total: int, labels = lambda index: ['a'] if index % 2 else []):
+    def get_uris(uri, params = {}, **kwargs):
+        size, page = params['pagesize'], params.get('page', 1)
+        return json.dumps({'totalUris': total, 'uris': [
+            {'id': index, 'docid': f'doc{index}', 'labels': labels(index)}
+            for index in range((page - 1) * size, min(page * size, total))
+        ]})
+    return get_uris
+
+def test_iter_uris(monkeypatch):
+    monkeypatch.setattr(pageseeder, 'get_uris', _uri_pages(5))
+    auth = {'host': '', 'group': '', 'header': {}, 'session': None}
+
+    assert [uri['id'] for uri in pageseeder.iter_uris(1, {'pagesize': 2}, **auth)] == [0, 1, 2, 3, 4]
+    assert [uri['id'] for uri in 
+        pageseeder.iter_uris(1, {'pagesize': 2, 'page': 2}, **auth)] == [2, 3]
+
+    monkeypatch.setattr(pageseeder, 'get_uris', lambda uri, params = {}, **kwargs: '{}')
+    with raises(ValueError):
+        list(pageseeder.iter_uris(1, **auth))
+
+
+def test_uri_from_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(pageseeder, 'uri_cache', UriCache(str(tmp_path / 'cache.json')))
+    monkeypatch.setattr(pageseeder, '_credentials', {'host': 'ps', 'group': 'a-b'})
+    monkeypatch.setattr(pageseeder, 'search', lambda params, **kwargs: json.dumps({'results': {
+        'totalResults': 1, 'result': [{'fields': [{'name': 'psid', 'value': len(params['filters'])}]}]
+    }}))
+
+    uri = pageseeder.uri_from_path('website')
+    monkeypatch.setattr(pageseeder, '_credentials', {'host': 'ps', 'group': 'other-group'})
+    assert pageseeder.uri_from_path('website') != uri
+
+    pageseeder.clear_auth()
+    assert pageseeder.uri_cache.entries == {}
+
+
+def test_uri_labels(monkeypatch, tmp_path):
+    monkeypatch.setattr(pageseeder, 'uri_cache', UriCache(str(tmp_path / 'cache.json')))
+    monkeypatch.setattr(pageseeder, '_credentials', {'host': 'ps', 'group': 'a-b'})
+    monkeypatch.setattr(pageseeder, 'URI_PAGE_SIZE', 2)
+    monkeypatch.setattr(pageseeder, 'uri_from_path', lambda path: 1)
+    auth = {'host': '', 'group': '', 'header': {}, 'session': None}
+    for func in ('iter_uris', 'iter_uris_history'):
+        monkeypatch.setattr(pageseeder, func, partial(getattr(pageseeder, func), **auth))
+    monkeypatch.setattr(pageseeder, 'get_uris', _uri_pages(5))
+
+    labels = pageseeder.uri_labels('website')
+    assert labels == {f'doc{index}': frozenset(['a'] if index % 2 else []) for index in range(5)}
+    assert labels['doc1'] is labels['doc3'] and labels['doc0'] is labels['doc2']
+    pageseeder.invalidate_uris()
+    assert pageseeder.uri_labels('website') == labels
+
+    # stale labels are updated from the history
+    monkeypatch.setattr(pageseeder, 'URI_CACHE_TTL', -1)
+    key = pageseeder._cache_key('labels', 'website')
+    pageseeder.uri_cache.put(key, pageseeder.uri_cache.get(key).value, -1)
+    monkeypatch.setattr(pageseeder, 'get_uris', lambda uri, params = {}, **kwargs: '{}')
+    monkeypatch.setattr(pageseeder, 'get_uris_history', lambda params = {}, **kwargs: json.dumps(
+        {'totalUris': 5, 'uris': [
+            {'id': 0, 'docid': 'doc0', 'labels': ['a'], 'path': '/ps/a/b/website/doc0.psml'},
+            {'id': 2, 'docid': 'doc2', 'archived': True, 'path': '/ps/a/b/website/doc2.psml'},
+            {'id': 3, 'docid': 'doc3', 'labels': ['a'], 'path': '/ps/a/b/other/doc3.psml'},
+            {'id': 5, 'docid': 'doc5', 'labels': ['a'], 'path': '/ps/a/b/other/doc5.psml'},
+            {'id': 6, 'docid': 'doc6', 'labels': ['b'], 'path': '/ps/a/b/website/new/doc6.psml'}
+        ]}))
+    labels = pageseeder.uri_labels('website')
+    assert labels.keys() == {'doc0', 'doc1', 'doc4', 'doc6'}
+    assert labels['doc0'] == {'a'} and labels['doc0'] is labels['doc1']
+    assert labels['doc6'] == {'b'}
+
+    # stale labels are used if the labels cannot be fetched at all
+    monkeypatch.setattr(pageseeder, 'get_uris_history', lambda params = {}, **kwargs: '{}')
+    assert pageseeder.uri_labels('website') == labels
+
+    pageseeder.uri_cache.invalidate()
+    with raises(ValueError):
+        pageseeder.uri_labels('website')
+
+
+def test_async_client_attributes():
+    client = pageseeder.AsyncClient()
+    assert callable(client.get_uri)
+    for name in ('credentials', 'gather', 'json', '_new_session', 'ThreadWaiter'):
+        with raises(AttributeError):
+            getattr(client, name)
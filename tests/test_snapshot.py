@@ -0,0 +1,157 @@
+import pickle
+
+from bs4 import BeautifulSoup
+from fixtures import *
+from netdox import Network, dns, nodes, psml, snapshot
+from pytest import fixture, raises
+
+
+@fixture
+def populated(network: Network) -> Network:
+    domain = dns.Domain(network, 'sub.domain.com', zone = 'domain.com', labels = ['some_label'])
+    domain.link('192.168.0.1', 'source')
+    domain.txt_records.add(dns.TXTRecord('sub.domain.com', 'txt value', 'source'))
+    domain.caa_records.add(dns.CAARecord('sub.domain.com', 'ca.com', 'issue', 'source'))
+    domain.notes = psml.Fragment.from_tag(BeautifulSoup(
+        '<fragment id="notes"><para>Some notes</para></fragment>', 'xml').fragment)
+    network.ips['192.168.0.1'].translate('10.0.0.1', 'nat_source')
+
+    backend = nodes.Node(network, 'node', 'node_identity', ['sub.domain.com'], ['192.168.0.1'])
+    nodes.ProxiedNode(network, 'proxied', 'proxied_identity', [], ['192.168.0.5'],
+        proxy_node = backend)
+    return network
+
+
+def _elements(nwobj) -> list:
+    """Elements in the PSML for *nwobj*, ignoring the order of set members."""
+    soup = nwobj.to_psml()
+    soup.find('labels').decompose()
+    return sorted(
+        (tag.name, sorted(tag.attrs.items()), tag.string or '')
+        for tag in soup.find_all(True)
+    )
+
+
+def test_roundtrip(populated: Network):
+    network = snapshot.loads(snapshot.dumps(populated), Network)
+
+    assert network.domains.objects.keys() == populated.domains.objects.keys()
+    assert network.ips.objects.keys() == populated.ips.objects.keys()
+    assert network.nodes.objects.keys() == populated.nodes.objects.keys()
+    assert network.counter.counts == populated.counter.counts
+    assert network.config.subnets == populated.config.subnets
+
+    for container in ('domains', 'ips', 'nodes'):
+        for nwobj in getattr(populated, container):
+            loaded = getattr(network, container)[nwobj.identity]
+            assert type(loaded) is type(nwobj)
+            assert loaded.labels == nwobj.labels
+            assert _elements(loaded) == _elements(nwobj)
+
+
+def test_links(populated: Network):
+    network = snapshot.loads(snapshot.dumps(populated), Network)
+    domain = network.domains['sub.domain.com']
+    ipv4 = network.ips['192.168.0.1']
+
+    assert domain.links.destinations == {ipv4}
+    assert ipv4.implied_links.destinations == {domain}
+    assert {link.destination.name for link in ipv4.NAT} == {'10.0.0.1'}
+    assert domain.node is ipv4.node is network.nodes['node_identity']
+
+
+def test_proxy(populated: Network):
+    network = snapshot.loads(snapshot.dumps(populated), Network)
+    proxied = network.nodes['proxied_identity']
+
+    assert isinstance(proxied, nodes.ProxiedNode)
+    assert proxied.proxy.backend is proxied
+    assert proxied.proxy.node is network.nodes['node_identity']
+    assert proxied.proxy.addresses == {'192.168.0.5'}
+
+
+def test_attributes(populated: Network):
+    network = snapshot.loads(snapshot.dumps(populated), Network)
+    domain = network.domains['sub.domain.com']
+
+    assert domain.zone == 'domain.com'
+    assert 'some_label' in domain.labels
+    assert domain.labels is network.labels[domain.docid]
+    assert domain.txt_records == populated.domains['sub.domain.com'].txt_records
+    assert domain.caa_records == populated.domains['sub.domain.com'].caa_records
+    assert str(domain.notes) == '<fragment id="notes"><para>Some notes</para></fragment>'
+
+
+def test_load_subset(populated: Network):
+    snap = snapshot.Snapshot(snapshot.dumps(populated), Network)
+    network = snap.load_keys(snapshot.KIND_DOMAIN, ['sub.domain.com'])
+
+    assert list(network.domains.objects) == ['sub.domain.com']
+    assert '10.0.0.1' not in network.ips
+    assert network.domains['sub.domain.com'].links.names == {'192.168.0.1'}
+    # referenced but not requested, so not hydrated
+    assert not network.ips['192.168.0.1'].NAT
+
+
+def test_header(populated: Network):
+    snap = snapshot.Snapshot(snapshot.dumps(populated), Network)
+    assert snap.header(snap.find(snapshot.KIND_NODE, 'proxied_identity')) == (
+        'netdox.nodes:ProxiedNode', 'proxied', 'proxied_identity')
+
+
+def test_invalid():
+    assert not snapshot.is_snapshot(pickle.dumps(None))
+    with raises(ValueError):
+        snapshot.Snapshot(pickle.dumps(None))
+
+
+def test_dump_legacy(populated: Network, tmp_path):
+    path = str(tmp_path / 'network.bin')
+    with open(path, 'wb') as stream:
+        stream.write(pickle.dumps(populated))
+    assert Network.from_dump(path, encrypted = False).domains.objects.keys() == \
+        populated.domains.objects.keys()
+
+
+def test_dump_unencrypted(populated: Network, tmp_path):
+    path = str(tmp_path / 'network.bin')
+    populated.dump(path, encrypt = False)
+    snap = Network.open_dump(path, encrypted = False)
+    assert snap.load().nodes.objects.keys() == populated.nodes.objects.keys()
+
+
+def test_lazy(populated: Network):
+    snap = snapshot.LazySnapshot(snapshot.dumps(populated), Network, max_resident = 2)
+    network = snap.load()
+    domain = network.domains['sub.domain.com']
+
+    assert type(domain) is snapshot.LazyObject
+    assert isinstance(domain, dns.Domain)
+    assert str(domain) == '<netdox.dns.Domain sub.domain.com>'
+    assert not snap._resident
+
+    assert domain.zone == 'domain.com'
+    assert domain.links.destinations == {network.ips['192.168.0.1']}
+    assert domain.node is network.nodes['node_identity']
+    assert isinstance(network.nodes['proxied_identity'].proxy.node, nodes.Node)
+
+
+def test_lazy_eviction(populated: Network):
+    snap = snapshot.LazySnapshot(snapshot.dumps(populated), Network, max_resident = 1)
+    network = snap.load()
+    domain = network.domains['sub.domain.com']
+
+    assert domain.txt_records
+    assert network.ips['10.0.0.1'].name == '10.0.0.1'
+    assert list(snap._resident) == [snap.find(snapshot.KIND_DOMAIN, 'sub.domain.com')]
+    assert network.ips['10.0.0.1'].NAT
+    assert list(snap._resident) == [snap.find(snapshot.KIND_IPV4, '10.0.0.1')]
+    assert len(snap._objects) == 1
+    assert domain.txt_records == populated.domains['sub.domain.com'].txt_records
+
+
+def test_lazy_dump(populated: Network, tmp_path):
+    path = str(tmp_path / 'network.bin')
+    populated.dump(path)
+    network = Network.from_dump(path, lazy = True)
+    assert network.nodes['node_identity'].domains == {'sub.domain.com'}
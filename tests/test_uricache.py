@@ -0,0 +1,38 @@
+from netdox.uricache import UriCache
+
+
+def test_put(tmp_path):
+    cache = UriCache(str(tmp_path / 'cache.json'))
+    assert cache.get('path:website') is None
+
+    cache.put('path:website', 123, ttl = 60)
+    entry = cache.get('path:website')
+    assert entry is not None and entry.fresh and entry.value == 123
+
+    cache.put('uris:123:file:descendants', [{'id': 1}], ttl = -1)
+    entry = cache.get('uris:123:file:descendants')
+    assert entry is not None and not entry.fresh
+
+    cache.revalidate('uris:123:file:descendants', ttl = 60)
+    assert cache.get('uris:123:file:descendants').fresh
+
+
+def test_persist(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    UriCache(path).put('uris:123:file:descendants', [{'id': 1, 'labels': ['a']}], ttl = 60)
+    assert UriCache(path).get('uris:123:file:descendants').value == [{'id': 1, 'labels': ['a']}]
+
+    with open(path, 'w') as stream:
+        stream.write('not json')
+    assert UriCache(path).entries == {}
+
+
+def test_invalidate(tmp_path):
+    cache = UriCache(str(tmp_path / 'cache.json'))
+    cache.put('path:website', 123, ttl = 60)
+    cache.put('uris:123:file:descendants', [], ttl = 60)
+
+    cache.invalidate('uris:')
+    assert list(cache.entries) == ['path:website']
+    cache.invalidate()
+    assert not UriCache(cache.path).entries
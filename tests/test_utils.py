@@ -5,8 +5,10 @@ from random import choices
 from string import ascii_letters
 from sys import getdefaultencoding
 from datetime import date, timedelta
+from io import BytesIO
 
 import pytest
+from cryptography.fernet import InvalidToken
 from conftest import hide_file
 from netdox import utils
 
@@ -37,8 +39,14 @@ def mock_file() -> bytes:
 
 def test_encrypt_file(mock_file):
     utils.encrypt_file('message', 'ciphertext')
-    with open('ciphertext', 'r') as stream:
-        assert stream.read() != mock_file
+    with open('ciphertext', 'rb') as stream:
+        assert stream.read() != bytes(mock_file, getdefaultencoding())
+
+    utils.decrypt_file('ciphertext', 'plaintext')
+    with open('plaintext', 'r') as stream:
+        assert stream.read() == mock_file
+
+    os.remove('plaintext')
 
     os.remove('ciphertext')
 
@@ -67,6 +75,34 @@ def test_decrypt_file(mock_encrypted_file):
     os.remove('plaintext')
 
 
+@pytest.mark.parametrize('size', [0, 1, 16, 17, 32, 100])
+def test_encrypted_stream(size):
+    message = os.urandom(size)
+    cryptor = utils.Cryptor()
+    ciphertext = BytesIO()
+    cryptor.encrypt_stream(BytesIO(message), ciphertext, chunk_size = 16)
+
+    assert ciphertext.getvalue().startswith(utils.STREAM_MAGIC)
+    assert cryptor.decrypt_bytes(ciphertext.getvalue()) == message
+
+
+def test_encrypted_stream_tampered():
+    cryptor = utils.Cryptor()
+    ciphertext = BytesIO()
+    cryptor.encrypt_stream(BytesIO(os.urandom(64)), ciphertext, chunk_size = 16)
+    data = ciphertext.getvalue()
+    frame = 4 + 16 + 16
+
+    flipped = bytearray(data)
+    flipped[-1] ^= 1
+    truncated = data[:-frame]
+    reordered = data[:-2 * frame] + data[-frame:] + data[-2 * frame:-frame]
+    header_only = data[:utils._STREAM_HEADER.size]
+    for invalid in (bytes(flipped), truncated, reordered, header_only, header_only[:-1]):
+        with pytest.raises(InvalidToken):
+            cryptor.decrypt_bytes(invalid)
+
+
 def test_config(hide_file):
     """
     Tests the output of ``utils.config()``.